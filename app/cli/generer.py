@@ -0,0 +1,64 @@
+"""Génère un jeu de données synthétique et remplace la base.
+
+    python -m app.cli.generer --users 10000 --groups 2000 --tasks-per-group 500
+    DATABASE_JSON_PATH=/tmp/grand.json python -m app.cli.generer --tasks-per-group 1000
+
+Tous les utilisateurs ont pour mot de passe « password ». À lancer serveur arrêté.
+"""
+import argparse
+import asyncio
+import json
+import sys
+from time import perf_counter
+
+from app.core.config import DATABASE_JSON_PATH
+from app.core.logs import arreter_logs, configurer_logs
+from app.storage.json_db import charger_db, remplacer_db
+from app.storage.synthetique import MOT_DE_PASSE, generer_donnees
+
+
+async def _existe_deja() -> bool:
+    if not DATABASE_JSON_PATH.exists():
+        return False
+    return bool((await charger_db()).get("users"))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Jeu de données synthétique pour les tests de charge")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--groups", type=int, default=100)
+    parser.add_argument("--members-per-group", type=int, default=20, help="moyenne, répartie selon --skew")
+    parser.add_argument("--tasks-per-group", type=int, default=100, help="moyenne, proportionnelle à la taille du groupe")
+    parser.add_argument("--invites", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skew", type=float, default=1.0, help="exposant de la loi de puissance (0 = uniforme)")
+    parser.add_argument("--force", action="store_true", help="écraser une base non vide")
+    args = parser.parse_args()
+
+    configurer_logs()
+    try:
+        if not args.force and asyncio.run(_existe_deja()):
+            print(f"{DATABASE_JSON_PATH} contient déjà des données, relancer avec --force", file=sys.stderr)
+            return 2
+        debut = perf_counter()
+        data = generer_donnees(args.users, args.groups, args.members_per_group, args.tasks_per_group,
+                               args.invites, args.seed, args.skew)
+        genere = perf_counter()
+        asyncio.run(remplacer_db(data))
+        fin = perf_counter()
+    finally:
+        arreter_logs()
+    json.dump({
+        "path": str(DATABASE_JSON_PATH),
+        "password": MOT_DE_PASSE,
+        "counts": {k: len(v) for k, v in data.items() if isinstance(v, list)},
+        "largest_groups": sorted((len(g["members"]) for g in data["groups"]), reverse=True)[:5],
+        "generate_seconds": round(genere - debut, 2),
+        "write_seconds": round(fin - genere, 2),
+    }, sys.stdout, ensure_ascii=False, indent=2)
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
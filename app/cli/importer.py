@@ -0,0 +1,47 @@
+"""Import en masse de tâches ou de membres dans un groupe.
+
+    python -m app.cli.importer 1 taches.csv
+    python -m app.cli.importer 1 membres.ndjson --kind members
+
+Chaque lot est écrit dans sa propre transaction : à lancer serveur arrêté,
+ses index en mémoire ne voient pas les écritures d'un autre processus.
+"""
+import argparse
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+from app.core.config import IMPORT_BATCH_SIZE
+from app.core.logs import arreter_logs, configurer_logs
+from app.services.importation import FORMATS_IMPORT, TYPES_IMPORT, importer_lignes
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Import en masse dans un groupe")
+    parser.add_argument("group_id", type=int)
+    parser.add_argument("fichier", type=Path)
+    parser.add_argument("--kind", choices=TYPES_IMPORT, default="tasks")
+    parser.add_argument("--format", choices=FORMATS_IMPORT)
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    format = args.format or args.fichier.suffix.lstrip(".").lower().replace("jsonl", "ndjson")
+    if format not in FORMATS_IMPORT:
+        parser.error("format introuvable, préciser --format")
+    configurer_logs()
+    try:
+        with args.fichier.open(encoding="utf-8-sig", newline="") as texte:
+            rapport = asyncio.run(importer_lignes(args.group_id, texte, format, args.kind, args.batch_size))
+    except KeyError as e:
+        print(e.args[0], file=sys.stderr)
+        return 2
+    finally:
+        arreter_logs()
+    json.dump(rapport, sys.stdout, ensure_ascii=False, indent=2)
+    print()
+    return 1 if rapport["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
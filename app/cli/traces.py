@@ -0,0 +1,51 @@
+"""Convertit les traces JSON lines en piles repliées pour flamegraph.pl ou speedscope.
+
+    python -m app.cli.traces .cache/traces.jsonl > traces.folded
+    python -m app.cli.traces .cache/traces.jsonl --route "GET /groups/{group_id}"
+
+Chaque pile vaut le temps propre du span (sa durée moins celle de ses enfants), en microsecondes.
+"""
+import argparse
+import json
+import sys
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+
+def piles_repliees(traces: Iterable[Dict[str, Any]], route: Optional[str] = None) -> Counter:
+    piles: Counter = Counter()
+    for trace in traces:
+        if route is not None and trace["name"] != route:
+            continue
+        spans = {s["id"]: s for s in trace["spans"]}
+        enfants: Counter = Counter()
+        for s in spans.values():
+            if s["parent"] is not None:
+                enfants[s["parent"]] += s["duration_ms"]
+        for s in spans.values():
+            chemin, courant = [], s
+            while courant is not None:
+                chemin.append(f"{courant['layer']}:{courant['name']}")
+                courant = spans.get(courant["parent"])
+            propre = max(0.0, s["duration_ms"] - enfants[s["id"]])
+            piles[";".join(reversed(chemin))] += int(propre * 1000)
+    return piles
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Traces JSON lines vers piles repliées")
+    parser.add_argument("fichier", type=Path)
+    parser.add_argument("--route", help="ne garder qu'une route, ex. « GET /groups/{group_id} »")
+    args = parser.parse_args()
+
+    with args.fichier.open(encoding="utf-8") as lignes:
+        piles = piles_repliees((json.loads(l) for l in lignes if l.strip()), args.route)
+    for pile, valeur in piles.most_common():
+        if valeur:
+            print(pile, valeur)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""Détection des blocages de la boucle asyncio.
+
+La boucle pose un battement toutes les ``pas`` secondes ; un thread veilleur
+mesure l'écart depuis le dernier. Au-delà de ``seuil``, la boucle est bloquée
+par un appel synchrone (bcrypt, E/S fichier, print...) : le veilleur relève la
+pile du thread de la boucle jusqu'au retour du battement, puis publie le
+blocage dans les logs, les métriques et l'anneau des profils (/admin/profiles).
+
+Hors blocage, le coût se limite à un rappel de boucle par ``pas`` et un réveil
+du thread par ``pas / 2`` ; sûr en production.
+"""
+import asyncio
+import logging
+import sys
+import threading
+import traceback
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from time import perf_counter
+from typing import Optional
+
+from app.core.config import LOOP_BLOCK_SECONDS, PROFILE_INTERVAL_SECONDS
+from app.core.metriques import BLOCAGES_BOUCLE, DUREE_BLOCAGES
+from app.core.profilage import AnneauProfils, _nouvel_id, _pile_repliee, anneau
+
+log = logging.getLogger(__name__)
+
+# seul le code de l'application sert d'étiquette : cardinalité bornée et lisible
+_MODULES_IGNORES = ("app.core.traces", "app.core.blocages")
+
+
+def _site(pile: str) -> str:
+    """Cadre le plus profond appartenant à l'application, à défaut la feuille."""
+    cadres = pile.split(";")
+    for cadre in reversed(cadres):
+        if cadre.startswith("app.") and not cadre.startswith(_MODULES_IGNORES):
+            return cadre
+    return cadres[-1] if cadres else "?"
+
+
+def _rappel(pile: str) -> Optional[str]:
+    """Premier cadre sous Handle._run : la tâche ou le rappel que la boucle exécutait."""
+    cadres = pile.split(";")
+    for i, cadre in enumerate(cadres[:-1]):
+        if cadre == "asyncio.events:_run":
+            return cadres[i + 1]
+    return None
+
+
+def _compter(site: str, duree: float) -> None:
+    BLOCAGES_BOUCLE.inc(etiquettes=(site,))
+    DUREE_BLOCAGES.observer(duree)
+
+
+class _Blocage:
+    __slots__ = ("debut", "piles", "pile_complete")
+
+    def __init__(self, debut: float) -> None:
+        self.debut = debut
+        self.piles: Counter = Counter()
+        self.pile_complete: Optional[str] = None
+
+
+class DetecteurBlocages:
+    def __init__(self, seuil: float = LOOP_BLOCK_SECONDS, intervalle: float = PROFILE_INTERVAL_SECONDS,
+                 anneau: AnneauProfils = anneau) -> None:
+        self.seuil, self.intervalle, self.anneau = seuil, intervalle, anneau
+        self.pas = min(seuil / 2, 0.05)
+        self._battement = 0.0
+        self._boucle: Optional[asyncio.AbstractEventLoop] = None
+        self._poignee: Optional[asyncio.TimerHandle] = None
+        self._cible = 0
+        self._arret = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def demarrer(self) -> None:
+        if self.seuil <= 0 or self._thread is not None:
+            return
+        self._boucle = asyncio.get_running_loop()
+        self._cible = threading.get_ident()
+        self._arret.clear()
+        self._battre()
+        self._thread = threading.Thread(target=self._veiller, name="blocages", daemon=True)
+        self._thread.start()
+
+    def arreter(self) -> None:
+        if self._thread is None:
+            return
+        self._arret.set()
+        if self._poignee is not None:
+            self._poignee.cancel()
+        self._thread.join()
+        self._thread = self._poignee = None
+
+    def _battre(self) -> None:
+        self._battement = perf_counter()
+        self._poignee = self._boucle.call_later(self.pas, self._battre)
+
+    def _veiller(self) -> None:
+        blocage: Optional[_Blocage] = None
+        while not self._arret.wait(self.intervalle if blocage is not None else self.pas / 2):
+            battement = perf_counter() - self._battement
+            if blocage is None:
+                if battement - self.pas >= self.seuil:
+                    blocage = _Blocage(self._battement + self.pas)
+                    self._relever(blocage)
+            elif self._battement >= blocage.debut:
+                self._publier(blocage, self._battement - blocage.debut)
+                blocage = None
+            else:
+                self._relever(blocage)
+
+    def _relever(self, blocage: _Blocage) -> None:
+        frame = sys._current_frames().get(self._cible)
+        if frame is None:
+            return
+        blocage.piles[_pile_repliee(frame)] += 1
+        if blocage.pile_complete is None:
+            blocage.pile_complete = "".join(traceback.format_stack(frame))
+        del frame
+
+    def _publier(self, blocage: _Blocage, duree: float) -> None:
+        pile = blocage.piles.most_common(1)[0][0] if blocage.piles else ""
+        site = _site(pile)
+        try:
+            # les métriques ne sont pas protégées : on les modifie depuis la boucle, comme /metrics qui les lit
+            self._boucle.call_soon_threadsafe(_compter, site, duree)
+        except RuntimeError:
+            pass  # boucle fermée pendant l'arrêt
+        profil_id = _nouvel_id()
+        log.warning("boucle bloquée", extra={
+            "duree": round(duree, 6), "site": site, "rappel": _rappel(pile), "profil": profil_id,
+            "pile": blocage.pile_complete,
+        })
+        debut = datetime.now(timezone.utc) - timedelta(seconds=perf_counter() - blocage.debut)
+        self.anneau.ecrire({
+            # même forme que les profils de requête ; un blocage n'est rattaché à aucune route
+            "id": profil_id, "reason": "loop_block", "method": None, "path": None, "route": None, "status": None,
+            "site": site, "callback": _rappel(pile), "started_at": debut.isoformat(), "duration": round(duree, 6),
+            "breakdown": {}, "samples": sum(blocage.piles.values()), "stacks": dict(blocage.piles.most_common()),
+        })
+
+
+detecteur = DetecteurBlocages()
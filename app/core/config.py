@@ -7,8 +7,43 @@ load_dotenv()
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+PROJECT_DIR = BASE_DIR.parent
+
 DATABASE_JSON_PATH = Path(os.getenv("DATABASE_JSON_PATH", str(BASE_DIR / "data" / "db.json")))
 SECRET_KEY = os.getenv("SECRET_KEY", "change_this_to_a_random_secret_in_prod")
 ALGORITHM = "HS256"
 DEBUG = os.getenv("DEBUG", "True").lower() in ("1", "true", "yes")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+TEMPLATES_DIR = Path(os.getenv("TEMPLATES_DIR", str(PROJECT_DIR / "templates")))
+TEMPLATES_CACHE_DIR = Path(os.getenv("TEMPLATES_CACHE_DIR", str(PROJECT_DIR / ".cache" / "jinja2")))
+FRAGMENT_CACHE_SIZE = int(os.getenv("FRAGMENT_CACHE_SIZE", "5000"))
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", "8192"))
+LIVE_QUEUE_SIZE = int(os.getenv("LIVE_QUEUE_SIZE", "256"))
+LIVE_HEARTBEAT_SECONDS = float(os.getenv("LIVE_HEARTBEAT_SECONDS", "25"))
+FEED_CACHE_SIZE = int(os.getenv("FEED_CACHE_SIZE", "1000"))
+SYNC_LOG_SIZE = int(os.getenv("SYNC_LOG_SIZE", "10000"))
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+BATCH_MAX_REQUESTS = int(os.getenv("BATCH_MAX_REQUESTS", "20"))
+# durée maximale d'une sous-requête de /batch
+BATCH_TIMEOUT_SECONDS = float(os.getenv("BATCH_TIMEOUT_SECONDS", "10"))
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# niveaux par module : "app.storage=DEBUG,app.core.security=WARNING"
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "1.0"))
+# jeton des routes /admin et de l'en-tête X-Grouply-Profile ; vide = désactivés
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0.0"))
+PROFILE_INTERVAL_SECONDS = float(os.getenv("PROFILE_INTERVAL_SECONDS", "0.005"))
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", "1.0"))
+# au-delà, l'échantillonneur cesse de relever des piles même si la requête continue
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "30"))
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", str(PROJECT_DIR / ".cache" / "profils")))
+PROFILE_RING_SIZE = int(os.getenv("PROFILE_RING_SIZE", "50"))
+# blocage de la boucle signalé au-delà de ce seuil ; 0 = détecteur désactivé
+LOOP_BLOCK_SECONDS = float(os.getenv("LOOP_BLOCK_SECONDS", "0.1"))
+# enregistrements compacts en mémoire (app.storage.enregistrements) : ~3,4x moins
+# de mémoire par tâche, au prix d'une conversion à chaque chargement de la base
+COMPACT_RECORDS = os.getenv("COMPACT_RECORDS", "false").lower() in ("1", "true", "yes")
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.0"))
+TRACE_FILE = Path(os.getenv("TRACE_FILE", str(PROJECT_DIR / ".cache" / "traces.jsonl")))
+TRACE_MAX_BYTES = int(os.getenv("TRACE_MAX_BYTES", str(50 * 1024 * 1024)))
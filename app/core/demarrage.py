@@ -0,0 +1,94 @@
+"""Démarrage en deux temps.
+
+Le lifespan ne fait que le strict nécessaire (base amorcée, bus, surveillance) :
+le processus accepte les connexions au plus vite et /healthz répond. Le
+préchauffage tourne ensuite en tâche de fond : lecture de la base, index,
+gabarits compilés, modules à import différé. /readyz ne passe à 200 qu'une fois
+tout prêt, et repasse à 503 dès l'arrêt : un répartiteur n'envoie pas de trafic
+à une instance froide pendant un redémarrage progressif.
+"""
+import asyncio
+import importlib
+import logging
+from time import perf_counter
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.core.templates import precompiler_templates
+from app.core.traces import dans_executeur
+from app.storage.agregats import assurer_agregats
+from app.storage.json_db import snapshot_db
+
+log = logging.getLogger(__name__)
+
+# importés paresseusement par le code applicatif, chargés ici hors du chemin des requêtes
+MODULES_DIFFERES = ("jose.jwt", "app.core.export", "app.services.importation")
+
+
+class EtatDemarrage:
+    def __init__(self) -> None:
+        self.debut = perf_counter()
+        self.pret = False
+        self.arret = False
+        self.erreur: Optional[str] = None
+        self.etapes: Dict[str, float] = {}
+
+    def en_dict(self) -> Dict[str, Any]:
+        if self.arret:
+            statut = "stopping"
+        elif self.erreur is not None:
+            statut = "failed"
+        else:
+            statut = "ready" if self.pret else "starting"
+        return {"status": statut, "steps": dict(self.etapes), "error": self.erreur}
+
+
+etat = EtatDemarrage()
+_tache: Optional["asyncio.Task[None]"] = None
+
+
+async def _etape(nom: str, fonction: Callable[[], Awaitable[Any]]) -> None:
+    debut = perf_counter()
+    await fonction()
+    etat.etapes[nom] = round(perf_counter() - debut, 6)
+
+
+async def _indexer() -> None:
+    # un seul chargement de la base pour l'amorçage du cache de page et les agrégats
+    async with snapshot_db():
+        await assurer_agregats()
+
+
+async def _importer() -> None:
+    for module in MODULES_DIFFERES:
+        await dans_executeur(importlib.import_module, module)
+
+
+async def prechauffer() -> None:
+    try:
+        await _etape("store", _indexer)
+        await _etape("templates", lambda: dans_executeur(precompiler_templates))
+        await _etape("imports", _importer)
+    except Exception as exc:
+        # l'instance reste servable, mais ne se déclare pas prête
+        etat.erreur = repr(exc)
+        log.exception("échec du préchauffage", extra={"etapes": etat.etapes})
+        return
+    etat.pret = True
+    log.info("application prête", extra={"duree": round(perf_counter() - etat.debut, 3), "etapes": etat.etapes})
+
+
+def lancer_prechauffage() -> None:
+    global _tache
+    etat.arret = False
+    if _tache is None or _tache.done():
+        etat.pret, etat.erreur = False, None
+        _tache = asyncio.get_running_loop().create_task(prechauffer())
+
+
+async def arreter() -> None:
+    global _tache
+    etat.arret = True
+    if _tache is not None:
+        _tache.cancel()
+        await asyncio.gather(_tache, return_exceptions=True)
+        _tache = None
@@ -0,0 +1,52 @@
+from typing import Dict, Optional, Tuple
+
+from fastapi import Request, Response
+
+from app.core.metriques import REPONSES_CONDITIONNELLES
+from app.storage.json_db import EPOQUE, version_collection, version_groupe
+
+
+def _etag(*parties: object) -> str:
+    return 'W/"' + "-".join([EPOQUE, *map(str, parties)]) + '"'
+
+
+def etag_groupe(group_id: int, *parties: object) -> Optional[str]:
+    version = version_groupe(group_id)
+    return None if version is None else _etag("g", group_id, version, *parties)
+
+
+def etag_collections(collections: Tuple[str, ...], *parties: object) -> Optional[str]:
+    versions = [version_collection(c) for c in collections]
+    if None in versions:
+        return None
+    return _etag(*(f"{c}{v}" for c, v in zip(collections, versions)), *parties)
+
+
+def entetes_cache(etag: str) -> Dict[str, str]:
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+
+def _sans_faible(etag: str) -> str:
+    etag = etag.strip()
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+def est_a_jour(request: Request, etag: str) -> bool:
+    entete = request.headers.get("if-none-match")
+    if not entete:
+        return False
+    if entete.strip() == "*":
+        return True
+    cible = _sans_faible(etag)
+    return any(_sans_faible(e) == cible for e in entete.split(","))
+
+
+def reponse_conditionnelle(request: Request, response: Response, etag: Optional[str]) -> Optional[Response]:
+    if etag is None:
+        return None
+    if est_a_jour(request, etag):
+        REPONSES_CONDITIONNELLES.inc(1, ("hit",))
+        return Response(status_code=304, headers=entetes_cache(etag))
+    REPONSES_CONDITIONNELLES.inc(1, ("miss",))
+    response.headers.update(entetes_cache(etag))
+    return None
@@ -0,0 +1,81 @@
+import csv
+import io
+import json
+import zlib
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator
+
+from fastapi.responses import StreamingResponse
+
+from app.core.config import STREAM_CHUNK_SIZE
+from app.core.reponses import vers_dict_ou_texte
+from app.core.templates import regrouper_morceaux
+
+FORMATS_EXPORT = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+COLONNES_TACHE = ("id", "title", "description", "status", "assigned_to_id",
+                  "group_id", "due_date", "created_at", "updated_at")
+
+# un tableur évalue une cellule qui commence ainsi comme une formule
+DEBUTS_FORMULE = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _lignes_ndjson(lignes: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    for ligne in lignes:
+        yield json.dumps(ligne, ensure_ascii=False, default=vers_dict_ou_texte) + "\n"
+
+
+def _cellule_csv(valeur: Any) -> Any:
+    if isinstance(valeur, str) and valeur.startswith(DEBUTS_FORMULE):
+        return "'" + valeur
+    return valeur
+
+
+def _lignes_csv(lignes: Iterable[Dict[str, Any]], colonnes: Iterable[str]) -> Iterator[str]:
+    colonnes = list(colonnes)
+    tampon = io.StringIO()
+    writer = csv.DictWriter(tampon, fieldnames=colonnes)
+    writer.writeheader()
+    for ligne in lignes:
+        writer.writerow({c: _cellule_csv(ligne.get(c)) for c in colonnes})
+        # le tampon est vidé à chaque ligne : la mémoire ne dépend pas du nombre de lignes
+        yield tampon.getvalue()
+        tampon.seek(0)
+        tampon.truncate()
+    yield tampon.getvalue()
+
+
+async def _encoder(morceaux: AsyncIterator[str], gzip: bool) -> AsyncIterator[bytes]:
+    if not gzip:
+        async for morceau in morceaux:
+            yield morceau.encode("utf-8")
+        return
+    compresseur = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    async for morceau in morceaux:
+        donnees = compresseur.compress(morceau.encode("utf-8"))
+        if donnees:
+            yield donnees
+    yield compresseur.flush()
+
+
+def accepte_gzip(accept_encoding: str) -> bool:
+    return any(e.split(";")[0].strip() == "gzip" for e in accept_encoding.split(","))
+
+
+def reponse_export(lignes: Iterable[Dict[str, Any]], format: str, nom_fichier: str,
+                   gzip: bool = False, colonnes: Iterable[str] = COLONNES_TACHE) -> StreamingResponse:
+    """Sérialise ``lignes`` au fil de l'envoi, en NDJSON ou CSV, compressées à la volée si ``gzip``."""
+    texte = _lignes_csv(lignes, colonnes) if format == "csv" else _lignes_ndjson(lignes)
+    entetes = {
+        "Content-Disposition": f'attachment; filename="{nom_fichier}.{format}"',
+        "Vary": "Accept-Encoding",
+    }
+    if gzip:
+        entetes["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        _encoder(regrouper_morceaux(texte, STREAM_CHUNK_SIZE), gzip),
+        media_type=FORMATS_EXPORT[format],
+        headers=entetes,
+    )
@@ -0,0 +1,107 @@
+"""Journalisation structurée : une ligne JSON par enregistrement.
+
+Les modules utilisent ``logging.getLogger(__name__)``. Le logger racine ne porte
+qu'un QueueHandler : la boucle asyncio se contente de poser l'enregistrement dans
+une file, l'écriture sur stderr se fait dans le thread du QueueListener.
+"""
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import re
+import sys
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from app.core.config import LOG_DEBUG_SAMPLE_RATE, LOG_LEVEL, LOG_LEVELS
+
+MASQUE = "***"
+
+_CLES_SENSIBLES = re.compile(r"token|password|passwd|secret|authorization|cookie|hash", re.IGNORECASE)
+_VALEURS_SENSIBLES = re.compile(
+    r"eyJ[\w-]+\.[\w-]+\.[\w-]+"        # JWT
+    r"|\$2[aby]?\$\d{2}\$[./\w]{53}"    # bcrypt
+)
+
+_ATTRIBUTS_STANDARD = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taux"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def masquer(valeur: Any, cle: str = "") -> Any:
+    if cle and _CLES_SENSIBLES.search(cle):
+        return MASQUE
+    if isinstance(valeur, str):
+        return _VALEURS_SENSIBLES.sub(MASQUE, valeur)
+    if isinstance(valeur, dict):
+        return {k: masquer(v, str(k)) for k, v in valeur.items()}
+    if isinstance(valeur, (list, tuple)):
+        return [masquer(v) for v in valeur]
+    return valeur
+
+
+class FiltreEchantillonnage(logging.Filter):
+    """Ne garde qu'une fraction des enregistrements DEBUG ; ``extra={"taux": 0.01}``
+    fixe la fraction d'un appel précis."""
+
+    def __init__(self, taux: float = LOG_DEBUG_SAMPLE_RATE) -> None:
+        super().__init__()
+        self.taux = taux
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG:
+            return True
+        taux = getattr(record, "taux", self.taux)
+        return taux >= 1.0 or random.random() < taux
+
+
+class FormatteurJSON(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entree: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": masquer(record.getMessage()),
+        }
+        for cle, valeur in vars(record).items():
+            if cle not in _ATTRIBUTS_STANDARD:
+                entree[cle] = masquer(valeur, cle)
+        return json.dumps(entree, ensure_ascii=False, default=str)
+
+
+def _niveaux_par_module(spec: str) -> Dict[str, str]:
+    niveaux = {}
+    for morceau in spec.split(","):
+        nom, _, niveau = morceau.partition("=")
+        if nom.strip() and niveau.strip():
+            niveaux[nom.strip()] = niveau.strip().upper()
+    return niveaux
+
+
+def configurer_logs(niveau: str = LOG_LEVEL, par_module: str = LOG_LEVELS) -> None:
+    global _listener
+    if _listener is not None:
+        return
+    file: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    sortie = logging.StreamHandler(sys.stderr)
+    sortie.setFormatter(FormatteurJSON())
+    entree = logging.handlers.QueueHandler(file)
+    entree.addFilter(FiltreEchantillonnage())
+
+    racine = logging.getLogger()
+    racine.handlers[:] = [entree]
+    racine.setLevel(niveau)
+    for nom, niveau_module in _niveaux_par_module(par_module).items():
+        logging.getLogger(nom).setLevel(niveau_module)
+
+    _listener = logging.handlers.QueueListener(file, sortie, respect_handler_level=True)
+    _listener.start()
+
+
+def arreter_logs() -> None:
+    global _listener
+    if _listener is not None:
+        # vide la file avant de rendre la main
+        _listener.stop()
+        _listener = None
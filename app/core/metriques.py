@@ -0,0 +1,196 @@
+"""Métriques au format texte Prometheus, sans dépendance externe.
+
+Une observation coûte une recherche dans un dict et un bisect : de l'ordre de
+la microseconde, appelable sur le chemin critique.
+"""
+import asyncio
+from bisect import bisect_left
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+Etiquettes = Tuple[str, ...]
+
+BORNES_LATENCE = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BORNES_VERROU = (0.00001, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+
+# ventilation de la requête en cours par phase (lecture, verrous, bcrypt...), posée par le profilage
+ventilation_courante: ContextVar[Optional[Dict[str, float]]] = ContextVar("ventilation_courante", default=None)
+
+
+def _format_etiquettes(noms: Etiquettes, valeurs: Etiquettes, extra: str = "") -> str:
+    paires = ['%s="%s"' % (n, str(v).replace("\\", "\\\\").replace('"', '\\"')) for n, v in zip(noms, valeurs)]
+    if extra:
+        paires.append(extra)
+    return "{" + ",".join(paires) + "}" if paires else ""
+
+
+def _nombre(valeur: float) -> str:
+    return str(int(valeur)) if float(valeur).is_integer() else repr(float(valeur))
+
+
+class Compteur:
+    type = "counter"
+
+    def __init__(self, nom: str, aide: str, etiquettes: Etiquettes = ()) -> None:
+        self.nom, self.aide, self.etiquettes = nom, aide, etiquettes
+        self.valeurs: Dict[Etiquettes, float] = {}
+
+    def inc(self, montant: float = 1.0, etiquettes: Etiquettes = ()) -> None:
+        self.valeurs[etiquettes] = self.valeurs.get(etiquettes, 0.0) + montant
+
+    def lignes(self) -> List[str]:
+        return [f"{self.nom}{_format_etiquettes(self.etiquettes, e)} {_nombre(v)}" for e, v in self.valeurs.items()]
+
+
+class Histogramme:
+    type = "histogram"
+
+    def __init__(self, nom: str, aide: str, etiquettes: Etiquettes = (),
+                 bornes: Tuple[float, ...] = BORNES_LATENCE, phase: Optional[str] = None) -> None:
+        self.nom, self.aide, self.etiquettes, self.bornes, self.phase = nom, aide, etiquettes, bornes, phase
+        # par jeu d'étiquettes : effectifs par tranche (non cumulés), puis somme
+        self.series: Dict[Etiquettes, List[float]] = {}
+
+    def observer(self, valeur: float, etiquettes: Etiquettes = ()) -> None:
+        serie = self.series.get(etiquettes)
+        if serie is None:
+            serie = self.series[etiquettes] = [0] * (len(self.bornes) + 2)
+        serie[bisect_left(self.bornes, valeur)] += 1
+        serie[-1] += valeur
+        if self.phase is not None:
+            ventilation = ventilation_courante.get()
+            if ventilation is not None:
+                ventilation[self.phase] = ventilation.get(self.phase, 0.0) + valeur
+
+    def lignes(self) -> List[str]:
+        lignes = []
+        for e, serie in self.series.items():
+            cumul = 0
+            for borne, effectif in zip(self.bornes, serie):
+                cumul += effectif
+                le = 'le="%s"' % borne
+                lignes.append(f"{self.nom}_bucket{_format_etiquettes(self.etiquettes, e, le)} {cumul}")
+            cumul += serie[len(self.bornes)]
+            le = 'le="+Inf"'
+            lignes.append(f"{self.nom}_bucket{_format_etiquettes(self.etiquettes, e, le)} {cumul}")
+            lignes.append(f"{self.nom}_sum{_format_etiquettes(self.etiquettes, e)} {_nombre(serie[-1])}")
+            lignes.append(f"{self.nom}_count{_format_etiquettes(self.etiquettes, e)} {cumul}")
+        return lignes
+
+
+class Rappel:
+    """Valeurs lues au moment de l'export, depuis des compteurs qui existent déjà ailleurs."""
+
+    def __init__(self, nom: str, aide: str, type: str, etiquettes: Etiquettes,
+                 fonction: Callable[[], Dict[Etiquettes, float]]) -> None:
+        self.nom, self.aide, self.type, self.etiquettes, self.fonction = nom, aide, type, etiquettes, fonction
+
+    def lignes(self) -> List[str]:
+        return [f"{self.nom}{_format_etiquettes(self.etiquettes, e)} {_nombre(v)}" for e, v in self.fonction().items()]
+
+
+class Registre:
+    def __init__(self) -> None:
+        self.metriques: List = []
+
+    def compteur(self, nom: str, aide: str, etiquettes: Etiquettes = ()) -> Compteur:
+        m = Compteur(nom, aide, etiquettes)
+        self.metriques.append(m)
+        return m
+
+    def histogramme(self, nom: str, aide: str, etiquettes: Etiquettes = (),
+                    bornes: Tuple[float, ...] = BORNES_LATENCE, phase: Optional[str] = None) -> Histogramme:
+        m = Histogramme(nom, aide, etiquettes, bornes, phase)
+        self.metriques.append(m)
+        return m
+
+    def rappel(self, nom: str, aide: str, fonction: Callable[[], Dict[Etiquettes, float]],
+               etiquettes: Etiquettes = (), type: str = "gauge") -> Rappel:
+        m = Rappel(nom, aide, type, etiquettes, fonction)
+        self.metriques.append(m)
+        return m
+
+    def exposer(self) -> str:
+        lignes = []
+        for m in self.metriques:
+            lignes.append(f"# HELP {m.nom} {m.aide}")
+            lignes.append(f"# TYPE {m.nom} {m.type}")
+            lignes.extend(m.lignes())
+        return "\n".join(lignes) + "\n"
+
+
+registre = Registre()
+
+DUREE_REQUETES = registre.histogramme(
+    "grouply_http_request_duration_seconds", "Durée des requêtes HTTP par route", ("method", "route", "status"))
+DUREE_CHARGEMENT = registre.histogramme(
+    "grouply_store_load_seconds", "Durée de lecture de la base JSON", phase="store_load")
+OCTETS_CHARGES = registre.compteur("grouply_store_load_bytes_total", "Octets lus depuis la base JSON")
+DUREE_SAUVEGARDE = registre.histogramme(
+    "grouply_store_save_seconds", "Durée d'écriture de la base JSON", phase="store_save")
+OCTETS_SAUVES = registre.compteur("grouply_store_save_bytes_total", "Octets écrits dans la base JSON")
+ATTENTE_VERROU = registre.histogramme(
+    "grouply_store_lock_wait_seconds", "Attente d'acquisition des verrous de la base", ("lock",), BORNES_VERROU, "lock_wait")
+TENUE_VERROU = registre.histogramme(
+    "grouply_store_lock_hold_seconds", "Durée de détention du verrou de la base", ("operation",), BORNES_VERROU)
+DUREE_BCRYPT = registre.histogramme(
+    "grouply_bcrypt_seconds", "Durée des opérations bcrypt", ("operation",), phase="bcrypt")
+REPONSES_CONDITIONNELLES = registre.compteur(
+    "grouply_http_conditional_total", "Requêtes à ETag : 304 servis (hit) ou corps recalculé (miss)", ("result",))
+RETARD_BOUCLE = registre.histogramme(
+    "grouply_event_loop_lag_seconds", "Retard de la boucle asyncio sur un réveil programmé", (), BORNES_VERROU)
+BLOCAGES_BOUCLE = registre.compteur(
+    "grouply_event_loop_blocks_total", "Blocages de la boucle au-delà du seuil, par site de code", ("site",))
+DUREE_BLOCAGES = registre.histogramme(
+    "grouply_event_loop_block_seconds", "Durée des blocages de la boucle au-delà du seuil")
+
+
+class MiddlewareMetriques:
+    """Middleware ASGI pur : la route relevée est le gabarit (/groups/{group_id}), pas le chemin."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        debut = perf_counter()
+        statut = 500
+
+        async def envoyer(message) -> None:
+            nonlocal statut
+            if message["type"] == "http.response.start":
+                statut = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, envoyer)
+        finally:
+            route = getattr(scope.get("route"), "path", "inconnue")
+            DUREE_REQUETES.observer(perf_counter() - debut, (scope["method"], route, str(statut)))
+
+
+async def surveiller_boucle(intervalle: float = 0.5) -> None:
+    while True:
+        debut = perf_counter()
+        await asyncio.sleep(intervalle)
+        RETARD_BOUCLE.observer(max(0.0, perf_counter() - debut - intervalle))
+
+
+_surveillance: Optional["asyncio.Task[None]"] = None
+
+
+def demarrer_surveillance() -> None:
+    global _surveillance
+    if _surveillance is None or _surveillance.done():
+        _surveillance = asyncio.get_running_loop().create_task(surveiller_boucle())
+
+
+async def arreter_surveillance() -> None:
+    global _surveillance
+    if _surveillance is not None:
+        _surveillance.cancel()
+        await asyncio.gather(_surveillance, return_exceptions=True)
+        _surveillance = None
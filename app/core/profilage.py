@@ -0,0 +1,306 @@
+"""Profilage à la demande et capture des requêtes lentes.
+
+Le profileur est un échantillonneur : un thread relève la pile du thread de la
+boucle toutes les ``PROFILE_INTERVAL_SECONDS``. La boucle ne paie rien hors des
+fenêtres profilées, et presque rien pendant. Les piles relevées couvrent tout ce
+que la boucle exécute dans la fenêtre, requêtes concurrentes comprises.
+"""
+import asyncio
+import json
+import logging
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Dict, List, Optional
+
+from app.core.config import (
+    PROFILE_DIR, PROFILE_INTERVAL_SECONDS, PROFILE_MAX_SECONDS, PROFILE_RING_SIZE, PROFILE_SAMPLE_RATE,
+    SLOW_REQUEST_SECONDS,
+)
+from app.core.metriques import ventilation_courante
+from app.core.security import jeton_admin_valide
+
+log = logging.getLogger(__name__)
+
+ENTETE_PROFIL = b"x-grouply-profile"
+PROFONDEUR_MAX = 128
+
+_ID_PROFIL = re.compile(r"^[0-9a-f]{1,32}$")
+
+
+def _pile_repliee(frame) -> str:
+    """Pile au format « replié » (racine;...;feuille) attendu par flamegraph.pl et speedscope."""
+    cadres: List[str] = []
+    while frame is not None and len(cadres) < PROFONDEUR_MAX:
+        module = frame.f_globals.get("__name__", "?")
+        # les enveloppes de traçage n'apportent rien à la lecture
+        if module != "app.core.traces":
+            cadres.append(f"{module}:{frame.f_code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(cadres))
+
+
+class EchantillonneurPile:
+    def __init__(self, cible: int, intervalle: float = PROFILE_INTERVAL_SECONDS,
+                 duree_max: float = PROFILE_MAX_SECONDS) -> None:
+        self.cible, self.intervalle, self.duree_max = cible, intervalle, duree_max
+        self.piles: Counter = Counter()
+        self.utilisateurs = 0
+        self._verrou = threading.Lock()
+        self._arret = threading.Event()
+        self._thread = threading.Thread(target=self._boucle, name="profilage", daemon=True)
+
+    def demarrer(self) -> None:
+        self._thread.start()
+
+    @property
+    def termine(self) -> bool:
+        return self._arret.is_set() or not self._thread.is_alive()
+
+    def _boucle(self) -> None:
+        fin = perf_counter() + self.duree_max
+        while not self._arret.wait(self.intervalle) and perf_counter() < fin:
+            frame = sys._current_frames().get(self.cible)
+            if frame is not None:
+                pile = _pile_repliee(frame)
+                with self._verrou:
+                    self.piles[pile] += 1
+            del frame
+
+    def releve(self) -> Counter:
+        with self._verrou:
+            return Counter(self.piles)
+
+    def arreter(self) -> Counter:
+        self._arret.set()
+        self._thread.join()
+        return self.piles
+
+
+class Fenetre:
+    """Part d'un échantillonneur partagé : les piles relevées depuis ``depart``."""
+    __slots__ = ("echantillonneur", "depart")
+
+    def __init__(self, echantillonneur: EchantillonneurPile, depart: Counter) -> None:
+        self.echantillonneur, self.depart = echantillonneur, depart
+
+
+# un seul échantillonneur à la fois, partagé : ses piles couvrent déjà toute la boucle
+_actif: Optional[EchantillonneurPile] = None
+_verrou_actif = threading.Lock()
+
+
+def _demarrer_echantillonneur(cible: int) -> Optional[Fenetre]:
+    global _actif
+    with _verrou_actif:
+        if _actif is None or _actif.termine:
+            _actif = EchantillonneurPile(cible)
+            _actif.demarrer()
+        elif _actif.cible != cible:
+            return None
+        _actif.utilisateurs += 1
+        return Fenetre(_actif, _actif.releve())
+
+
+def _arreter_echantillonneur(fenetre: Fenetre) -> Counter:
+    global _actif
+    echantillonneur = fenetre.echantillonneur
+    with _verrou_actif:
+        echantillonneur.utilisateurs -= 1
+        dernier = echantillonneur.utilisateurs == 0
+        if dernier and _actif is echantillonneur:
+            _actif = None
+    piles = echantillonneur.arreter() if dernier else echantillonneur.releve()
+    piles.subtract(fenetre.depart)
+    return +piles
+
+
+class _Requete:
+    __slots__ = ("debut", "cible", "echantillonneur")
+
+    def __init__(self, cible: int, echantillonneur: Optional[Fenetre]) -> None:
+        self.debut, self.cible, self.echantillonneur = perf_counter(), cible, echantillonneur
+
+
+class Veilleur:
+    """Thread qui démarre l'échantillonneur pour toute requête en cours depuis plus
+    de ``seuil``. Un minuteur de la boucle ne conviendrait pas : il ne se déclenche
+    pas tant que la boucle est bloquée, précisément le cas à capturer."""
+
+    def __init__(self, seuil: float) -> None:
+        self.seuil = seuil
+        self._requetes: Dict[int, _Requete] = {}
+        self._verrou = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def suivre(self, requete: _Requete) -> None:
+        with self._verrou:
+            self._requetes[id(requete)] = requete
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._boucle, name="profilage-veilleur", daemon=True)
+                self._thread.start()
+
+    def oublier(self, requete: _Requete) -> Optional[Fenetre]:
+        with self._verrou:
+            self._requetes.pop(id(requete), None)
+            fenetre, requete.echantillonneur = requete.echantillonneur, None
+            return fenetre
+
+    def _boucle(self) -> None:
+        pas = min(self.seuil / 4, 0.05)
+        while True:
+            time.sleep(pas)
+            maintenant = perf_counter()
+            with self._verrou:
+                for requete in self._requetes.values():
+                    if requete.echantillonneur is None and maintenant - requete.debut >= self.seuil:
+                        requete.echantillonneur = _demarrer_echantillonneur(requete.cible)
+
+
+class AnneauProfils:
+    """Profils écrits sur disque, un fichier JSON chacun ; au-delà de ``taille``
+    les plus anciens sont supprimés. Méthodes bloquantes, à appeler hors de la boucle."""
+
+    def __init__(self, dossier: Path = PROFILE_DIR, taille: int = PROFILE_RING_SIZE) -> None:
+        self.dossier, self.taille = dossier, taille
+        self._verrou = threading.Lock()
+
+    def _fichiers(self) -> List[Path]:
+        if not self.dossier.exists():
+            return []
+        return sorted(self.dossier.glob("*.json"), key=lambda p: int(p.stem, 16))
+
+    def ecrire(self, profil: Dict[str, Any]) -> None:
+        try:
+            with self._verrou:
+                self.dossier.mkdir(parents=True, exist_ok=True)
+                (self.dossier / f"{profil['id']}.json").write_text(json.dumps(profil, ensure_ascii=False), encoding="utf-8")
+                fichiers = self._fichiers()
+                for ancien in fichiers[:max(0, len(fichiers) - self.taille)]:
+                    ancien.unlink(missing_ok=True)
+        except OSError:
+            log.exception("échec d'écriture d'un profil", extra={"profil": profil.get("id")})
+
+    def lister(self) -> List[Dict[str, Any]]:
+        resumes = []
+        for fichier in reversed(self._fichiers()):
+            try:
+                profil = json.loads(fichier.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                continue
+            profil.pop("stacks", None)
+            resumes.append(profil)
+        return resumes
+
+    def lire(self, profil_id: str) -> Optional[Dict[str, Any]]:
+        if not _ID_PROFIL.match(profil_id):
+            return None
+        try:
+            return json.loads((self.dossier / f"{profil_id}.json").read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+
+anneau = AnneauProfils()
+
+
+def _nouvel_id() -> str:
+    return f"{time.time_ns():x}"
+
+
+def _est_flux_continu(message) -> bool:
+    for nom, valeur in message.get("headers", []):
+        if nom.lower() == b"content-type":
+            return valeur.startswith(b"text/event-stream")
+    return False
+
+
+class MiddlewareProfilage:
+    """Profile une fraction ``taux`` des requêtes et celles qui portent l'en-tête
+    X-Grouply-Profile (valeur : le jeton admin). Pour une requête qui dépasse ``seuil``,
+    l'échantillonneur démarre en cours de route : son profil couvre la fin de la
+    requête, la ventilation par phase la couvre en entier. Une réponse
+    text/event-stream sort du suivi dès son premier envoi."""
+
+    def __init__(self, app, taux: float = PROFILE_SAMPLE_RATE, seuil: float = SLOW_REQUEST_SECONDS,
+                 anneau: AnneauProfils = anneau) -> None:
+        self.app, self.taux, self.seuil, self.anneau = app, taux, seuil, anneau
+        self.veilleur = Veilleur(seuil) if seuil > 0 else None
+
+    def _motif(self, scope) -> Optional[str]:
+        for nom, valeur in scope["headers"]:
+            if nom == ENTETE_PROFIL:
+                if jeton_admin_valide(valeur.decode("latin-1")):
+                    return "header"
+                break
+        if self.taux > 0 and random.random() < self.taux:
+            return "sample"
+        return None
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        motif = self._motif(scope)
+        profil_id = _nouvel_id() if motif else None
+        cible = threading.get_ident()
+        requete = _Requete(cible, _demarrer_echantillonneur(cible) if motif else None)
+        if self.veilleur is not None:
+            self.veilleur.suivre(requete)
+
+        ventilation: Dict[str, float] = {}
+        jeton = ventilation_courante.set(ventilation)
+        debut_horloge = datetime.now(timezone.utc)
+        statut = 500
+        flux = False
+
+        async def envoyer(message) -> None:
+            nonlocal statut, flux
+            if message["type"] == "http.response.start":
+                statut = message["status"]
+                if motif is None and _est_flux_continu(message):
+                    # SSE : la connexion dure par nature, ce n'est pas une requête lente
+                    flux = True
+                    self._detacher(requete)
+                if profil_id is not None:
+                    message = {**message, "headers": [*message.get("headers", []),
+                                                      (b"x-grouply-profile-id", profil_id.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, envoyer)
+        finally:
+            duree = perf_counter() - requete.debut
+            ventilation_courante.reset(jeton)
+            piles = self._detacher(requete)
+            if motif is not None or (not flux and duree >= self.seuil > 0):
+                self._enregistrer(scope, profil_id or _nouvel_id(), motif or "slow", statut,
+                                  debut_horloge, duree, ventilation, piles)
+
+    def _detacher(self, requete: _Requete) -> Counter:
+        if self.veilleur is not None:
+            fenetre = self.veilleur.oublier(requete)
+        else:
+            fenetre, requete.echantillonneur = requete.echantillonneur, None
+        return _arreter_echantillonneur(fenetre) if fenetre is not None else Counter()
+
+    def _enregistrer(self, scope, profil_id: str, motif: str, statut: int, debut: datetime, duree: float,
+                     ventilation: Dict[str, float], piles: Counter) -> None:
+        route = getattr(scope.get("route"), "path", None)
+        ventilation = {phase: round(v, 6) for phase, v in ventilation.items()}
+        ventilation["other"] = round(max(0.0, duree - sum(ventilation.values())), 6)
+        profil = {
+            "id": profil_id, "reason": motif, "method": scope["method"], "path": scope["path"], "route": route,
+            "status": statut, "started_at": debut.isoformat(), "duration": round(duree, 6),
+            "breakdown": ventilation, "samples": sum(piles.values()), "stacks": dict(piles.most_common()),
+        }
+        if motif == "slow":
+            log.warning("requête lente", extra={"profil": profil_id, "route": route, "duree": profil["duration"],
+                                                "ventilation": ventilation})
+        asyncio.get_running_loop().run_in_executor(None, self.anneau.ecrire, profil)
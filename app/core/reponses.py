@@ -0,0 +1,47 @@
+import json
+from collections.abc import Mapping
+from typing import Any, Dict, Iterable, List, Tuple
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # dépendance optionnelle : repli sur json, plus lent mais identique
+    orjson = None
+
+
+def vers_dict(objet: Any) -> Dict[str, Any]:
+    """Crochet ``default`` de json et orjson : les enregistrements compacts de la
+    base (app.storage.enregistrements) sont des Mapping, pas des dict."""
+    if isinstance(objet, Mapping):
+        en_dict = getattr(objet, "en_dict", None)
+        return en_dict() if en_dict is not None else dict(objet)
+    raise TypeError(f"{type(objet).__name__} n'est pas sérialisable en JSON")
+
+
+def vers_dict_ou_texte(objet: Any) -> Any:
+    return vers_dict(objet) if isinstance(objet, Mapping) else str(objet)
+
+
+def encoder_json(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=vers_dict, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=vers_dict).encode("utf-8")
+
+
+class ReponseJSON(JSONResponse):
+    """Réponse JSON par défaut de l'API, sérialisée par orjson quand il est installé."""
+
+    def render(self, content: Any) -> bytes:
+        return encoder_json(content)
+
+
+def projeter(objets: Iterable[Dict[str, Any]], champs: Tuple[str, ...]) -> List[Dict[str, Any]]:
+    return [{c: o.get(c) for c in champs} for o in objets]
+
+
+def reponse_projetee(objets: Iterable[Dict[str, Any]], champs: Tuple[str, ...], response: Response) -> ReponseJSON:
+    """Renvoie seulement ``champs`` (déjà validés contre le modèle de sortie), sans repasser par
+    le response_model ; les en-têtes posés sur ``response`` (ETag...) sont repris."""
+    return ReponseJSON(projeter(objets, champs), headers=dict(response.headers))
@@ -1,12 +1,13 @@
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
+import hmac
 import json
+import logging
 
 from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import jwt, JWTError, ExpiredSignatureError
 
-from app.core.config import SECRET_KEY, ALGORITHM
+from app.core.config import ADMIN_TOKEN, SECRET_KEY, ALGORITHM
 from app.storage.json_db import (
     trouver_utilisateur_par_email,
     trouver_utilisateur_par_id,
@@ -15,19 +16,29 @@ from app.storage.json_db import (
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login/oauth")
 
+log = logging.getLogger(__name__)
+
+def jeton_admin_valide(valeur: Optional[str]) -> bool:
+    return bool(ADMIN_TOKEN) and valeur is not None and hmac.compare_digest(valeur, ADMIN_TOKEN)
+
 def creer_access_token(data: Dict[str, Any]) -> str:
 
-    print("payload:",data)
+    log.debug("jeton émis", extra={"user_id": data.get("id")})
 
     payload = {
         "iat": datetime.now(),
         "exp": datetime.now() + timedelta(hours=24),
         "sub": json.dumps(data)
     }
+    from jose import jwt
+
     token = jwt.encode(payload, SECRET_KEY, ALGORITHM)
     return token
 
 def decoder_access_token(token: str) -> Dict[str, Any]:
+    # import différé, préchargé par app.core.demarrage avant que l'instance soit prête
+    from jose import jwt, JWTError, ExpiredSignatureError
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         return payload
@@ -39,12 +50,12 @@ def decoder_access_token(token: str) -> Dict[str, Any]:
 async def authentifier_utilisateur(email: str, password: str) -> Optional[Dict[str, Any]]:
 
     user = await trouver_utilisateur_par_email(email)
-    print("\nuser:",user)
     if not user:
+        log.info("connexion refusée : email inconnu", extra={"email": email})
         return None
     hashed = user.get("hashed_password", "")  
-    print(verifier_mot_de_passe(hashed, password))
     if not verifier_mot_de_passe(hashed, password):
+        log.info("connexion refusée : mot de passe incorrect", extra={"user_id": user.get("id")})
         return None
     return user
 
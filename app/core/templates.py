@@ -0,0 +1,109 @@
+import asyncio
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Callable, Dict, Hashable, Iterator, List, Tuple
+
+from fastapi.responses import StreamingResponse
+from fastapi.templating import Jinja2Templates
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, nodes, select_autoescape
+from jinja2.ext import Extension
+
+from app.core.config import DEBUG, FRAGMENT_CACHE_SIZE, STREAM_CHUNK_SIZE, TEMPLATES_CACHE_DIR, TEMPLATES_DIR
+
+
+class CacheFragments:
+    def __init__(self, taille_max: int) -> None:
+        self.taille_max = taille_max
+        self._entrees: "OrderedDict[Tuple[Hashable, ...], Any]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def obtenir(self, cle: Tuple[Hashable, ...], rendre: Callable[[], Any]) -> Any:
+        try:
+            valeur = self._entrees[cle]
+        except KeyError:
+            self.misses += 1
+            valeur = rendre()
+            self._entrees[cle] = valeur
+            if len(self._entrees) > self.taille_max:
+                self._entrees.popitem(last=False)
+            return valeur
+        self.hits += 1
+        self._entrees.move_to_end(cle)
+        return valeur
+
+    def vider(self) -> None:
+        self._entrees.clear()
+
+
+class FragmentCacheExtension(Extension):
+    """``{% cache "task-row", t.id, t.updated_at %}...{% endcache %}``
+
+    Le rendu du bloc est mémorisé sous la clé formée par les expressions : la
+    dernière doit être la version de l'enregistrement pour qu'une modification
+    produise une nouvelle entrée. Le contenu ne doit pas dépendre de l'utilisateur.
+    """
+
+    tags = {"cache"}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        while parser.stream.skip_if("comma"):
+            args.append(parser.parse_expression())
+        body = parser.parse_statements(("name:endcache",), drop_needle=True)
+        call = self.call_method("_rendre_en_cache", [nodes.Tuple(args, "load")])
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+    def _rendre_en_cache(self, cle: Tuple[Hashable, ...], caller: Callable[[], Any]) -> Any:
+        return fragments.obtenir(cle, caller)
+
+
+fragments = CacheFragments(FRAGMENT_CACHE_SIZE)
+
+TEMPLATES_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+env = Environment(
+    loader=FileSystemLoader(str(TEMPLATES_DIR)),
+    autoescape=select_autoescape(default=True),
+    bytecode_cache=FileSystemBytecodeCache(str(TEMPLATES_CACHE_DIR)),
+    auto_reload=DEBUG,
+    extensions=[FragmentCacheExtension],
+)
+templates = Jinja2Templates(env=env)
+
+
+def precompiler_templates() -> int:
+    noms = env.list_templates(extensions=["html"])
+    for nom in noms:
+        env.get_template(nom)
+    return len(noms)
+
+
+async def regrouper_morceaux(morceaux: Iterator[str], taille: int) -> AsyncIterator[str]:
+    tampon: List[str] = []
+    n = 0
+    for morceau in morceaux:
+        tampon.append(morceau)
+        n += len(morceau)
+        if n >= taille:
+            yield "".join(tampon)
+            tampon.clear()
+            n = 0
+            await asyncio.sleep(0)
+    if tampon:
+        yield "".join(tampon)
+
+
+def reponse_en_flux(nom: str, contexte: Dict[str, Any], status_code: int = 200) -> StreamingResponse:
+    """Rend ``nom`` morceau par morceau : les itérables du contexte ne sont
+    consommés qu'au fil de l'envoi, le début de la page part avant les lignes.
+
+    Le premier octet attend toutefois le chargement de la base : l'authentification
+    et les contrôles d'accès la lisent avant que le statut puisse partir, et les
+    itérables parcourent une base déjà décodée. Le flux borne le coût du rendu,
+    pas celui de la lecture de db.json."""
+    morceaux = env.get_template(nom).generate(contexte)
+    return StreamingResponse(
+        regrouper_morceaux(morceaux, STREAM_CHUNK_SIZE),
+        status_code=status_code,
+        media_type="text/html; charset=utf-8",
+    )
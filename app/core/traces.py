@@ -0,0 +1,234 @@
+"""Traces par requête : un span par couche traversée (http, router, service, crud, storage).
+
+Le span courant vit dans une ContextVar : il suit les tâches asyncio, et
+``dans_executeur`` copie le contexte vers le thread de l'exécuteur. Hors d'une
+requête échantillonnée, un span ne coûte qu'une lecture de ContextVar. Les
+traces terminées sont sérialisées et écrites en JSON lines par un thread dédié.
+"""
+import asyncio
+import functools
+import inspect
+import itertools
+import json
+import logging
+import queue
+import random
+import secrets
+import sys
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from datetime import datetime, timezone
+from pathlib import Path
+from time import perf_counter_ns
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from fastapi.routing import APIRoute
+
+from app.core.config import TRACE_FILE, TRACE_MAX_BYTES, TRACE_SAMPLE_RATE
+
+log = logging.getLogger(__name__)
+
+
+class Trace:
+    __slots__ = ("trace_id", "debut", "spans", "_ids")
+
+    def __init__(self) -> None:
+        self.trace_id = secrets.token_hex(8)
+        self.debut = datetime.now(timezone.utc)
+        self.spans: List["Span"] = []
+        self._ids = itertools.count(1)
+
+    def en_dict(self) -> Dict[str, Any]:
+        racine = self.spans[-1]
+        return {
+            "trace_id": self.trace_id,
+            "name": racine.nom,
+            "start": self.debut.isoformat(),
+            "duration_ms": racine.duree_ms(),
+            "spans": [s.en_dict(racine.debut) for s in self.spans],
+        }
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "nom", "couche", "debut", "fin", "attributs")
+
+    def __init__(self, trace: Trace, parent_id: Optional[int], nom: str, couche: str,
+                 attributs: Dict[str, Any]) -> None:
+        self.trace, self.parent_id, self.nom, self.couche, self.attributs = trace, parent_id, nom, couche, attributs
+        self.span_id = next(trace._ids)
+        self.debut = perf_counter_ns()
+        self.fin = self.debut
+
+    def duree_ms(self) -> float:
+        return round((self.fin - self.debut) / 1e6, 3)
+
+    def en_dict(self, origine: int) -> Dict[str, Any]:
+        return {
+            "id": self.span_id, "parent": self.parent_id, "name": self.nom, "layer": self.couche,
+            "start_ms": round((self.debut - origine) / 1e6, 3), "duration_ms": self.duree_ms(),
+            "attrs": self.attributs,
+        }
+
+
+_span_courant: ContextVar[Optional[Span]] = ContextVar("span_courant", default=None)
+
+
+@contextmanager
+def span(nom: str, couche: str, **attributs: Any) -> Iterator[Optional[Span]]:
+    parent = _span_courant.get()
+    if parent is None:
+        yield None
+        return
+    courant = Span(parent.trace, parent.span_id, nom, couche, attributs)
+    jeton = _span_courant.set(courant)
+    try:
+        yield courant
+    finally:
+        courant.fin = perf_counter_ns()
+        _span_courant.reset(jeton)
+        parent.trace.spans.append(courant)
+
+
+def tracer(couche: str, nom: Optional[str] = None) -> Callable[[Callable], Callable]:
+    """Décorateur : un span par appel, fonctions synchrones ou coroutines."""
+    def decorateur(fonction: Callable) -> Callable:
+        libelle = nom or f"{fonction.__module__}.{fonction.__qualname__}"
+        if inspect.iscoroutinefunction(fonction):
+            @functools.wraps(fonction)
+            async def enveloppe_async(*args, **kwargs):
+                if _span_courant.get() is None:
+                    return await fonction(*args, **kwargs)
+                with span(libelle, couche):
+                    return await fonction(*args, **kwargs)
+            return enveloppe_async
+
+        @functools.wraps(fonction)
+        def enveloppe(*args, **kwargs):
+            if _span_courant.get() is None:
+                return fonction(*args, **kwargs)
+            with span(libelle, couche):
+                return fonction(*args, **kwargs)
+        return enveloppe
+    return decorateur
+
+
+def tracer_module(nom_module: str, couche: str) -> None:
+    """Trace les coroutines publiques définies dans le module ; à appeler en fin de
+    module, avant que d'autres modules n'en importent les noms."""
+    module = sys.modules[nom_module]
+    for nom, valeur in list(vars(module).items()):
+        if (not nom.startswith("_") and inspect.iscoroutinefunction(valeur)
+                and getattr(valeur, "__module__", None) == nom_module):
+            setattr(module, nom, tracer(couche)(valeur))
+
+
+def dans_executeur(fonction: Callable, *args: Any) -> "asyncio.Future[Any]":
+    """``run_in_executor`` qui emporte le contexte : les spans ouverts dans le
+    thread se rattachent à la trace de la requête."""
+    contexte = copy_context()
+    return asyncio.get_running_loop().run_in_executor(None, functools.partial(contexte.run, fonction, *args))
+
+
+class RouteTracee(APIRoute):
+    """Route FastAPI dont le traitement (dépendances, endpoint, sérialisation) forme le span « router »."""
+
+    def get_route_handler(self) -> Callable:
+        gestionnaire = super().get_route_handler()
+        libelle = f"{self.endpoint.__module__}.{self.endpoint.__qualname__}"
+
+        async def gestionnaire_trace(request):
+            if _span_courant.get() is None:
+                return await gestionnaire(request)
+            with span(libelle, "router", route=self.path):
+                return await gestionnaire(request)
+
+        return gestionnaire_trace
+
+
+class ExportateurJSONL:
+    """Une trace par ligne ; au-delà de ``taille_max`` octets le fichier est
+    renommé en ``.1`` (l'ancien ``.1`` est écrasé)."""
+
+    def __init__(self, chemin: Path = TRACE_FILE, taille_max: int = TRACE_MAX_BYTES) -> None:
+        self.chemin, self.taille_max = chemin, taille_max
+        self._file: "queue.SimpleQueue[Optional[Trace]]" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._verrou = threading.Lock()
+
+    def exporter(self, trace: Trace) -> None:
+        if self._thread is None:
+            with self._verrou:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._boucle, name="traces", daemon=True)
+                    self._thread.start()
+        self._file.put(trace)
+
+    def _boucle(self) -> None:
+        sortie = None
+        try:
+            while True:
+                trace = self._file.get()
+                if trace is None:
+                    break
+                try:
+                    if sortie is None:
+                        self.chemin.parent.mkdir(parents=True, exist_ok=True)
+                        sortie = self.chemin.open("a", encoding="utf-8")
+                    sortie.write(json.dumps(trace.en_dict(), ensure_ascii=False, default=str) + "\n")
+                    sortie.flush()
+                    if sortie.tell() >= self.taille_max:
+                        sortie.close()
+                        sortie = None
+                        self.chemin.replace(self.chemin.with_name(self.chemin.name + ".1"))
+                except OSError:
+                    log.exception("échec d'écriture d'une trace")
+                    sortie = None
+        finally:
+            if sortie is not None:
+                sortie.close()
+
+    def arreter(self) -> None:
+        with self._verrou:
+            if self._thread is not None:
+                self._file.put(None)
+                self._thread.join()
+                self._thread = None
+
+
+exportateur = ExportateurJSONL()
+
+
+class MiddlewareTraces:
+    """Ouvre le span racine (couche « http ») d'une fraction ``taux`` des requêtes."""
+
+    def __init__(self, app, taux: float = TRACE_SAMPLE_RATE, exportateur: ExportateurJSONL = exportateur) -> None:
+        self.app, self.taux, self.exportateur = app, taux, exportateur
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or self.taux <= 0 or _span_courant.get() is not None \
+                or random.random() >= self.taux:
+            await self.app(scope, receive, send)
+            return
+        trace = Trace()
+        racine = Span(trace, None, f"{scope['method']} {scope['path']}", "http", {"path": scope["path"]})
+        jeton = _span_courant.set(racine)
+        statut = 500
+
+        async def envoyer(message) -> None:
+            nonlocal statut
+            if message["type"] == "http.response.start":
+                statut = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, envoyer)
+        finally:
+            racine.fin = perf_counter_ns()
+            _span_courant.reset(jeton)
+            route = getattr(scope.get("route"), "path", None)
+            if route is not None:
+                racine.nom = f"{scope['method']} {route}"
+            racine.attributs["status"] = statut
+            trace.spans.append(racine)
+            self.exportateur.exporter(trace)
@@ -1,13 +1,18 @@
 from datetime import datetime
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Iterator, List, Optional
 from pathlib import Path
 import json
+from app.core.traces import tracer_module
 from app.storage.json_db import (
     charger_db,
     sauvegarder_db,
+    noter_changement,
     ajouter_groupe,
     obtenir_groupe_par_id,
 )
+from app.crud.patch import ResultatPatch, appliquer_patch
+
+CHAMPS_MODIFIABLES_GROUPE = ("name", "description", "owner_id")
 
 async def creer_groupe(name: str, description: Optional[str], owner_id: Optional[int]) -> Dict[str, Any]:
     data = await charger_db()
@@ -24,20 +29,20 @@ async def lister_groupes() -> List[Dict[str, Any]]:
     data = await charger_db()
     return data.get("groups", [])
 
-async def mettre_a_jour_groupe(group_id: int, patch: Dict[str, Any]) -> Dict[str, Any]:
+async def patcher_groupe(group_id: int, patch: Dict[str, Any]) -> ResultatPatch:
     data = await charger_db()
     for g in data.get("groups", []):
         if g.get("id") == group_id:
-            if "name" in patch:
-                g["name"] = patch["name"]
-            if "description" in patch:
-                g["description"] = patch["description"]
-            if "owner_id" in patch:
-                g["owner_id"] = patch["owner_id"]
-            await sauvegarder_db(data)
-            return g
+            resultat = appliquer_patch(g, patch, CHAMPS_MODIFIABLES_GROUPE)
+            if resultat.modifie:
+                await sauvegarder_db(data)
+                noter_changement("groups", group_id, "update", group_id, objet=g, champs=resultat.champs_modifies)
+            return resultat
     raise KeyError("Groupe introuvable")
 
+async def mettre_a_jour_groupe(group_id: int, patch: Dict[str, Any]) -> Dict[str, Any]:
+    return (await patcher_groupe(group_id, patch)).objet
+
 async def supprimer_groupe(group_id: int) -> None:
     data = await charger_db()
     groups = data.get("groups", [])
@@ -46,8 +51,13 @@ async def supprimer_groupe(group_id: int) -> None:
         raise KeyError("Groupe introuvable")
     data["groups"] = new_groups
 
-    data["tasks"] = [t for t in data.get("tasks", []) if t.get("group_id") != group_id]
+    taches = data.get("tasks", [])
+    data["tasks"] = [t for t in taches if t.get("group_id") != group_id]
     await sauvegarder_db(data)
+    noter_changement("groups", group_id, "delete", group_id)
+    for t in taches:
+        if t.get("group_id") == group_id:
+            noter_changement("tasks", t.get("id"), "delete", group_id, utilisateurs=(t.get("assigned_to_id"),))
 
 async def ajouter_membre(group_id: int, user_id: int) -> None:
     data = await charger_db()
@@ -56,9 +66,29 @@ async def ajouter_membre(group_id: int, user_id: int) -> None:
             if user_id not in g.setdefault("members", []):
                 g["members"].append(user_id)
                 await sauvegarder_db(data)
+                noter_changement("members", user_id, "create", group_id)
             return
     raise KeyError("Groupe introuvable")
 
+async def ajouter_membres_en_lot(group_id: int, user_ids: List[int]) -> List[int]:
+    data = await charger_db()
+    for g in data.get("groups", []):
+        if g.get("id") == group_id:
+            members = g.setdefault("members", [])
+            deja = set(members)
+            ajoutes = []
+            for user_id in user_ids:
+                if user_id not in deja:
+                    deja.add(user_id)
+                    ajoutes.append(user_id)
+            if ajoutes:
+                members.extend(ajoutes)
+                await sauvegarder_db(data)
+                for user_id in ajoutes:
+                    noter_changement("members", user_id, "create", group_id)
+            return ajoutes
+    raise KeyError("Groupe introuvable")
+
 async def retirer_membre(group_id: int, user_id: int) -> None:
     data = await charger_db()
     for g in data.get("groups", []):
@@ -67,10 +97,11 @@ async def retirer_membre(group_id: int, user_id: int) -> None:
             if user_id in members:
                 members.remove(user_id)
                 await sauvegarder_db(data)
+                noter_changement("members", user_id, "delete", group_id)
             return
     raise KeyError("Groupe introuvable")
 
-async def lister_groupes_par_utilisateur(user_id: int) -> List[Dict[str, Any]]:
+async def iterer_groupes_par_utilisateur(user_id: int) -> Iterator[Dict[str, Any]]:
 
     try:
         db = await charger_db()
@@ -93,21 +124,24 @@ async def lister_groupes_par_utilisateur(user_id: int) -> List[Dict[str, Any]]:
                 except Exception:
                     continue
 
-    result: List[Dict[str, Any]] = []
+    return _filtrer_groupes_du_membre(groupes, user_id)
+
+def _filtrer_groupes_du_membre(groupes: List[Dict[str, Any]], user_id: int) -> Iterator[Dict[str, Any]]:
     for g in groupes:
         members = g.get("members", [])
         try:
             if int(user_id) in [int(m) for m in members]:
                 g_copy = dict(g)
                 g_copy["member_count"] = len(members)
-                result.append(g_copy)
+                yield g_copy
         except Exception:
             if str(user_id) in [str(m) for m in members]:
                 g_copy = dict(g)
                 g_copy["member_count"] = len(members)
-                result.append(g_copy)
+                yield g_copy
 
-    return result
+async def lister_groupes_par_utilisateur(user_id: int) -> List[Dict[str, Any]]:
+    return list(await iterer_groupes_par_utilisateur(user_id))
 
 
 
@@ -127,6 +161,7 @@ async def creer_invitation(group_id: int, token: str, created_by: Optional[int],
     }
     data.setdefault("invites", []).append(invite)
     await sauvegarder_db(data)
+    noter_changement("invites", invite["id"], "create")
     return invite
 
 
@@ -149,10 +184,9 @@ async def incrementer_utilisation_invite(token: str) -> bool:
             if inv["uses_count"] >= inv.get("max_uses", 1):
                 inv["is_active"] = False
             await sauvegarder_db(data)
+            noter_changement("invites", inv.get("id"), "update", champs=("uses_count", "is_active"))
             return True
     return False
 
 
-
-
-
+tracer_module(__name__, "crud")
@@ -0,0 +1,22 @@
+from typing import Any, Dict, Iterable, List, NamedTuple
+
+_ABSENT = object()
+
+
+class ResultatPatch(NamedTuple):
+    objet: Dict[str, Any]
+    champs_modifies: List[str]
+
+    @property
+    def modifie(self) -> bool:
+        return bool(self.champs_modifies)
+
+
+def calculer_diff(obj: Dict[str, Any], patch: Dict[str, Any], champs: Iterable[str]) -> Dict[str, Any]:
+    return {c: patch[c] for c in champs if c in patch and obj.get(c, _ABSENT) != patch[c]}
+
+
+def appliquer_patch(obj: Dict[str, Any], patch: Dict[str, Any], champs: Iterable[str]) -> ResultatPatch:
+    diff = calculer_diff(obj, patch, champs)
+    obj.update(diff)
+    return ResultatPatch(obj, list(diff))
@@ -1,6 +1,8 @@
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Iterator, List, Optional
 from datetime import datetime
-from app.storage.json_db import charger_db, sauvegarder_db
+from app.core.traces import tracer_module
+from app.storage.json_db import charger_db, sauvegarder_db, noter_changement
+from app.crud.patch import ResultatPatch, appliquer_patch
 from pathlib import Path
 import json
 
@@ -25,8 +27,36 @@ async def creer_tache(title: str, description: Optional[str] = None,
     data.setdefault("tasks", []).append(task)
     data["next_ids"]["tasks"] = nid + 1
     await sauvegarder_db(data)
+    noter_changement("tasks", nid, "create", group_id, objet=task, utilisateurs=(assigned_to_id,))
     return task
 
+async def creer_taches_en_lot(lignes: List[Dict[str, Any]], group_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    data = await charger_db()
+    nid = data.setdefault("next_ids", {}).get("tasks", 1)
+    maintenant = datetime.utcnow().isoformat()
+    taches = []
+    for ligne in lignes:
+        taches.append({
+            "id": nid,
+            "title": ligne["title"],
+            "description": ligne.get("description"),
+            "status": "todo",
+            "assigned_to_id": ligne.get("assigned_to_id"),
+            "group_id": group_id,
+            "due_date": ligne.get("due_date"),
+            "created_at": maintenant,
+            "updated_at": maintenant,
+        })
+        nid += 1
+    if not taches:
+        return taches
+    data.setdefault("tasks", []).extend(taches)
+    data["next_ids"]["tasks"] = nid
+    await sauvegarder_db(data)
+    for t in taches:
+        noter_changement("tasks", t["id"], "create", group_id, objet=t, utilisateurs=(t.get("assigned_to_id"),))
+    return taches
+
 async def recuperer_tache(task_id: int) -> Optional[Dict[str, Any]]:
     data = await charger_db()
     for t in data.get("tasks", []):
@@ -34,31 +64,33 @@ async def recuperer_tache(task_id: int) -> Optional[Dict[str, Any]]:
             return t
     return None
 
-async def lister_taches_par_groupe(group_id: int) -> List[Dict[str, Any]]:
+async def iterer_taches_par_groupe(group_id: int) -> Iterator[Dict[str, Any]]:
     data = await charger_db()
-    return [t for t in data.get("tasks", []) if t.get("group_id") == group_id]
+    return (t for t in data.get("tasks", []) if t.get("group_id") == group_id)
 
-async def mettre_a_jour_tache(task_id: int, patch: Dict[str, Any]) -> Dict[str, Any]:
+async def lister_taches_par_groupe(group_id: int) -> List[Dict[str, Any]]:
+    return list(await iterer_taches_par_groupe(group_id))
+
+CHAMPS_MODIFIABLES_TACHE = ("title", "description", "status", "assigned_to_id", "group_id", "due_date")
+
+async def patcher_tache(task_id: int, patch: Dict[str, Any]) -> ResultatPatch:
     data = await charger_db()
     for t in data.get("tasks", []):
         if t.get("id") == task_id:
-            if "title" in patch:
-                t["title"] = patch["title"]
-            if "description" in patch:
-                t["description"] = patch["description"]
-            if "status" in patch:
-                t["status"] = patch["status"]
-            if "assigned_to_id" in patch:
-                t["assigned_to_id"] = patch["assigned_to_id"]
-            if "group_id" in patch:
-                t["group_id"] = patch["group_id"]
-            if "due_date" in patch:
-                t["due_date"] = patch["due_date"]
-            t["updated_at"] = datetime.utcnow().isoformat()
-            await sauvegarder_db(data)
-            return t
+            ancien_groupe, ancien_assigne = t.get("group_id"), t.get("assigned_to_id")
+            resultat = appliquer_patch(t, patch, CHAMPS_MODIFIABLES_TACHE)
+            if resultat.modifie:
+                t["updated_at"] = datetime.utcnow().isoformat()
+                await sauvegarder_db(data)
+                noter_changement("tasks", task_id, "update", ancien_groupe, t.get("group_id"),
+                                 objet=t, champs=resultat.champs_modifies + ["updated_at"],
+                                 utilisateurs=(ancien_assigne, t.get("assigned_to_id")))
+            return resultat
     raise KeyError("Tâche introuvable")
 
+async def mettre_a_jour_tache(task_id: int, patch: Dict[str, Any]) -> Dict[str, Any]:
+    return (await patcher_tache(task_id, patch)).objet
+
 async def supprimer_tache(task_id: int) -> None:
     data = await charger_db()
     tasks = data.get("tasks", [])
@@ -67,6 +99,8 @@ async def supprimer_tache(task_id: int) -> None:
         raise KeyError("Tâche introuvable")
     data["tasks"] = new_tasks
     await sauvegarder_db(data)
+    supprimee = next(t for t in tasks if t.get("id") == task_id)
+    noter_changement("tasks", task_id, "delete", supprimee.get("group_id"), utilisateurs=(supprimee.get("assigned_to_id"),))
 
 async def assigner_tache(task_id: int, user_id: Optional[int]) -> Dict[str, Any]:
     return await mettre_a_jour_tache(task_id, {"assigned_to_id": user_id})
@@ -74,7 +108,7 @@ async def assigner_tache(task_id: int, user_id: Optional[int]) -> Dict[str, Any]
 async def changer_statut(task_id: int, statut: str) -> Dict[str, Any]:
     return await mettre_a_jour_tache(task_id, {"status": statut})
 
-async def lister_taches_par_utilisateur(user_id: int) -> List[Dict[str, Any]]:
+async def iterer_taches_par_utilisateur(user_id: int) -> Iterator[Dict[str, Any]]:
 
     try:
         db = await charger_db()
@@ -97,19 +131,22 @@ async def lister_taches_par_utilisateur(user_id: int) -> List[Dict[str, Any]]:
                 except Exception:
                     continue
 
-    result: List[Dict[str, Any]] = []
+    return _filtrer_taches_assignees(tasks, user_id)
+
+def _filtrer_taches_assignees(tasks: List[Dict[str, Any]], user_id: int) -> Iterator[Dict[str, Any]]:
     for t in tasks:
         assigned = t.get("assigned_to_id") if "assigned_to_id" in t else t.get("assigned_to")
         if assigned is None:
             continue
         try:
             if int(assigned) == int(user_id):
-                result.append(t)
+                yield t
         except Exception:
             if str(assigned) == str(user_id):
-                result.append(t)
+                yield t
 
-    return result
+async def lister_taches_par_utilisateur(user_id: int) -> List[Dict[str, Any]]:
+    return list(await iterer_taches_par_utilisateur(user_id))
 
 async def associer_tache_a_groupe_crud(task_id: int, group_id: int) -> Dict[str, Any]:
 
@@ -117,7 +154,13 @@ async def associer_tache_a_groupe_crud(task_id: int, group_id: int) -> Dict[str,
     tasks = db.get("tasks", [])
     for t in tasks:
         if int(t.get("id")) == int(task_id):
-            t["group_id"] = group_id
-            await sauvegarder_db(db)
+            ancien_groupe = t.get("group_id")
+            if appliquer_patch(t, {"group_id": group_id}, ("group_id",)).modifie:
+                await sauvegarder_db(db)
+                noter_changement("tasks", t.get("id"), "update", ancien_groupe, group_id, objet=t, champs=("group_id",),
+                                 utilisateurs=(t.get("assigned_to_id"),))
             return t
     raise KeyError("Tâche introuvable")
+
+
+tracer_module(__name__, "crud")
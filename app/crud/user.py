@@ -1,20 +1,26 @@
 from typing import Dict, Any, Optional
+from app.core.traces import tracer_module
+from app.crud.patch import ResultatPatch, appliquer_patch
 from app.storage.json_db import (
     charger_db,
     sauvegarder_db,
+    noter_changement,
     trouver_utilisateur_par_email,
     trouver_utilisateur_par_id,
     ajouter_utilisateur,
-    hacher_mot_de_passe,
+    hacher_hors_verrou,
 )
 
 async def creer_utilisateur(email: str, password: str, full_name: Optional[str] = None) -> Dict[str, Any]:
+    # haché avant la recherche : le verrou d'écriture est rendu pendant bcrypt,
+    # la recherche doit voir ce que d'autres requêtes ont validé entre-temps
+    hashed_password = await hacher_hors_verrou(password)
     existing = await trouver_utilisateur_par_email(email)
     if existing:
         raise ValueError("Email déjà utilisé")
     user_obj = {
         "email": email,
-        "hashed_password": hacher_mot_de_passe(password),
+        "hashed_password": hashed_password,
         "full_name": full_name,
         "is_active": True,
     }
@@ -26,21 +32,32 @@ async def recuperer_utilisateur_par_id(user_id: int) -> Optional[Dict[str, Any]]
 async def recuperer_utilisateur_par_email(email: str) -> Optional[Dict[str, Any]]:
     return await trouver_utilisateur_par_email(email)
 
-async def mettre_a_jour_utilisateur(user_id: int, patch: Dict[str, Any]) -> Dict[str, Any]:
+async def indexer_utilisateurs_par_email() -> Dict[str, Dict[str, Any]]:
+    data = await charger_db()
+    return {str(u["email"]).strip().lower(): u for u in data.get("users", []) if u.get("email")}
 
+async def patcher_utilisateur(user_id: int, patch: Dict[str, Any]) -> ResultatPatch:
+    hashed_password = await hacher_hors_verrou(patch["password"]) if patch.get("password") else None
     data = await charger_db()
     for u in data.get("users", []):
         if u.get("id") == user_id:
+            normalise: Dict[str, Any] = {}
             if "full_name" in patch:
-                u["full_name"] = patch["full_name"]
+                normalise["full_name"] = patch["full_name"]
             if "is_active" in patch:
-                u["is_active"] = bool(patch["is_active"])
-            if "password" in patch and patch["password"]:
-                u["hashed_password"] = hacher_mot_de_passe(patch["password"])
-            await sauvegarder_db(data)
-            return u
+                normalise["is_active"] = bool(patch["is_active"])
+            if hashed_password is not None:
+                normalise["hashed_password"] = hashed_password
+            resultat = appliquer_patch(u, normalise, normalise.keys())
+            if resultat.modifie:
+                await sauvegarder_db(data)
+                noter_changement("users", user_id, "update", champs=resultat.champs_modifies)
+            return resultat
     raise KeyError("Utilisateur introuvable")
 
+async def mettre_a_jour_utilisateur(user_id: int, patch: Dict[str, Any]) -> Dict[str, Any]:
+    return (await patcher_utilisateur(user_id, patch)).objet
+
 async def supprimer_utilisateur(user_id: int) -> None:
     data = await charger_db()
     users = data.get("users", [])
@@ -49,11 +66,24 @@ async def supprimer_utilisateur(user_id: int) -> None:
         raise KeyError("Utilisateur introuvable")
     data["users"] = new_users
     
+    groupes_quittes = []
     for g in data.get("groups", []):
         members = g.get("members", [])
         if user_id in members:
             members.remove(user_id)
+            groupes_quittes.append(g.get("id"))
+    taches_liberees = []
     for t in data.get("tasks", []):
         if t.get("assigned_to_id") == user_id:
             t["assigned_to_id"] = None
+            taches_liberees.append(t)
     await sauvegarder_db(data)
+    noter_changement("users", user_id, "delete")
+    for gid in groupes_quittes:
+        noter_changement("members", user_id, "delete", gid)
+    for t in taches_liberees:
+        noter_changement("tasks", t.get("id"), "update", t.get("group_id"), objet=t, champs=("assigned_to_id",),
+                         utilisateurs=(user_id, None))
+
+
+tracer_module(__name__, "crud")
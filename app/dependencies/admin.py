@@ -0,0 +1,8 @@
+from typing import Optional
+from fastapi import Header, HTTPException, status
+
+from app.core.security import jeton_admin_valide
+
+async def verifier_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    if not jeton_admin_valide(x_admin_token):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Accès réservé à l'administration")
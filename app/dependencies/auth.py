@@ -3,8 +3,11 @@ from fastapi import Request, HTTPException, status, Depends
 from app.core.security import decoder_access_token 
 from app.services.auth import recuperer_profil
 import json
+import logging
 from fastapi import Request
 
+log = logging.getLogger(__name__)
+
 async def get_token_from_request(request: Request) -> Optional[str]:
 
     token = request.cookies.get("access_token")
@@ -18,19 +21,22 @@ async def get_token_from_request(request: Request) -> Optional[str]:
     return None
 
 async def get_current_user(request: Request) -> Dict[str, Any]:
+    # sous-requête d'un /batch : l'utilisateur est déjà authentifié
+    user = getattr(request.state, "utilisateur", None)
+    if user is not None:
+        return user
+
     token = await get_token_from_request(request)
-    print("DEBUG token:", token)
     if not token:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Non authentifié")
 
     try:
         payload = decoder_access_token(token) 
     except Exception as e:
-        print("DEBUG token decode error:", e)
+        log.info("jeton refusé : %s", e)
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token invalide")
 
     sub = json.loads(payload.get("sub")) # type: ignore
-    print("\n\n\n\n", sub["sub"]) # type: ignore
     if sub is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token invalide: 'sub' manquant")
 
@@ -39,6 +45,7 @@ async def get_current_user(request: Request) -> Dict[str, Any]:
     except (TypeError, ValueError):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=f"Identifiant utilisateur invalide dans le token")
 
+    log.debug("utilisateur authentifié", extra={"user_id": user_id, "taux": 0.01})
     user = await recuperer_profil(user_id)
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Utilisateur introuvable")
@@ -0,0 +1,19 @@
+from typing import Callable, Optional, Tuple, Type
+from fastapi import HTTPException, Query, status
+from pydantic import BaseModel
+
+def get_champs(modele: Type[BaseModel]) -> Callable[..., Optional[Tuple[str, ...]]]:
+    autorises = tuple(modele.model_fields)
+
+    def dependance(
+        fields: Optional[str] = Query(None, description="Champs à renvoyer, séparés par des virgules : " + ", ".join(autorises)),
+    ) -> Optional[Tuple[str, ...]]:
+        if not fields:
+            return None
+        champs = tuple(dict.fromkeys(c.strip() for c in fields.split(",") if c.strip()))
+        inconnus = [c for c in champs if c not in autorises]
+        if inconnus:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Champs inconnus : " + ", ".join(inconnus))
+        return champs or None
+
+    return dependance
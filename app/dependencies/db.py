@@ -0,0 +1,22 @@
+from typing import AsyncIterator
+from fastapi import HTTPException, status
+from starlette.requests import HTTPConnection
+
+from app.storage.json_db import ConflitEcriture, snapshot_db
+
+METHODES_LECTURE = {"GET", "HEAD", "OPTIONS"}
+# POST qui ne font que lire : la connexion vérifie son mot de passe (bcrypt)
+# sans faire attendre les écritures
+CHEMINS_LECTURE = {"/batch", "/auth/login", "/auth/login/oauth"}
+
+async def get_db_snapshot(connexion: HTTPConnection) -> AsyncIterator[None]:
+    if connexion.scope["type"] != "http":
+        # une websocket vit trop longtemps pour garder un instantané ouvert
+        yield
+        return
+    try:
+        lecture = connexion.scope["method"] in METHODES_LECTURE or connexion.scope["path"] in CHEMINS_LECTURE
+        async with snapshot_db(ecriture=not lecture):
+            yield
+    except ConflitEcriture:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Conflit d'écriture, veuillez réessayer")
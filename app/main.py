@@ -1,16 +1,25 @@
-from fastapi import FastAPI, Request, Form, HTTPException
+from fastapi import FastAPI, Request, Form, HTTPException, Depends
 from fastapi.responses import FileResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
 from pathlib import Path
+import asyncio
 from app.storage.json_db import seed_db
-from app.routers import auth as auth_router, user as users_router, groupe as groups_router, tache as tasks_router, index as index_router
-from fastapi.openapi.utils import get_openapi
+from app.storage.evenements import bus
+from app.routers import auth as auth_router, user as users_router, groupe as groups_router, tache as tasks_router, index as index_router, sync as sync_router, batch as batch_router, metriques as metrics_router, admin as admin_router, sante as health_router
 from fastapi.staticfiles import StaticFiles
 from app.dependencies.auth import get_current_user
+from app.dependencies.db import get_db_snapshot
+from app.core.logs import arreter_logs, configurer_logs
+from app.core.metriques import MiddlewareMetriques, arreter_surveillance, demarrer_surveillance
+from app.core.profilage import MiddlewareProfilage
+from app.core.blocages import detecteur as detecteur_blocages
+from app.core.traces import MiddlewareTraces, RouteTracee, exportateur as exportateur_traces
+from app.core.reponses import ReponseJSON
+from app.core.templates import templates
+from app.core.demarrage import arreter as arreter_demarrage, lancer_prechauffage
 from app.services.groupe import obtenir_groupes_par_utilisateur
 from app.routers import auth as auth_router 
 from app.services.auth import inscrire_utilisateur
-from app.services.tache import lister_taches_par_utilisateur, list_taches_du_groupe
+from app.services.tache import lister_fil_utilisateur, list_taches_du_groupe
 
 
 
@@ -18,14 +27,19 @@ from app.services.tache import lister_taches_par_utilisateur, list_taches_du_gro
 
 
 BASE_DIR = Path(__file__).resolve().parent.parent
-TEMPLATES_DIR = BASE_DIR / "templates"
 STATIC_DIR = BASE_DIR / "static"
 
 
-app = FastAPI()
+configurer_logs()
+
+app = FastAPI(default_response_class=ReponseJSON, dependencies=[Depends(get_db_snapshot, scope="function")])
+app.router.route_class = RouteTracee
+
+app.add_middleware(MiddlewareMetriques)
+app.add_middleware(MiddlewareProfilage)
+app.add_middleware(MiddlewareTraces)
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
-templates = Jinja2Templates(directory=str(TEMPLATES_DIR))
 
 @app.get("/", include_in_schema=False)
 async def root(request: Request):
@@ -43,7 +57,7 @@ async def root(request: Request):
         return RedirectResponse(url="/login", status_code=303)
 
     user_id = int(raw_id)  
-    personal_tasks = await lister_taches_par_utilisateur(user_id)
+    personal_tasks = await lister_fil_utilisateur(user_id)
     groups = await obtenir_groupes_par_utilisateur(user_id)
     return templates.TemplateResponse("index.html", {"request": request, "user": user_safe, "tasks": personal_tasks, "groups": groups})
 
@@ -74,6 +88,8 @@ async def login_page(request: Request):
 def custom_openapi():
     if app.openapi_schema:
         return app.openapi_schema
+    from fastapi.openapi.utils import get_openapi
+
     openapi_schema = get_openapi(title=app.title, version="1.0.0", routes=app.routes)
     comps = openapi_schema.setdefault("components", {})
     schemes = comps.setdefault("securitySchemes", {})
@@ -90,11 +106,31 @@ app.openapi = custom_openapi
 
 @app.on_event("startup")
 async def on_startup():
+    detecteur_blocages.demarrer()
     await seed_db()  
+    bus.demarrer()
+    demarrer_surveillance()
+    # index et gabarits en tâche de fond : /readyz passe à 200 quand ils sont prêts
+    lancer_prechauffage()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await arreter_demarrage()
+    await bus.arreter()
+    await arreter_surveillance()
+    detecteur_blocages.arreter()
+    exportateur_traces.arreter()
+    arreter_logs()
 
 
 app.include_router(auth_router.router)
 app.include_router(users_router.router)
 app.include_router(groups_router.router)
 app.include_router(tasks_router.router)
-app.include_router(index_router.router)
\ No newline at end of file
+app.include_router(index_router.router)
+app.include_router(sync_router.router)
+app.include_router(batch_router.router)
+app.include_router(metrics_router.router)
+app.include_router(admin_router.router)
+app.include_router(health_router.router)
\ No newline at end of file
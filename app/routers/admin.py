@@ -0,0 +1,26 @@
+import asyncio
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import PlainTextResponse
+
+from app.core.profilage import anneau
+from app.dependencies.admin import verifier_admin
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(verifier_admin)])
+
+@router.get("/profiles")
+async def list_profiles():
+    return await asyncio.get_running_loop().run_in_executor(None, anneau.lister)
+
+@router.get("/profiles/{profile_id}")
+async def download_profile(profile_id: str, format: str = "json"):
+    profil = await asyncio.get_running_loop().run_in_executor(None, anneau.lire, profile_id)
+    if profil is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profil introuvable")
+    if format == "collapsed":
+        # directement exploitable par flamegraph.pl ou speedscope
+        lignes = "".join(f"{pile} {n}\n" for pile, n in profil["stacks"].items())
+        return PlainTextResponse(lignes, headers={"Content-Disposition": f'attachment; filename="{profile_id}.folded"'})
+    if format != "json":
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Format invalide (json ou collapsed)")
+    return profil
@@ -2,17 +2,15 @@ from fastapi import APIRouter, Depends, Request, Form
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.responses import RedirectResponse, Response
 from pydantic import BaseModel, EmailStr
-from typing import Dict, Any
-from fastapi.templating import Jinja2Templates
-from pathlib import Path
 from datetime import timedelta
 
-from app.services.auth import connexion, inscrire_utilisateur
+from app.core.traces import RouteTracee
+from app.services.auth import connexion, inscrire_utilisateur, ouvrir_session
 from app.core.security import get_current_user, creer_access_token
+from app.core.templates import templates
+from app.schemas.user import UserOut
 
-router = APIRouter(prefix="/auth", tags=["auth"])
-BASE_DIR = Path(__file__).resolve().parent.parent
-templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
+router = APIRouter(prefix="/auth", tags=["auth"], route_class=RouteTracee)
 
 class LoginIn(BaseModel):
     email: EmailStr
@@ -21,7 +19,7 @@ class LoginIn(BaseModel):
 class TokenOut(BaseModel):
     access_token: str
     token_type: str
-    user: Dict[str, Any]
+    user: UserOut
 
 class RegisterIn(BaseModel):
     email: EmailStr
@@ -86,7 +84,8 @@ async def register_form(
         return templates.TemplateResponse("register.html", {"request": request, "message": str(e)})
 
     try:
-        result = await connexion(email, password)
+        # l'utilisateur vient d'être créé : pas de second bcrypt sous le verrou d'écriture
+        result = ouvrir_session(user)
         token = result.get("access_token")
         if not token:
             return templates.TemplateResponse("register.html", {"request": request, "message": "Inscription réussie mais impossible de créer la session."})
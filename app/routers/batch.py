@@ -0,0 +1,94 @@
+import asyncio
+from fastapi import APIRouter, Depends, Request, Response
+from typing import Any, Dict, List, Tuple
+from urllib.parse import unquote
+
+from app.core.config import BATCH_TIMEOUT_SECONDS
+from app.core.traces import RouteTracee
+from app.core.reponses import encoder_json
+from app.dependencies.auth import get_current_user
+from app.schemas.batch import BatchRequest
+
+router = APIRouter(prefix="/batch", tags=["batch"], route_class=RouteTracee)
+
+_ENTETES_IGNOREES = {b"content-length", b"content-type", b"if-none-match"}
+
+
+class _FluxRefuse(Exception):
+    pass
+
+
+async def _executer(request: Request, chemin: str, utilisateur: Dict[str, Any]) -> Tuple[int, str, bytes]:
+    """Rejoue ``GET chemin`` sur l'application, dans la même tâche : la sous-requête
+    partage l'instantané de la requête /batch et l'utilisateur déjà authentifié."""
+    path, _, query = chemin.partition("?")
+    parent = request.scope
+    scope = {
+        "type": "http",
+        "asgi": parent.get("asgi", {"version": "3.0"}),
+        "http_version": parent.get("http_version", "1.1"),
+        "method": "GET",
+        "scheme": parent.get("scheme", "http"),
+        "server": parent.get("server"),
+        "client": parent.get("client"),
+        "root_path": parent.get("root_path", ""),
+        "path": unquote(path),
+        "raw_path": path.encode("utf-8"),
+        "query_string": query.encode("utf-8"),
+        "headers": [(k, v) for k, v in parent["headers"] if k.lower() not in _ENTETES_IGNOREES],
+        "state": dict(parent.get("state") or {}, utilisateur=utilisateur),
+    }
+    statut, type_contenu, morceaux = 500, "", []
+
+    corps_envoye = False
+
+    async def recevoir() -> Dict[str, Any]:
+        nonlocal corps_envoye
+        if not corps_envoye:
+            corps_envoye = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # plus rien à lire : les réponses en flux attendent ici une déconnexion qui n'arrive pas
+        await asyncio.Event().wait()
+        return {"type": "http.disconnect"}
+
+    async def envoyer(message: Dict[str, Any]) -> None:
+        nonlocal statut, type_contenu
+        if message["type"] == "http.response.start":
+            statut = message["status"]
+            for k, v in message.get("headers", []):
+                if k.lower() == b"content-type":
+                    type_contenu = v.decode("latin-1")
+            if type_contenu.startswith("text/event-stream"):
+                # flux sans fin (SSE) : interrompt l'application avant le premier octet
+                raise _FluxRefuse()
+        elif message["type"] == "http.response.body":
+            morceaux.append(message.get("body", b""))
+
+    try:
+        # wait_for copie le contexte : la sous-requête garde l'instantané du lot
+        await asyncio.wait_for(request.app(scope, recevoir, envoyer), BATCH_TIMEOUT_SECONDS)
+    except _FluxRefuse:
+        return 400, "application/json", encoder_json({"detail": "Réponse en flux continu non prise en charge"})
+    except asyncio.TimeoutError:
+        return 504, "application/json", encoder_json({"detail": "Délai dépassé"})
+    except Exception:
+        # l'erreur a déjà été rendue en 500 par l'application, elle ne doit pas interrompre le lot
+        statut = 500
+    return statut, type_contenu, b"".join(morceaux)
+
+
+@router.post("")
+async def batch(payload: BatchRequest, request: Request, current_user: dict = Depends(get_current_user)):
+    parties: List[bytes] = []
+    for item in payload.requests:
+        if not item.path.startswith("/") or item.path.partition("?")[0].rstrip("/") == router.prefix:
+            statut, corps = 400, encoder_json({"detail": "Chemin invalide"})
+        else:
+            statut, type_contenu, corps = await _executer(request, item.path, current_user)
+            if not corps:
+                corps = b"null"
+            elif not type_contenu.startswith("application/json"):
+                corps = encoder_json(corps.decode("utf-8", errors="replace"))
+        # les corps JSON des sous-réponses sont recopiés tels quels, sans être relus
+        parties.append(b'{"path":' + encoder_json(item.path) + b',"status":' + str(statut).encode() + b',"body":' + corps + b"}")
+    return Response(content=b'{"responses":[' + b",".join(parties) + b"]}", media_type="application/json")
@@ -1,30 +1,43 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request, Form
-from fastapi.responses import RedirectResponse, HTMLResponse
-from typing import Dict, Any, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Form, File, UploadFile, WebSocket, WebSocketDisconnect
+from fastapi.responses import RedirectResponse, HTMLResponse, Response, StreamingResponse
+from typing import List, Optional, Tuple
 from pydantic import BaseModel
-from fastapi.templating import Jinja2Templates
+from app.core.traces import RouteTracee
 from app.dependencies.auth import get_current_user, get_current_user_optional
-from app.schemas.groupe import GroupCreate, GroupUpdate
-from app.schemas.tache import TaskCreate
+from app.dependencies.champs import get_champs
+from app.core.templates import templates, reponse_en_flux
+from app.core.etag import etag_collections, etag_groupe, reponse_conditionnelle
+from app.core.reponses import reponse_projetee
+from app.schemas.groupe import GroupCreate, GroupUpdate, GroupOut, GroupSummaryOut, ImportReportOut, InviteLinkOut
+from app.schemas.tache import TaskCreate, TaskOut
 from datetime import timedelta
+from pathlib import Path
+import io
+import time
 from app.crud.user import recuperer_utilisateur_par_id, creer_utilisateur
 from app.core.security import creer_access_token
 from app.crud.groupe import obtenir_invitation_par_token
+from app.crud.tache import iterer_taches_par_groupe
+from app.services.diffusion import diffuseur
+from app.storage.json_db import snapshot_db
 from app.services.groupe import (
     creer_nouveau_groupe,
+    consulter_groupe,
     modifier_groupe,
     supprimer_groupe_si_createur,
     retirer_membre_du_groupe,
     creer_tache_dans_groupe,
     supprimer_tache_du_groupe,
     lister_taches_du_groupe,
+    iterer_taches_du_groupe,
     generer_invitation_simple,
     rejoindre_via_invite_simple,
-    obtenir_groupes_par_utilisateur
+    obtenir_groupes_par_utilisateur,
+    iterer_groupes_par_utilisateur,
+    statistiques_groupe,
 )
 
-router = APIRouter(prefix="/groups", tags=["groups"])
-templates = Jinja2Templates(directory="templates")
+router = APIRouter(prefix="/groups", tags=["groups"], route_class=RouteTracee)
 
 COOKIE_MAX_AGE = int(timedelta(minutes=30).total_seconds())
 
@@ -41,8 +54,8 @@ async def list_groups_page(request: Request, current_user: dict = Depends(get_cu
     except (ValueError, TypeError):
         raise HTTPException(status_code=400, detail="Identifiant utilisateur invalide")
 
-    groups = await obtenir_groupes_par_utilisateur(user_id)
-    return templates.TemplateResponse("groups_list.html", {"request": request, "user": current_user, "groups": groups})
+    groups = await iterer_groupes_par_utilisateur(user_id)
+    return reponse_en_flux("groups_list.html", {"request": request, "user": current_user, "groups": groups})
 
 @router.get("/create", include_in_schema=False)
 async def create_group_page(request: Request, current_user: dict = Depends(get_current_user)):
@@ -58,17 +71,34 @@ async def create_group_from_form(
     new_group = await creer_nouveau_groupe(name, description, None, current_user)
     return RedirectResponse(url=f"/groups/{new_group['id']}", status_code=303)
 
+@router.get("/my-groups", response_model=List[GroupSummaryOut])
+async def list_my_groups(request: Request, response: Response, current_user: dict = Depends(get_current_user),
+                         champs: Optional[Tuple[str, ...]] = Depends(get_champs(GroupSummaryOut))):
+    raw_id = current_user.get("id")
+    if raw_id is None:
+        raise HTTPException(status_code=400, detail="Utilisateur invalide ou id manquant")
+    try:
+        user_id = int(raw_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Identifiant utilisateur invalide")
+
+    variante = ("f", *champs) if champs else ()
+    non_modifie = reponse_conditionnelle(request, response, etag_collections(("groups", "members", "tasks"), "u", user_id, "t", int(time.time() // 60), *variante))
+    if non_modifie:
+        return non_modifie
+    if champs:
+        return reponse_projetee(await iterer_groupes_par_utilisateur(user_id), champs, response)
+    return await obtenir_groupes_par_utilisateur(user_id)
+
 @router.get("/{group_id}", include_in_schema=False)
 async def group_detail_page(
     group_id: int,
     request: Request,
     current_user: dict = Depends(get_current_user)
 ):
-    group = await modifier_groupe(group_id, {}, current_user)
-    if not group:
-        raise HTTPException(status_code=404, detail="Groupe introuvable")
+    group = await consulter_groupe(group_id, current_user)
 
-    tasks = await lister_taches_du_groupe(group_id, current_user)
+    tasks = await iterer_taches_par_groupe(group_id)
 
     owner_id = group.get("owner_id")
     owner = None
@@ -76,7 +106,8 @@ async def group_detail_page(
         owner = await recuperer_utilisateur_par_id(owner_id)
 
     members = group.get("members", [])
-    member_count = len(members)
+    stats = await statistiques_groupe(group_id)
+    member_count = stats["member_count"] if stats else len(members)
 
     context = {
         "request": request,
@@ -86,16 +117,59 @@ async def group_detail_page(
         "owner": owner,
         "members": members,
         "member_count": member_count,
+        "stats": stats,
     }
 
-    return templates.TemplateResponse("group_detail.html", context)
+    return reponse_en_flux("group_detail.html", context)
+
+async def _flux_sse(group_id: int, user_id: int):
+    # abonné au premier tour seulement : une réponse abandonnée avant le corps ne laisse rien derrière elle
+    abonnement = diffuseur.abonner(group_id, user_id)
+    try:
+        async for message in abonnement.messages():
+            yield ": ping\n\n" if message is None else f"data: {message}\n\n"
+    finally:
+        diffuseur.desabonner(abonnement)
+
+@router.get("/{group_id}/events", include_in_schema=False)
+async def group_events_sse(group_id: int, current_user: dict = Depends(get_current_user)):
+    await consulter_groupe(group_id, current_user)
+    return StreamingResponse(
+        _flux_sse(group_id, current_user["id"]),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.websocket("/{group_id}/ws")
+async def group_events_ws(websocket: WebSocket, group_id: int):
+    try:
+        async with snapshot_db():
+            current_user = await get_current_user(websocket)  # type: ignore[arg-type]
+            await consulter_groupe(group_id, current_user)
+    except HTTPException as exc:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=str(exc.detail))
+        return
+
+    await websocket.accept()
+    abonnement = diffuseur.abonner(group_id, current_user["id"])
+    try:
+        async for message in abonnement.messages():
+            if message is None:
+                await websocket.send_text('{"type":"ping"}')
+            else:
+                await websocket.send_text(message)
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        diffuseur.desabonner(abonnement)
 
 @router.get("/{group_id}/invite", include_in_schema=False)
 async def group_invite_page(group_id: int, request: Request, current_user: dict = Depends(get_current_user)):
     invite = await generer_invitation_simple(group_id, current_user)
     return templates.TemplateResponse("group_invite.html", {"request": request, "user": current_user, "invite": invite})
 
-@router.post("/{group_id}/invite", response_model=Dict[str, Any])
+@router.post("/{group_id}/invite", response_model=InviteLinkOut)
 async def create_invite(group_id: int, current_user: dict = Depends(get_current_user)):
     return await generer_invitation_simple(group_id, current_user)
 
@@ -111,7 +185,8 @@ async def invite_page(token: str, request: Request, current_user: dict = Depends
     )
 
 
-@router.post("/invite/join", response_model=Dict[str, Any])
+@router.post("/invite/join", response_class=RedirectResponse, status_code=303,
+             responses={400: {"description": "Invitation invalide, expirée ou épuisée"}})
 async def join_group_via_invite(payload: InviteJoin, current_user: dict = Depends(get_current_user)):
     result = await rejoindre_via_invite_simple(payload.token, current_user)
     if result.get("status") != "joined":
@@ -161,11 +236,11 @@ async def register_with_invite(
     )
     return response
 
-@router.post("/", response_model=Dict[str, Any])
+@router.post("/", response_model=GroupOut)
 async def create_group(payload: GroupCreate, current_user: dict = Depends(get_current_user)):
     return await creer_nouveau_groupe(payload.name, payload.description, payload.owner_id, current_user)
 
-@router.patch("/{group_id}", response_model=Dict[str, Any])
+@router.patch("/{group_id}", response_model=GroupOut)
 async def update_group(group_id: int, payload: GroupUpdate, current_user: dict = Depends(get_current_user)):
     return await modifier_groupe(group_id, payload.dict(exclude_unset=True), current_user)
 
@@ -179,7 +254,7 @@ async def remove_member(group_id: int, user_id: int, current_user: dict = Depend
     await retirer_membre_du_groupe(group_id, user_id, current_user)
     return {}
 
-@router.post("/{group_id}/tasks", response_model=Dict[str, Any])
+@router.post("/{group_id}/tasks", response_model=TaskOut)
 async def create_task_in_group(
     group_id: int,
     payload: TaskCreate,
@@ -198,18 +273,36 @@ async def delete_task_in_group(group_id: int, task_id: int, current_user: dict =
     await supprimer_tache_du_groupe(group_id, task_id, current_user)
     return {}
 
-@router.get("/{group_id}/tasks", response_model=List[Dict[str, Any]])
-async def list_tasks_in_group(group_id: int, current_user: dict = Depends(get_current_user)):
+@router.get("/{group_id}/tasks", response_model=List[TaskOut])
+async def list_tasks_in_group(group_id: int, request: Request, response: Response, current_user: dict = Depends(get_current_user),
+                              champs: Optional[Tuple[str, ...]] = Depends(get_champs(TaskOut))):
+    await consulter_groupe(group_id, current_user)
+    variante = ("f", *champs) if champs else ()
+    non_modifie = reponse_conditionnelle(request, response, etag_groupe(group_id, *variante))
+    if non_modifie:
+        return non_modifie
+    if champs:
+        return reponse_projetee(await iterer_taches_du_groupe(group_id, current_user), champs, response)
     return await lister_taches_du_groupe(group_id, current_user)
 
-@router.get("/my-groups", response_model=List[Dict[str, Any]])
-async def list_my_groups(current_user: dict = Depends(get_current_user)):
-    raw_id = current_user.get("id")
-    if raw_id is None:
-        raise HTTPException(status_code=400, detail="Utilisateur invalide ou id manquant")
-    try:
-        user_id = int(raw_id)
-    except (ValueError, TypeError):
-        raise HTTPException(status_code=400, detail="Identifiant utilisateur invalide")
-
-    return await obtenir_groupes_par_utilisateur(user_id)
\ No newline at end of file
+@router.get("/{group_id}/tasks/export")
+async def export_tasks_in_group(group_id: int, request: Request, format: str = "ndjson",
+                                current_user: dict = Depends(get_current_user)):
+    from app.core.export import FORMATS_EXPORT, accepte_gzip, reponse_export
+
+    if format not in FORMATS_EXPORT:
+        raise HTTPException(status_code=400, detail="Format d'export invalide (ndjson ou csv)")
+    await consulter_groupe(group_id, current_user)
+    tasks = await iterer_taches_par_groupe(group_id)
+    return reponse_export(tasks, format, f"group-{group_id}-tasks",
+                          gzip=accepte_gzip(request.headers.get("accept-encoding", "")))
+
+@router.post("/{group_id}/import", response_model=ImportReportOut)
+async def import_into_group(group_id: int, file: UploadFile = File(...), kind: str = "tasks",
+                            format: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+    from app.services.importation import importer_dans_groupe
+
+    if format is None:
+        format = Path(file.filename or "").suffix.lstrip(".").lower().replace("jsonl", "ndjson") or "csv"
+    texte = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    return await importer_dans_groupe(group_id, texte, format, kind, current_user)
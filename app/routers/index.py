@@ -1,30 +1,24 @@
 from fastapi import APIRouter, Request, Depends, Form, HTTPException
 from fastapi.responses import RedirectResponse, JSONResponse
-from fastapi.templating import Jinja2Templates
-from pathlib import Path
 
+from app.core.traces import RouteTracee
 from app.dependencies.auth import get_current_user
-from app.services.tache import lister_taches_par_utilisateur, list_taches_du_groupe, associer_tache_a_groupe
+from app.core.templates import templates
+from app.services.tache import lister_fil_utilisateur, lister_taches_des_groupes, associer_tache_a_groupe
 from app.services.groupe import obtenir_groupes_par_utilisateur, retirer_membre_du_groupe
 from app.storage.json_db import obtenir_groupe_par_id
 from app.dependencies.auth import get_current_user
 
-router = APIRouter(prefix="/index", tags=["index"])
-BASE_DIR = Path(__file__).resolve().parent.parent
-templates = Jinja2Templates(directory="templates")
+router = APIRouter(prefix="/index", tags=["index"], route_class=RouteTracee)
 
 @router.get("/", include_in_schema=False)
 async def index(request: Request, current_user: dict = Depends(get_current_user)):
     user = current_user
     user_id = user["id"]
-    personal_tasks = await lister_taches_par_utilisateur(user_id)
+    # les tâches de groupe assignées à l'utilisateur sont déjà dans group_tasks
+    personal_tasks = [t for t in await lister_fil_utilisateur(user_id) if not t.get("group_id")]
     groups = await obtenir_groupes_par_utilisateur(user_id)
-    group_tasks = []
-    for g in groups:
-        tasks_for_group = await list_taches_du_groupe(g["id"], current_user)
-        for t in tasks_for_group:
-            t["_group"] = {"id": g["id"], "name": g["name"]}
-        group_tasks.extend(tasks_for_group)
+    group_tasks = await lister_taches_des_groupes(groups)
 
     tasks = personal_tasks + group_tasks
     return templates.TemplateResponse("index.html", {"request": request, "user": user, "tasks": tasks, "groups": groups})
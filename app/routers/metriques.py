@@ -0,0 +1,26 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.core.metriques import registre
+from app.core.templates import fragments
+from app.storage.evenements import bus
+from app.storage.fil_travail import fils_travail
+
+router = APIRouter(tags=["metrics"])
+
+registre.rappel(
+    "grouply_cache_hits_total", "Accès servis par un cache applicatif",
+    lambda: {("fragments",): fragments.hits, ("feeds",): fils_travail.hits}, ("cache",), "counter")
+registre.rappel(
+    "grouply_cache_misses_total", "Accès manqués d'un cache applicatif",
+    lambda: {("fragments",): fragments.misses, ("feeds",): fils_travail.misses}, ("cache",), "counter")
+registre.rappel(
+    "grouply_event_queue_depth", "Événements en attente par abonné du bus",
+    lambda: {(nom,): s["en_attente"] for nom, s in bus.statistiques().items()}, ("subscriber",))
+registre.rappel(
+    "grouply_event_queue_overflows_total", "Débordements de file par abonné du bus",
+    lambda: {(nom,): s["debordements"] for nom, s in bus.statistiques().items()}, ("subscriber",), "counter")
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(registre.exposer(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,17 @@
+from fastapi import APIRouter, status
+
+from app.core.demarrage import etat
+from app.core.reponses import ReponseJSON
+
+router = APIRouter(tags=["health"])
+
+@router.get("/healthz", include_in_schema=False)
+async def healthz():
+    # vivant dès que la boucle répond, même pendant le préchauffage
+    return {"status": "ok"}
+
+@router.get("/readyz", include_in_schema=False)
+async def readyz():
+    corps = etat.en_dict()
+    code = status.HTTP_200_OK if corps["status"] == "ready" else status.HTTP_503_SERVICE_UNAVAILABLE
+    return ReponseJSON(corps, status_code=code)
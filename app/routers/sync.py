@@ -0,0 +1,14 @@
+from fastapi import APIRouter, Depends
+from typing import Optional
+
+from app.core.traces import RouteTracee
+from app.dependencies.auth import get_current_user
+from app.schemas.sync import SyncOut
+from app.services.sync import changements_depuis
+
+router = APIRouter(prefix="/sync", tags=["sync"], route_class=RouteTracee)
+
+@router.get("", response_model=SyncOut)
+async def sync_changes(since: Optional[int] = None, epoch: Optional[str] = None,
+                       current_user: dict = Depends(get_current_user)):
+    return await changements_depuis(since, epoch, current_user)
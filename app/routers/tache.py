@@ -1,23 +1,27 @@
 from fastapi import APIRouter, Depends, Form, HTTPException, status, Request
-from fastapi.responses import RedirectResponse
-from fastapi.templating import Jinja2Templates
-from pathlib import Path
-from typing import Optional, Dict, Any, List
+from fastapi.responses import RedirectResponse, Response
+from collections.abc import Mapping
+from typing import Optional, Dict, Any, List, Tuple
 from pydantic import BaseModel, Field
-from app.schemas.tache import TaskCreate,TaskPatch
+from app.core.traces import RouteTracee
+from app.schemas.tache import TaskCreate,TaskPatch,TaskOut
 
 from app.dependencies.auth import get_current_user
+from app.dependencies.champs import get_champs
+from app.core.reponses import reponse_projetee
+from app.core.templates import templates, reponse_en_flux
+from app.core.etag import etag_groupe, reponse_conditionnelle
 from app.services.tache import (
-    lister_taches_par_utilisateur,
+    lister_fil_utilisateur,
     creer_nouvelle_tache,
     get_tache,
     list_taches_du_groupe,
+    verifier_membre_du_groupe,
     update_tache,
     delete_tache,
 )
 
-router = APIRouter(prefix="/tasks", tags=["tasks"])
-templates = Jinja2Templates(directory="templates")
+router = APIRouter(prefix="/tasks", tags=["tasks"], route_class=RouteTracee)
 
 
 @router.get("/create", include_in_schema=False)
@@ -61,7 +65,7 @@ async def create_task_from_form(
             status_code=400,
         )
 
-    task_id = new_task.get("id") if isinstance(new_task, dict) else None
+    task_id = new_task.get("id") if isinstance(new_task, Mapping) else None
     if task_id:
         return RedirectResponse(url=f"/tasks/success/{task_id}", status_code=303)
     return RedirectResponse(url="/tasks/success", status_code=303)
@@ -69,7 +73,7 @@ async def create_task_from_form(
 @router.get("/success/{task_id}", include_in_schema=False)
 async def task_created_success(request: Request, task_id: int, current_user: dict = Depends(get_current_user)):
     task = await get_tache(task_id, current_user)
-    title = task.get("title") if isinstance(task, dict) else None
+    title = task.get("title") if isinstance(task, Mapping) else None
     return templates.TemplateResponse(
         "tasks_success.html",
         {"request": request, "user": current_user, "task_id": task_id, "task_title": title},
@@ -93,15 +97,18 @@ async def list_my_tasks_page(request: Request, current_user: dict = Depends(get_
     except (ValueError, TypeError):
         raise HTTPException(status_code=400, detail="Identifiant utilisateur invalide")
 
-    tasks = await lister_taches_par_utilisateur(user_id)
+    fil = await lister_fil_utilisateur(user_id)
+    personal_tasks = (t for t in fil if not t.get("group_id"))
+    group_tasks = (t for t in fil if t.get("group_id"))
     groups = []  
 
-    return templates.TemplateResponse(
+    return reponse_en_flux(
         "tasks_list.html",
         {
             "request": request,
             "user": current_user,
-            "tasks": tasks,
+            "personal_tasks": personal_tasks,
+            "group_tasks": group_tasks,
             "groups": groups,
         },
     )
@@ -152,7 +159,7 @@ async def edit_task_submit(
 @router.get("/success/edit/{task_id}", include_in_schema=False)
 async def task_edit_success(request: Request, task_id: int, current_user: dict = Depends(get_current_user)):
     task = await get_tache(task_id, current_user)
-    title = task.get("title") if isinstance(task, dict) else None
+    title = task.get("title") if isinstance(task, Mapping) else None
     return templates.TemplateResponse(
         "tasks_success_edit.html",
         {"request": request, "user": current_user, "task_id": task_id, "task_title": title},
@@ -175,11 +182,19 @@ async def associate_task_to_group(
     await update_tache(task_id, {"group_id": group}, current_user)
     return RedirectResponse(url=f"/tasks/{task_id}", status_code=303)
 
-@router.get("/group/{group_id}", response_model=List[Dict[str, Any]])
-async def tasks_by_group(group_id: int, current_user: dict = Depends(get_current_user)):
+@router.get("/group/{group_id}", response_model=List[TaskOut])
+async def tasks_by_group(group_id: int, request: Request, response: Response, current_user: dict = Depends(get_current_user),
+                         champs: Optional[Tuple[str, ...]] = Depends(get_champs(TaskOut))):
+    await verifier_membre_du_groupe(group_id, current_user)
+    variante = ("f", *champs) if champs else ()
+    non_modifie = reponse_conditionnelle(request, response, etag_groupe(group_id, *variante))
+    if non_modifie:
+        return non_modifie
+    if champs:
+        return reponse_projetee(await list_taches_du_groupe(group_id, current_user), champs, response)
     return await list_taches_du_groupe(group_id, current_user)
 
-@router.patch("/{task_id}", response_model=Dict[str, Any])
+@router.patch("/{task_id}", response_model=TaskOut)
 async def patch_task(task_id: int, payload: TaskPatch, current_user: dict = Depends(get_current_user)):
     return await update_tache(task_id, payload.dict(exclude_unset=True), current_user)
 
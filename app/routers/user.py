@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel, EmailStr
 from typing import Optional, Dict, Any
 
+from app.core.traces import RouteTracee
 from app.services.user import (
     creer_user,
     get_user_by_id,
@@ -9,8 +10,9 @@ from app.services.user import (
     delete_user,
 )
 from app.core.security import get_current_user
+from app.schemas.user import UserOut
 
-router = APIRouter(prefix="/users", tags=["users"])
+router = APIRouter(prefix="/users", tags=["users"], route_class=RouteTracee)
 
 class UserCreate(BaseModel):
     email: EmailStr
@@ -22,16 +24,16 @@ class UserPatch(BaseModel):
     is_active: Optional[bool] = None
     password: Optional[str] = None
 
-@router.post("/", response_model=Dict[str, Any], status_code=status.HTTP_201_CREATED)
+@router.post("/", response_model=UserOut, status_code=status.HTTP_201_CREATED)
 async def create_user(payload: UserCreate):
     user = await creer_user(payload.email, payload.password, payload.full_name)
-    return {k: v for k, v in user.items() if k != "hashed_password"}
+    return user
 
-@router.get("/{user_id}", response_model=Dict[str, Any])
+@router.get("/{user_id}", response_model=UserOut)
 async def read_user(user_id: int, current_user: dict = Depends(get_current_user)):
     return await get_user_by_id(user_id)
 
-@router.patch("/{user_id}", response_model=Dict[str, Any])
+@router.patch("/{user_id}", response_model=UserOut)
 async def patch_user(user_id: int, payload: UserPatch, current_user: dict = Depends(get_current_user)):
     return await update_user(user_id, payload.dict(exclude_unset=True))
 
@@ -0,0 +1,11 @@
+from typing import List
+from pydantic import BaseModel, Field
+
+from app.core.config import BATCH_MAX_REQUESTS
+
+
+class BatchItem(BaseModel):
+    path: str = Field(..., description="Route GET existante, avec sa query string : /groups/1/tasks?fields=id,title")
+
+class BatchRequest(BaseModel):
+    requests: List[BatchItem] = Field(..., min_length=1, max_length=BATCH_MAX_REQUESTS)
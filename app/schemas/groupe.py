@@ -1,4 +1,4 @@
-from typing import Optional, List
+from typing import Dict, Optional, List
 from datetime import datetime
 from pydantic import BaseModel
 
@@ -29,3 +29,54 @@ class GroupeRead(GroupeBase):
 
     class Config:
         orm_mode = True
+
+
+class GroupStats(BaseModel):
+    task_count: int = 0
+    tasks_by_status: Dict[str, int] = {}
+    overdue_count: int = 0
+    member_count: int = 0
+    last_activity: Optional[str] = None
+
+class GroupOut(BaseModel):
+    id: int
+    name: str
+    description: Optional[str] = None
+    owner_id: Optional[int] = None
+    owner_name: Optional[str] = None
+    members: List[int] = []
+
+class GroupSummaryOut(BaseModel):
+    id: int
+    name: str
+    description: Optional[str] = None
+    owner_id: Optional[int] = None
+    members: List[int] = []
+    member_count: int = 0
+    stats: Optional[GroupStats] = None
+
+class InviteOut(BaseModel):
+    id: int
+    group_id: int
+    token: str
+    created_by: Optional[int] = None
+    created_at: Optional[str] = None
+    expires_at: Optional[str] = None
+    uses_count: int = 0
+    max_uses: Optional[int] = None
+    is_active: bool = True
+
+class InviteLinkOut(BaseModel):
+    url: str
+    invite: InviteOut
+
+class ImportErrorOut(BaseModel):
+    row: int
+    errors: List[str]
+
+class ImportReportOut(BaseModel):
+    kind: str
+    rows: int = 0
+    created: int = 0
+    skipped: int = 0
+    errors: List[ImportErrorOut] = []
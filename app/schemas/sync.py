@@ -0,0 +1,18 @@
+from typing import List
+from pydantic import BaseModel
+
+from app.schemas.groupe import GroupOut
+from app.schemas.tache import TaskOut
+
+
+class SyncDeleted(BaseModel):
+    groups: List[int] = []
+    tasks: List[int] = []
+
+class SyncOut(BaseModel):
+    epoch: str
+    seq: int
+    resync: bool = False
+    groups: List[GroupOut] = []
+    tasks: List[TaskOut] = []
+    deleted: SyncDeleted = SyncDeleted()
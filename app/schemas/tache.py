@@ -32,3 +32,16 @@ class TacheRead(TacheBase):
 
     class Config:
         orm_mode = True
+
+
+class TaskOut(BaseModel):
+    # forme stockée : les dates restent des chaînes ISO, sans reconversion
+    id: int
+    title: str
+    description: Optional[str] = None
+    status: Optional[str] = None
+    assigned_to_id: Optional[int] = None
+    group_id: Optional[int] = None
+    due_date: Optional[str] = None
+    created_at: Optional[str] = None
+    updated_at: Optional[str] = None
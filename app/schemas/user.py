@@ -13,3 +13,11 @@ class UserRead(UserBase):
 
     class Config:
         orm_mode = True
+
+
+class UserOut(BaseModel):
+    # pas de hashed_password : le modèle de sortie ne peut pas le laisser fuiter
+    id: int
+    email: str
+    full_name: Optional[str] = None
+    is_active: Optional[bool] = None
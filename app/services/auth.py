@@ -3,6 +3,7 @@ from datetime import timedelta
 
 from fastapi import HTTPException, status
 
+from app.core.traces import tracer_module
 from app.core.security import creer_access_token, authentifier_utilisateur
 from app.storage.json_db import trouver_utilisateur_par_id, hacher_mot_de_passe
 
@@ -13,9 +14,13 @@ async def connexion(email: str, password: str) -> Dict[str, Any]:
     user = await authentifier_utilisateur(email, password)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Identifiants invalides")
+    return ouvrir_session(user)
+
+def ouvrir_session(user: Dict[str, Any]) -> Dict[str, Any]:
     token_data = {"sub": str(user["id"])}
     token = creer_access_token(token_data)
-    return {"access_token": token, "token_type": "bearer", "user": user}
+    safe = {k: v for k, v in user.items() if k != "hashed_password"}
+    return {"access_token": token, "token_type": "bearer", "user": safe}
 
 async def inscrire_utilisateur(email: str, password: str, full_name: Optional[str] = None) -> Dict[str, Any]:
 
@@ -32,3 +37,6 @@ async def recuperer_profil(user_id: int) -> Dict[str, Any]:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Utilisateur introuvable")
     safe = {k: v for k, v in user.items() if k != "hashed_password"}
     return safe
+
+
+tracer_module(__name__, "service")
@@ -0,0 +1,123 @@
+import asyncio
+import json
+from collections import defaultdict
+from typing import Any, AsyncIterator, Dict, Optional, Set
+
+from app.core.config import LIVE_HEARTBEAT_SECONDS, LIVE_QUEUE_SIZE
+from app.core.reponses import vers_dict_ou_texte
+from app.storage.evenements import RESYNCHRONISATION, Changement, bus
+
+RESYNC = json.dumps({"type": "resync"})
+FIN = json.dumps({"type": "unsubscribed"})
+
+_TYPES = {
+    ("tasks", "create"): "task.created",
+    ("tasks", "update"): "task.updated",
+    ("tasks", "delete"): "task.deleted",
+    ("members", "create"): "member.joined",
+    ("members", "delete"): "member.left",
+    ("groups", "update"): "group.updated",
+    ("groups", "delete"): "group.deleted",
+}
+
+
+class Abonnement:
+    __slots__ = ("group_id", "user_id", "file", "ferme")
+
+    def __init__(self, group_id: int, user_id: int, taille: int) -> None:
+        self.group_id = group_id
+        self.user_id = user_id
+        self.file: "asyncio.Queue[str]" = asyncio.Queue(maxsize=taille)
+        self.ferme = False
+
+    def deposer(self, message: str) -> None:
+        if self.ferme:
+            return
+        try:
+            self.file.put_nowait(message)
+        except asyncio.QueueFull:
+            # client trop lent : on jette son retard et on lui demande de recharger
+            while not self.file.empty():
+                self.file.get_nowait()
+            self.file.put_nowait(RESYNC)
+
+    def fermer(self) -> None:
+        if self.ferme:
+            return
+        self.ferme = True
+        if self.file.full():
+            self.file.get_nowait()
+        self.file.put_nowait(FIN)
+
+    async def messages(self, heartbeat: float = LIVE_HEARTBEAT_SECONDS) -> AsyncIterator[Optional[str]]:
+        while True:
+            try:
+                message = await asyncio.wait_for(self.file.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            yield message
+            if message is FIN:
+                return
+
+
+class Diffuseur:
+    def __init__(self, taille_file: int = LIVE_QUEUE_SIZE) -> None:
+        self.taille_file = taille_file
+        self._abonnes: Dict[int, Set[Abonnement]] = defaultdict(set)
+
+    def abonner(self, group_id: int, user_id: int) -> Abonnement:
+        abonnement = Abonnement(group_id, user_id, self.taille_file)
+        self._abonnes[group_id].add(abonnement)
+        return abonnement
+
+    def desabonner(self, abonnement: Abonnement) -> None:
+        abonnes = self._abonnes.get(abonnement.group_id)
+        if abonnes is not None:
+            abonnes.discard(abonnement)
+            if not abonnes:
+                del self._abonnes[abonnement.group_id]
+
+    def nombre_abonnes(self) -> int:
+        return sum(len(a) for a in self._abonnes.values())
+
+    def publier(self, group_id: int, evenement: Dict[str, Any]) -> None:
+        abonnes = self._abonnes.get(group_id)
+        if not abonnes:
+            return
+        message = json.dumps(evenement, ensure_ascii=False, default=vers_dict_ou_texte)
+        for abonnement in tuple(abonnes):
+            abonnement.deposer(message)
+
+    def fermer_pour(self, group_id: int, user_id: Optional[int] = None) -> None:
+        for abonnement in tuple(self._abonnes.get(group_id, ())):
+            if user_id is None or abonnement.user_id == user_id:
+                abonnement.fermer()
+                self.desabonner(abonnement)
+
+    async def recevoir_changement(self, changement: Changement) -> None:
+        if changement is RESYNCHRONISATION:
+            for abonnes in tuple(self._abonnes.values()):
+                for abonnement in tuple(abonnes):
+                    abonnement.deposer(RESYNC)
+            return
+        type_evenement = _TYPES.get((changement.collection, changement.operation))
+        if type_evenement is None:
+            return
+        for group_id in dict.fromkeys(changement.groupes):
+            if group_id is None or group_id not in self._abonnes:
+                continue
+            evenement: Dict[str, Any] = {"type": type_evenement, "group_id": group_id, "id": changement.id}
+            if changement.objet is not None:
+                evenement["data"] = changement.objet
+            if changement.champs:
+                evenement["fields"] = list(changement.champs)
+            self.publier(group_id, evenement)
+            if type_evenement == "group.deleted":
+                self.fermer_pour(group_id)
+            elif type_evenement == "member.left":
+                self.fermer_pour(group_id, changement.id)
+
+
+diffuseur = Diffuseur()
+bus.abonner("diffusion", diffuseur.recevoir_changement, collections=("tasks", "members", "groups"))
@@ -1,8 +1,9 @@
 from datetime import datetime, timedelta
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Iterator, List, Optional
 from fastapi import HTTPException, status
 import secrets
 
+from app.core.traces import tracer_module
 from app.crud.groupe import (
     creer_groupe,
     recuperer_groupe,
@@ -12,15 +13,18 @@ from app.crud.groupe import (
     retirer_membre,
     creer_invitation,
     obtenir_invitation_par_token,
-    incrementer_utilisation_invite,lister_groupes_par_utilisateur
+    incrementer_utilisation_invite,lister_groupes_par_utilisateur,
+    iterer_groupes_par_utilisateur as iterer_groupes_du_membre,
 )
 from app.crud.tache import (
     creer_tache,
     supprimer_tache,
-    lister_taches_par_groupe
+    lister_taches_par_groupe,
+    iterer_taches_par_groupe,
 )
 from app.crud.user import recuperer_utilisateur_par_id
-from app.storage.json_db import charger_db, sauvegarder_db
+from app.storage.json_db import charger_db, sauvegarder_db, noter_changement
+from app.storage.agregats import assurer_agregats
 
 async def creer_nouveau_groupe(
     name: str,
@@ -55,10 +59,21 @@ async def creer_nouveau_groupe(
 
     db.setdefault("groups", []).append(new_group)
     await sauvegarder_db(db)
+    noter_changement("groups", new_id, "create", new_id, objet=new_group)
 
     return new_group
 
 
+async def consulter_groupe(group_id: int, current_user: dict) -> Dict[str, Any]:
+    group = await recuperer_groupe(group_id)
+    if not group:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Groupe introuvable")
+    user_id = current_user.get("id")
+    if user_id not in group.get("members", []) and group.get("owner_id") != user_id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Vous n'êtes pas membre de ce groupe")
+    return group
+
+
 async def modifier_groupe(group_id: int, patch: Dict[str, Any], current_user: dict) -> Dict[str, Any]:
     group = await recuperer_groupe(group_id)
     if not group:
@@ -117,12 +132,22 @@ async def supprimer_tache_du_groupe(group_id: int, task_id: int, current_user: d
     await supprimer_tache(task_id)
 
 
-async def lister_taches_du_groupe(group_id: int, current_user: dict) -> List[Dict[str, Any]]:
+async def verifier_groupe_existant(group_id: int) -> Dict[str, Any]:
     group = await recuperer_groupe(group_id)
     if not group:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Groupe introuvable")
+    return group
+
+
+async def lister_taches_du_groupe(group_id: int, current_user: dict) -> List[Dict[str, Any]]:
+    await consulter_groupe(group_id, current_user)
     return await lister_taches_par_groupe(group_id)
 
+
+async def iterer_taches_du_groupe(group_id: int, current_user: dict) -> Iterator[Dict[str, Any]]:
+    await consulter_groupe(group_id, current_user)
+    return await iterer_taches_par_groupe(group_id)
+
 async def generer_invitation_simple(group_id: int, current_user: dict, base_url: str = "http://localhost:8000") -> dict:
     token = secrets.token_urlsafe(16)
     expires_at = (datetime.now() + timedelta(days=7)).isoformat()
@@ -153,16 +178,27 @@ async def rejoindre_via_invite_simple(token: str, current_user: dict) -> dict:
     
     return {"status": "joined", "group_id": invite["group_id"], "user_id": user_id}
 
+async def statistiques_groupe(group_id: int) -> Optional[Dict[str, Any]]:
+    return (await assurer_agregats()).stats_groupe(group_id)
+
+async def iterer_groupes_par_utilisateur(user_id: int) -> Iterator[Dict[str, Any]]:
+    groupes = await iterer_groupes_du_membre(user_id)
+    agregats = await assurer_agregats()
+    return (_normaliser_groupe(g, agregats.stats_groupe(g.get("id"))) for g in groupes)
+
+def _normaliser_groupe(g: Dict[str, Any], stats: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    return {
+        "id": g.get("id"),
+        "name": g.get("name"),
+        "description": g.get("description"),
+        "owner_id": g.get("owner_id"),
+        "members": g.get("members", []),
+        "member_count": stats["member_count"] if stats else g.get("member_count", len(g.get("members", []))),
+        "stats": stats,
+    }
+
 async def obtenir_groupes_par_utilisateur(user_id: int) -> List[Dict[str, Any]]:
-    groupes = await lister_groupes_par_utilisateur(user_id)
-    normalized = []
-    for g in groupes:
-        normalized.append({
-            "id": g.get("id"),
-            "name": g.get("name"),
-            "description": g.get("description"),
-            "owner_id": g.get("owner_id"),
-            "members": g.get("members", []),
-            "member_count": g.get("member_count", len(g.get("members", []))),
-        })
-    return normalized
\ No newline at end of file
+    return list(await iterer_groupes_par_utilisateur(user_id))
+
+
+tracer_module(__name__, "service")
@@ -0,0 +1,167 @@
+import asyncio
+import csv
+import json
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from pydantic import TypeAdapter, ValidationError
+
+from app.core.traces import tracer_module
+from app.core.config import IMPORT_BATCH_SIZE
+from app.crud.groupe import ajouter_membres_en_lot, recuperer_groupe
+from app.crud.tache import creer_taches_en_lot
+from app.crud.user import indexer_utilisateurs_par_email
+from app.schemas.tache import TaskCreate
+from app.storage.json_db import snapshot_db
+
+FORMATS_IMPORT = ("csv", "ndjson")
+TYPES_IMPORT = ("tasks", "members")
+
+_valider_taches = TypeAdapter(List[TaskCreate])
+
+# (numéro de ligne, ligne lue ou None, message d'erreur de lecture)
+LigneLue = Tuple[int, Optional[Dict[str, Any]], Optional[str]]
+
+
+def lire_lignes(texte: Iterable[str], format: str) -> Iterator[LigneLue]:
+    """Lit le fichier ligne à ligne, sans jamais le charger en entier."""
+    if format == "csv":
+        lecteur = csv.DictReader(texte)
+        for ligne in lecteur:
+            # en CSV une cellule vide vaut une valeur absente
+            yield lecteur.line_num, {k.strip(): (v if v != "" else None) for k, v in ligne.items() if k}, None
+        return
+    for numero, brute in enumerate(texte, 1):
+        if not brute.strip():
+            continue
+        try:
+            ligne = json.loads(brute)
+        except json.JSONDecodeError as e:
+            yield numero, None, f"JSON invalide : {e.msg}"
+            continue
+        if not isinstance(ligne, dict):
+            yield numero, None, "Objet JSON attendu"
+            continue
+        yield numero, ligne, None
+
+
+def _par_lots(lignes: Iterator[LigneLue], taille: int) -> Iterator[List[LigneLue]]:
+    lot: List[LigneLue] = []
+    for ligne in lignes:
+        lot.append(ligne)
+        if len(lot) >= taille:
+            yield lot
+            lot = []
+    if lot:
+        yield lot
+
+
+def _message(erreur: Dict[str, Any]) -> str:
+    champ = ".".join(str(p) for p in erreur["loc"][1:])
+    return f"{champ} : {erreur['msg']}" if champ else erreur["msg"]
+
+
+def _valider_lot_taches(lignes: List[Dict[str, Any]]) -> Tuple[Dict[int, TaskCreate], Dict[int, List[str]]]:
+    try:
+        return dict(enumerate(_valider_taches.validate_python(lignes))), {}
+    except ValidationError as e:
+        erreurs: Dict[int, List[str]] = {}
+        for erreur in e.errors():
+            erreurs.setdefault(erreur["loc"][0], []).append(_message(erreur))
+    # seconde passe sur les seules lignes valides, toujours en un appel
+    positions = [i for i in range(len(lignes)) if i not in erreurs]
+    valides = _valider_taches.validate_python([lignes[i] for i in positions])
+    return dict(zip(positions, valides)), erreurs
+
+
+async def _importer_lot_taches(group_id: int, group: Dict[str, Any], lot: List[LigneLue],
+                               emails: Dict[str, Dict[str, Any]], rapport: Dict[str, Any]) -> None:
+    lues = [(numero, ligne) for numero, ligne, _ in lot if ligne is not None]
+    taches, erreurs = _valider_lot_taches([ligne for _, ligne in lues])
+    membres = set(group.get("members", []))
+    a_creer = []
+    for i, (numero, ligne) in enumerate(lues):
+        if i in erreurs:
+            rapport["errors"].append({"row": numero, "errors": erreurs[i]})
+            continue
+        tache = taches[i].model_dump()
+        email = ligne.get("assignee_email") or ligne.get("assigned_to")
+        if email:
+            user = emails.get(str(email).strip().lower())
+            if user is None:
+                rapport["errors"].append({"row": numero, "errors": [f"Utilisateur introuvable : {email}"]})
+                continue
+            if user["id"] not in membres:
+                rapport["errors"].append({"row": numero, "errors": [f"{email} n'est pas membre du groupe"]})
+                continue
+            tache["assigned_to_id"] = user["id"]
+        a_creer.append(tache)
+    rapport["created"] += len(await creer_taches_en_lot(a_creer, group_id))
+
+
+async def _importer_lot_membres(group_id: int, lot: List[LigneLue],
+                                emails: Dict[str, Dict[str, Any]], rapport: Dict[str, Any]) -> None:
+    user_ids = []
+    for numero, ligne, _ in lot:
+        if ligne is None:
+            continue
+        email = ligne.get("email")
+        if not email:
+            rapport["errors"].append({"row": numero, "errors": ["email : champ requis"]})
+            continue
+        user = emails.get(str(email).strip().lower())
+        if user is None:
+            rapport["errors"].append({"row": numero, "errors": [f"Utilisateur introuvable : {email}"]})
+            continue
+        user_ids.append(user["id"])
+    ajoutes = await ajouter_membres_en_lot(group_id, user_ids)
+    rapport["created"] += len(ajoutes)
+    rapport["skipped"] += len(user_ids) - len(ajoutes)
+
+
+async def importer_lignes(group_id: int, texte: Iterable[str], format: str, kind: str,
+                          taille_lot: int = IMPORT_BATCH_SIZE) -> Dict[str, Any]:
+    """Importe des tâches ou des membres dans un groupe, un lot validé et écrit à la fois.
+
+    Hors requête, chaque lot est validé dans sa propre unité de travail ; dans une
+    requête, les lots rejoignent l'unité de travail de la requête.
+    """
+    rapport: Dict[str, Any] = {"kind": kind, "rows": 0, "created": 0, "skipped": 0, "errors": []}
+    emails = await indexer_utilisateurs_par_email()
+    for lot in _par_lots(lire_lignes(texte, format), taille_lot):
+        rapport["rows"] += len(lot)
+        for numero, _, erreur in lot:
+            if erreur is not None:
+                rapport["errors"].append({"row": numero, "errors": [erreur]})
+        async with snapshot_db(ecriture=True):
+            group = await recuperer_groupe(group_id)
+            if not group:
+                raise KeyError("Groupe introuvable")
+            if kind == "members":
+                await _importer_lot_membres(group_id, lot, emails, rapport)
+            else:
+                await _importer_lot_taches(group_id, group, lot, emails, rapport)
+        await asyncio.sleep(0)
+    return rapport
+
+
+async def importer_dans_groupe(group_id: int, texte: Iterable[str], format: str, kind: str,
+                               current_user: dict) -> Dict[str, Any]:
+    if format not in FORMATS_IMPORT:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Format d'import invalide (csv ou ndjson)")
+    if kind not in TYPES_IMPORT:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Type d'import invalide (tasks ou members)")
+    group = await recuperer_groupe(group_id)
+    if not group:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Groupe introuvable")
+    if group.get("owner_id") != current_user.get("id"):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Seul le créateur peut importer dans le groupe")
+    try:
+        return await importer_lignes(group_id, texte, format, kind)
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Le fichier doit être encodé en UTF-8")
+    except csv.Error as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"CSV invalide : {e}")
+
+
+tracer_module(__name__, "service")
@@ -0,0 +1,87 @@
+from typing import Any, Dict, Optional, Set
+
+from app.core.traces import tracer_module
+from app.storage.json_db import EPOQUE, charger_db, instantane_a_jour
+from app.storage.journal import journal
+
+
+def _reponse(seq: int, resync: bool = False) -> Dict[str, Any]:
+    return {
+        "epoch": EPOQUE,
+        "seq": seq,
+        "resync": resync,
+        "groups": [],
+        "tasks": [],
+        "deleted": {"groups": [], "tasks": []},
+    }
+
+
+async def changements_depuis(since: Optional[int], epoch: Optional[str], current_user: Dict[str, Any]) -> Dict[str, Any]:
+    user_id = current_user["id"]
+    db = await charger_db()
+    seq = journal.seq
+    entrees = journal.depuis(since) if since is not None and epoch == EPOQUE else None
+    if entrees is None:
+        return _reponse(seq, resync=True)
+    if not instantane_a_jour():
+        # données plus anciennes que le journal : on renvoie ce qu'on a sans avancer le curseur
+        seq = since
+
+    mes_groupes = {g["id"]: g for g in db.get("groups", []) if user_id in g.get("members", [])}
+    quittes: Set[int] = set()
+    # groupes devenus visibles : le client n'en a encore aucune tâche
+    rejoints: Set[int] = set()
+    for _, ch in entrees:
+        if ch.collection == "members" and ch.id == user_id:
+            (quittes if ch.operation == "delete" else rejoints).update(ch.groupes)
+        elif ch.collection == "groups" and ch.operation == "create" and ch.objet is not None \
+                and user_id in ch.objet.get("members", []):
+            rejoints.add(ch.id)
+    rejoints.intersection_update(mes_groupes)
+    concernes = quittes.union(mes_groupes)
+
+    taches: Dict[int, bool] = {}
+    groupes: Dict[int, bool] = {}
+    for _, ch in entrees:
+        if ch.collection == "tasks":
+            # pertinent : le client a pu voir la tâche, une disparition lui est alors signalée
+            pertinent = (
+                any(g in concernes for g in ch.groupes if g is not None)
+                or user_id in ch.utilisateurs
+                or (ch.objet is not None and ch.objet.get("assigned_to_id") == user_id)
+            )
+            taches[ch.id] = taches.get(ch.id, False) or pertinent
+        elif ch.collection == "groups":
+            groupes[ch.id] = groupes.get(ch.id, False) or ch.operation == "delete"
+        elif ch.collection == "members":
+            for gid in ch.groupes:
+                groupes[gid] = groupes.get(gid, False) or gid in quittes
+
+    reponse = _reponse(seq)
+    for gid, pertinent in groupes.items():
+        if gid in mes_groupes:
+            reponse["groups"].append(mes_groupes[gid])
+        elif pertinent:
+            reponse["deleted"]["groups"].append(gid)
+
+    if taches or rejoints:
+        actuelles = {
+            t["id"]: t for t in db.get("tasks", [])
+            if t.get("id") in taches or t.get("group_id") in rejoints
+        }
+        for task_id in actuelles:
+            taches.setdefault(task_id, False)
+        for task_id, pertinent in taches.items():
+            t = actuelles.get(task_id)
+            visible = t is not None and (
+                t.get("group_id") in mes_groupes
+                or (not t.get("group_id") and t.get("assigned_to_id") == user_id)
+            )
+            if visible:
+                reponse["tasks"].append(t)
+            elif pertinent:
+                reponse["deleted"]["tasks"].append(task_id)
+    return reponse
+
+
+tracer_module(__name__, "service")
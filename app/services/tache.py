@@ -1,7 +1,8 @@
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Iterator, List, Optional
 from fastapi import HTTPException, status
 from datetime import datetime
 
+from app.core.traces import tracer_module
 from app.crud.tache import (
     creer_tache,
     recuperer_tache,
@@ -9,8 +10,10 @@ from app.crud.tache import (
     mettre_a_jour_tache,
     supprimer_tache,
 )
-from app.crud.groupe import obtenir_groupe_par_id
+from app.crud.groupe import obtenir_groupe_par_id, iterer_groupes_par_utilisateur as iterer_groupes_du_membre
 from app.crud.user import recuperer_utilisateur_par_id
+from app.storage.agregats import assurer_agregats
+from app.storage.fil_travail import fil_utilisateur
 
 VALID_STATUSES = {"En attente", "En cours", "Terminé"}
 
@@ -49,12 +52,16 @@ async def get_tache(task_id: int, current_user: Dict[str, Any]) -> Dict[str, Any
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Vous ne pouvez voir que vos tâches non groupées")
     return t
 
-async def list_taches_du_groupe(group_id: int, current_user: Dict[str, Any]) -> List[Dict[str, Any]]:
+async def verifier_membre_du_groupe(group_id: int, current_user: Dict[str, Any]) -> Dict[str, Any]:
     group = await obtenir_groupe_par_id(group_id)
     if not group:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Groupe introuvable")
     if current_user["id"] not in group.get("members", []):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Vous n'êtes pas membre de ce groupe")
+    return group
+
+async def list_taches_du_groupe(group_id: int, current_user: Dict[str, Any]) -> List[Dict[str, Any]]:
+    await verifier_membre_du_groupe(group_id, current_user)
     return await lister_taches_par_groupe(group_id)
 
 async def update_tache(task_id: int, patch: Dict[str, Any], current_user: Dict[str, Any]) -> Dict[str, Any]:
@@ -87,30 +94,44 @@ async def delete_tache(task_id: int, current_user: Dict[str, Any]) -> None:
     await supprimer_tache(task_id)
 
 
-async def lister_taches_par_utilisateur(user_id: int) -> List[Dict[str, Any]]:
+async def iterer_taches_par_utilisateur(user_id: int) -> Iterator[Dict[str, Any]]:
 
     try:
-        from app.crud.tache import lister_taches_par_utilisateur as crud_lister
+        from app.crud.tache import iterer_taches_par_utilisateur as crud_iterer
     except Exception:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Fonction CRUD 'lister_taches_par_utilisateur' manquante. Implémentez-la dans app.crud.tache."
+            detail="Fonction CRUD 'iterer_taches_par_utilisateur' manquante. Implémentez-la dans app.crud.tache."
         )
 
-    tasks = await crud_lister(user_id)
+    tasks = await crud_iterer(user_id)
+    mes_groupes = {g["id"] for g in await iterer_groupes_du_membre(user_id)}
+
+    def _visibles() -> Iterator[Dict[str, Any]]:
+        for t in tasks:
+            group_id = t.get("group_id")
+            if group_id:
+                if group_id in mes_groupes:
+                    yield t
+            elif t.get("assigned_to_id") == user_id:
+                yield t
 
-    visible: List[Dict[str, Any]] = []
-    for t in tasks:
-        group_id = t.get("group_id")
-        if group_id:
-            group = await obtenir_groupe_par_id(group_id)
-            if group and user_id in group.get("members", []):
-                visible.append(t)
-        else:
-            if t.get("assigned_to_id") == user_id:
-                visible.append(t)
+    return _visibles()
 
-    return visible
+async def lister_taches_par_utilisateur(user_id: int) -> List[Dict[str, Any]]:
+    return list(await iterer_taches_par_utilisateur(user_id))
+
+async def lister_fil_utilisateur(user_id: int) -> List[Dict[str, Any]]:
+    # mêmes tâches que lister_taches_par_utilisateur, triées par échéance puis updated_at
+    return await fil_utilisateur(user_id)
+
+async def lister_taches_des_groupes(groupes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # ``groupes`` : ceux dont l'utilisateur est membre ; les tâches viennent des agrégats
+    agregats = await assurer_agregats()
+    return [
+        dict(t, _group={"id": g["id"], "name": g["name"]})
+        for g in groupes for t in agregats.taches_groupe(g["id"])
+    ]
 
 async def associer_tache_a_groupe(task_id: int, group_id: int, current_user: Dict[str, Any]) -> Dict[str, Any]:
 
@@ -130,4 +151,7 @@ async def associer_tache_a_groupe(task_id: int, group_id: int, current_user: Dic
 
     patch = {"group_id": group_id}
     updated = await mettre_a_jour_tache(task_id, patch)
-    return updated
\ No newline at end of file
+    return updated
+
+
+tracer_module(__name__, "service")
@@ -1,6 +1,7 @@
 from typing import Dict, Any, Optional
 from fastapi import HTTPException, status
 
+from app.core.traces import tracer_module
 from app.crud.user import (
     recuperer_utilisateur_par_id,
     recuperer_utilisateur_par_email,
@@ -32,3 +33,6 @@ async def delete_user(user_id: int) -> None:
         await supprimer_utilisateur(user_id)
     except KeyError:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Utilisateur introuvable")
+
+
+tracer_module(__name__, "service")
@@ -0,0 +1,149 @@
+from bisect import bisect_left, insort
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.storage.evenements import Changement, bus
+
+STATUTS_TERMINES = frozenset({"done", "Terminé"})
+
+
+def _cle_echeance(due_date: Any) -> Optional[str]:
+    if not due_date:
+        return None
+    cle = str(due_date)
+    if len(cle) == 10:
+        # une échéance sans heure court jusqu'à la fin de la journée
+        cle += "T23:59:59.999999"
+    return cle
+
+
+class StatsGroupe:
+    __slots__ = ("par_statut", "echeances", "member_count", "derniere_activite", "taches")
+
+    def __init__(self, member_count: int = 0) -> None:
+        self.par_statut: Dict[str, int] = {}
+        self.taches: Dict[int, Dict[str, Any]] = {}
+        self.echeances: List[str] = []
+        self.member_count = member_count
+        self.derniere_activite: Optional[str] = None
+
+    def en_dict(self, maintenant: str) -> Dict[str, Any]:
+        return {
+            "task_count": sum(self.par_statut.values()),
+            "tasks_by_status": dict(self.par_statut),
+            "overdue_count": bisect_left(self.echeances, maintenant),
+            "member_count": self.member_count,
+            "last_activity": self.derniere_activite,
+        }
+
+
+class AgregatsGroupes:
+    def __init__(self) -> None:
+        self.pret = False
+        self._groupes: Dict[int, StatsGroupe] = {}
+        # task_id -> (group_id, status, échéance si la tâche est ouverte)
+        self._taches: Dict[int, Tuple[Optional[int], Optional[str], Optional[str]]] = {}
+
+    def reconstruire(self, data: Dict[str, Any]) -> None:
+        self._groupes = {}
+        self._taches = {}
+        for g in data.get("groups", []):
+            self._groupes[g["id"]] = StatsGroupe(len(g.get("members", [])))
+        for t in data.get("tasks", []):
+            self._ajouter_tache(t)
+            stats = self._groupes.get(t.get("group_id"))
+            if stats is not None and t.get("updated_at"):
+                stats.derniere_activite = max(stats.derniere_activite or "", t["updated_at"])
+        self.pret = True
+
+    def _ajouter_tache(self, t: Dict[str, Any]) -> None:
+        group_id, statut = t.get("group_id"), t.get("status")
+        echeance = None if statut in STATUTS_TERMINES else _cle_echeance(t.get("due_date"))
+        self._taches[t["id"]] = (group_id, statut, echeance)
+        stats = self._groupes.get(group_id)
+        if stats is None:
+            return
+        stats.taches[t["id"]] = t
+        stats.par_statut[statut] = stats.par_statut.get(statut, 0) + 1
+        if echeance is not None:
+            insort(stats.echeances, echeance)
+
+    def _retirer_tache(self, task_id: Optional[int]) -> None:
+        ancien = self._taches.pop(task_id, None)
+        if ancien is None:
+            return
+        group_id, statut, echeance = ancien
+        stats = self._groupes.get(group_id)
+        if stats is None:
+            return
+        stats.taches.pop(task_id, None)
+        reste = stats.par_statut.get(statut, 0) - 1
+        if reste > 0:
+            stats.par_statut[statut] = reste
+        else:
+            stats.par_statut.pop(statut, None)
+        if echeance is not None:
+            i = bisect_left(stats.echeances, echeance)
+            if i < len(stats.echeances) and stats.echeances[i] == echeance:
+                del stats.echeances[i]
+
+    def appliquer(self, changement: Changement) -> None:
+        if not self.pret:
+            return
+        if changement.operation == "reset":
+            self.pret = False
+            return
+        try:
+            self._appliquer(changement)
+        except Exception:
+            # agrégats incohérents : reconstruction complète au prochain accès
+            self.pret = False
+            raise
+
+    def _appliquer(self, changement: Changement) -> None:
+        collection = changement.collection
+        if collection == "tasks":
+            self._retirer_tache(changement.id)
+            if changement.operation != "delete" and changement.objet is not None:
+                self._ajouter_tache(changement.objet)
+        elif collection == "members":
+            for gid in changement.groupes:
+                stats = self._groupes.get(gid)
+                if stats is not None:
+                    stats.member_count += 1 if changement.operation == "create" else -1
+        elif collection == "groups":
+            if changement.operation == "create" and changement.objet is not None:
+                self._groupes[changement.id] = StatsGroupe(len(changement.objet.get("members", [])))
+            elif changement.operation == "delete":
+                self._groupes.pop(changement.id, None)
+        else:
+            return
+        maintenant = datetime.utcnow().isoformat()
+        for gid in changement.groupes:
+            stats = self._groupes.get(gid)
+            if stats is not None:
+                stats.derniere_activite = maintenant
+
+    def stats_groupe(self, group_id: int) -> Optional[Dict[str, Any]]:
+        stats = self._groupes.get(group_id)
+        if stats is None:
+            return None
+        return stats.en_dict(datetime.utcnow().isoformat())
+
+    def taches_groupe(self, group_id: int) -> List[Dict[str, Any]]:
+        stats = self._groupes.get(group_id)
+        if stats is None:
+            return []
+        return sorted(stats.taches.values(), key=lambda t: t["id"])
+
+
+agregats = AgregatsGroupes()
+bus.ecouter(agregats.appliquer)
+
+
+async def assurer_agregats() -> AgregatsGroupes:
+    if not agregats.pret:
+        from app.storage.json_db import charger_db, instantane_a_jour
+        agregats.reconstruire(await charger_db())
+        agregats.pret = instantane_a_jour()
+    return agregats
@@ -0,0 +1,292 @@
+"""Enregistrements compacts de la base : utilisateurs, groupes, tâches, invitations.
+
+Un dict de tâche issu de ``json.loads`` coûte de l'ordre de 670 octets (table de
+hachage, neuf chaînes et entiers distincts). Un enregistrement compact regroupe
+identifiants et horodatages dans un seul ``bytes`` (entiers 32 bits, horodatages
+en microsecondes depuis l'époque sur 64 bits), garde les textes libres en UTF-8
+et interne les valeurs répétées comme les statuts.
+
+Les enregistrements se comportent comme des dicts (``MutableMapping``) : le code
+de la base et des services les manipule sans changement, et ``en_dict`` redonne
+à l'identique le dict d'origine pour la sérialisation. Une valeur qui n'a pas de
+forme compacte (horodatage non canonique, entier hors 32 bits, clé inconnue) est
+conservée telle quelle dans ``_extra``.
+"""
+import struct
+import sys
+from collections.abc import MutableMapping
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+ENTIER, HORODATAGE, TEXTE, INTERNE, OBJET = "entier", "horodatage", "texte", "interne", "objet"
+
+_EPOQUE = datetime(1970, 1, 1)
+_MICROSECONDE = timedelta(microseconds=1)
+_FORMATS = {ENTIER: "i", HORODATAGE: "q"}
+# sentinelles des champs empaquetés : valeur None, clé absente
+_NUL = {ENTIER: -2 ** 31, HORODATAGE: -2 ** 63}
+_ABSENT = {ENTIER: -2 ** 31 + 1, HORODATAGE: -2 ** 63 + 1}
+_MAX = {ENTIER: 2 ** 31, HORODATAGE: 2 ** 63}
+_MANQUANT = object()
+
+
+def _horodatage_vers_entier(valeur: str) -> Optional[int]:
+    """Microsecondes depuis l'époque, si ``valeur`` est une date ISO naïve que
+    ``isoformat`` reproduit à l'identique ; None sinon."""
+    n = len(valeur)
+    if not (n == 19 or (n == 26 and valeur[19] == "." and not valeur.endswith("000000"))):
+        return None
+    if valeur[4] != "-" or valeur[10] != "T" or valeur[13] != ":":
+        return None
+    try:
+        return (datetime.fromisoformat(valeur) - _EPOQUE) // _MICROSECONDE
+    except ValueError:
+        return None
+
+
+def _entier_vers_horodatage(valeur: int) -> str:
+    return (_EPOQUE + timedelta(microseconds=valeur)).isoformat()
+
+
+def _entier_32(valeur: Any) -> Optional[int]:
+    return valeur if type(valeur) is int and _ABSENT[ENTIER] < valeur < _MAX[ENTIER] else None
+
+
+def _horodatage_64(valeur: Any) -> Optional[int]:
+    return _horodatage_vers_entier(valeur) if type(valeur) is str else None
+
+
+_ENCODEURS = {ENTIER: _entier_32, HORODATAGE: _horodatage_64}
+
+
+class Enregistrement(MutableMapping):
+    __slots__ = ("_nombres", "_extra")
+
+    # (nom, genre) dans l'ordre de sérialisation ; hors ENTIER et HORODATAGE, un champ a un slot « _nom »
+    CHAMPS: Tuple[Tuple[str, str], ...] = ()
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        numeriques = [(nom, genre) for nom, genre in cls.CHAMPS if genre in _FORMATS]
+        cls._STRUCT = struct.Struct("<" + "".join(_FORMATS[genre] for _, genre in numeriques))
+        cls._NUMERIQUES = [(nom, genre, _ABSENT[genre], _NUL[genre], _ENCODEURS[genre]) for nom, genre in numeriques]
+        cls._EMPLACEMENTS = [(nom, genre, getattr(cls, "_" + nom)) for nom, genre in cls.CHAMPS if genre not in _FORMATS]
+        # nom -> (genre, décalage dans _nombres et struct du champ) ou (genre, descripteur du slot, None)
+        cls._POSITIONS = {nom: (genre, descripteur, None) for nom, genre, descripteur in cls._EMPLACEMENTS}
+        position = 0
+        for nom, genre in numeriques:
+            champ = struct.Struct("<" + _FORMATS[genre])
+            cls._POSITIONS[nom] = (genre, position, champ)
+            position += champ.size
+
+    @classmethod
+    def depuis_dict(cls, d: Dict[str, Any]) -> "Enregistrement":
+        obj = cls.__new__(cls)
+        extra = None
+        connus = 0
+        nombres = []
+        for nom, _, absent, nul, encoder in cls._NUMERIQUES:
+            valeur = d.get(nom, _MANQUANT)
+            if valeur is _MANQUANT:
+                nombres.append(absent)
+                continue
+            connus += 1
+            code = nul if valeur is None else encoder(valeur)
+            if code is None:
+                extra = extra or {}
+                extra[nom] = valeur
+                code = absent
+            nombres.append(code)
+        obj._nombres = cls._STRUCT.pack(*nombres)
+        for nom, genre, descripteur in cls._EMPLACEMENTS:
+            valeur = d.get(nom, _MANQUANT)
+            if valeur is _MANQUANT:
+                continue
+            connus += 1
+            if type(valeur) is str:
+                if genre is TEXTE:
+                    valeur = valeur.encode("utf-8")
+                elif genre is INTERNE:
+                    valeur = sys.intern(valeur)
+            elif genre is TEXTE and valeur is not None:
+                extra = extra or {}
+                extra[nom] = valeur
+                continue
+            descripteur.__set__(obj, valeur)
+        if connus != len(d):
+            extra = extra or {}
+            for nom, valeur in d.items():
+                if nom not in cls._POSITIONS:
+                    extra[nom] = valeur
+        obj._extra = extra
+        return obj
+
+    def en_dict(self) -> Dict[str, Any]:
+        resultat: Dict[str, Any] = {}
+        for (nom, genre, absent, nul, _), code in zip(self._NUMERIQUES, self._STRUCT.unpack(self._nombres)):
+            if code == absent:
+                continue
+            if code == nul:
+                resultat[nom] = None
+            else:
+                resultat[nom] = _entier_vers_horodatage(code) if genre is HORODATAGE else code
+        for nom, genre, descripteur in self._EMPLACEMENTS:
+            try:
+                valeur = descripteur.__get__(self)
+            except AttributeError:
+                continue
+            resultat[nom] = valeur.decode("utf-8") if genre is TEXTE and valeur is not None else valeur
+        if self._extra:
+            resultat.update(self._extra)
+        # ordre de CHAMPS, comme le dict d'origine
+        return {nom: resultat[nom] for nom in self._ordre(resultat)}
+
+    def _ordre(self, resultat: Dict[str, Any]) -> Iterator[str]:
+        for nom, _ in self.CHAMPS:
+            if nom in resultat:
+                yield nom
+        if self._extra:
+            for nom in self._extra:
+                if nom not in self._POSITIONS:
+                    yield nom
+
+    def get(self, cle: str, defaut: Any = None) -> Any:
+        extra = self._extra
+        if extra is not None and cle in extra:
+            return extra[cle]
+        emplacement = self._POSITIONS.get(cle)
+        if emplacement is None:
+            return defaut
+        genre, position, champ = emplacement
+        if champ is not None:
+            code = champ.unpack_from(self._nombres, position)[0]
+            if code == _ABSENT[genre]:
+                return defaut
+            if code == _NUL[genre]:
+                return None
+            return _entier_vers_horodatage(code) if genre is HORODATAGE else code
+        try:
+            valeur = position.__get__(self)
+        except AttributeError:
+            return defaut
+        return valeur.decode("utf-8") if genre is TEXTE and valeur is not None else valeur
+
+    def __getitem__(self, cle: str) -> Any:
+        valeur = self.get(cle, _MANQUANT)
+        if valeur is _MANQUANT:
+            raise KeyError(cle)
+        return valeur
+
+    def __contains__(self, cle: object) -> bool:
+        return self.get(cle, _MANQUANT) is not _MANQUANT
+
+    def __setitem__(self, cle: str, valeur: Any) -> None:
+        emplacement = self._POSITIONS.get(cle)
+        if emplacement is not None:
+            genre, position, champ = emplacement
+            if champ is not None:
+                code = _NUL[genre] if valeur is None else _ENCODEURS[genre](valeur)
+                if code is not None:
+                    self._ecrire_nombre(position, champ, code)
+                    self._retirer_extra(cle)
+                    return
+                self._ecrire_nombre(position, champ, _ABSENT[genre])
+            elif genre is not TEXTE or valeur is None or type(valeur) is str:
+                if type(valeur) is str:
+                    valeur = valeur.encode("utf-8") if genre is TEXTE else sys.intern(valeur) if genre is INTERNE else valeur
+                position.__set__(self, valeur)
+                self._retirer_extra(cle)
+                return
+            else:
+                try:
+                    position.__delete__(self)
+                except AttributeError:
+                    pass
+        if self._extra is None:
+            self._extra = {}
+        self._extra[cle] = valeur
+
+    def __delitem__(self, cle: str) -> None:
+        if cle not in self:
+            raise KeyError(cle)
+        self._retirer_extra(cle)
+        emplacement = self._POSITIONS.get(cle)
+        if emplacement is None:
+            return
+        genre, position, champ = emplacement
+        if champ is not None:
+            self._ecrire_nombre(position, champ, _ABSENT[genre])
+        else:
+            try:
+                position.__delete__(self)
+            except AttributeError:
+                pass
+
+    def _ecrire_nombre(self, position: int, champ: struct.Struct, code: int) -> None:
+        tampon = bytearray(self._nombres)
+        champ.pack_into(tampon, position, code)
+        self._nombres = bytes(tampon)
+
+    def _retirer_extra(self, cle: str) -> None:
+        if self._extra is not None and cle in self._extra:
+            del self._extra[cle]
+            if not self._extra:
+                self._extra = None
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.en_dict())
+
+    def __len__(self) -> int:
+        return len(self.en_dict())
+
+    def __getattr__(self, nom: str) -> Any:
+        # accès par attribut des gabarits Jinja et de la validation pydantic (from_attributes)
+        valeur = self.get(nom, _MANQUANT) if nom in type(self)._POSITIONS else _MANQUANT
+        if valeur is _MANQUANT:
+            raise AttributeError(nom)
+        return valeur
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.en_dict()!r})"
+
+
+class Utilisateur(Enregistrement):
+    __slots__ = ("_email", "_hashed_password", "_full_name")
+    CHAMPS = (("id", ENTIER), ("email", OBJET), ("hashed_password", OBJET), ("full_name", TEXTE))
+
+
+class Groupe(Enregistrement):
+    __slots__ = ("_name", "_description", "_members")
+    CHAMPS = (("id", ENTIER), ("name", TEXTE), ("description", TEXTE), ("owner_id", ENTIER), ("members", OBJET))
+
+
+class Tache(Enregistrement):
+    __slots__ = ("_title", "_description", "_status")
+    CHAMPS = (
+        ("id", ENTIER), ("title", TEXTE), ("description", TEXTE), ("status", INTERNE),
+        ("assigned_to_id", ENTIER), ("group_id", ENTIER),
+        ("due_date", HORODATAGE), ("created_at", HORODATAGE), ("updated_at", HORODATAGE),
+    )
+
+
+class Invitation(Enregistrement):
+    __slots__ = ("_token", "_revoked")
+    CHAMPS = (
+        ("id", ENTIER), ("token", OBJET), ("group_id", ENTIER), ("created_by", ENTIER),
+        ("expires_at", HORODATAGE), ("max_uses", ENTIER), ("uses", ENTIER), ("revoked", OBJET),
+        ("created_at", HORODATAGE),
+    )
+
+
+TYPES = {"users": Utilisateur, "groups": Groupe, "tasks": Tache, "invites": Invitation}
+
+
+def compacter(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Remplace en place les dicts des collections par des enregistrements compacts."""
+    for collection, classe in TYPES.items():
+        objets = data.get(collection)
+        if isinstance(objets, list):
+            depuis_dict = classe.depuis_dict
+            data[collection] = [depuis_dict(o) if type(o) is dict else o for o in objets]
+    return data
+
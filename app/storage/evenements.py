@@ -0,0 +1,109 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+
+class Changement(NamedTuple):
+    collection: str
+    id: Optional[int]
+    operation: str
+    groupes: Tuple[Optional[int], ...] = ()
+    objet: Optional[Dict[str, Any]] = None
+    champs: Tuple[str, ...] = ()
+    # assigné avant et après le changement : ceux qui voient une tâche hors groupe
+    utilisateurs: Tuple[Optional[int], ...] = ()
+
+
+# Déposé à la place des événements perdus quand la file d'un abonné déborde :
+# l'abonné doit alors reconstruire son état depuis la base.
+RESYNCHRONISATION = Changement("*", None, "resync")
+
+
+class Abonne:
+    def __init__(self, nom: str, traiter: Callable[[Changement], Awaitable[None]],
+                 taille: int, collections: Optional[FrozenSet[str]]) -> None:
+        self.nom = nom
+        self.traiter = traiter
+        self.collections = collections
+        self.file: "asyncio.Queue[Changement]" = asyncio.Queue(maxsize=taille)
+        self.debordements = 0
+        self.erreurs = 0
+        self.tache: Optional["asyncio.Task[None]"] = None
+
+    def recevoir(self, changement: Changement) -> None:
+        if self.collections is not None and changement.collection not in self.collections:
+            return
+        try:
+            self.file.put_nowait(changement)
+        except asyncio.QueueFull:
+            self.debordements += 1
+            log.warning("file d'événements pleine, resynchronisation", extra={"abonne": self.nom})
+            while not self.file.empty():
+                self.file.get_nowait()
+            self.file.put_nowait(RESYNCHRONISATION)
+
+    async def consommer(self) -> None:
+        while True:
+            changement = await self.file.get()
+            try:
+                await self.traiter(changement)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.erreurs += 1
+                log.exception("échec du traitement d'un événement", extra={"abonne": self.nom})
+
+
+class BusEvenements:
+    def __init__(self) -> None:
+        self._ecouteurs: List[Callable[[Changement], None]] = []
+        self._abonnes: List[Abonne] = []
+        self._demarre = False
+
+    def ecouter(self, ecouteur: Callable[[Changement], None]) -> None:
+        self._ecouteurs.append(ecouteur)
+
+    def abonner(self, nom: str, traiter: Callable[[Changement], Awaitable[None]],
+                taille: int = 1000, collections: Optional[Iterable[str]] = None) -> Abonne:
+        abonne = Abonne(nom, traiter, taille, frozenset(collections) if collections is not None else None)
+        self._abonnes.append(abonne)
+        if self._demarre:
+            abonne.tache = asyncio.get_running_loop().create_task(abonne.consommer())
+        return abonne
+
+    def publier(self, changement: Changement) -> None:
+        for ecouteur in self._ecouteurs:
+            try:
+                ecouteur(changement)
+            except Exception:
+                # un écouteur défaillant ne doit pas faire échouer une écriture déjà validée
+                log.exception("échec d'un écouteur d'événements")
+        for abonne in self._abonnes:
+            abonne.recevoir(changement)
+
+    def demarrer(self) -> None:
+        loop = asyncio.get_running_loop()
+        self._demarre = True
+        for abonne in self._abonnes:
+            if abonne.tache is None or abonne.tache.done():
+                abonne.tache = loop.create_task(abonne.consommer())
+
+    async def arreter(self) -> None:
+        self._demarre = False
+        taches = [a.tache for a in self._abonnes if a.tache is not None]
+        for tache in taches:
+            tache.cancel()
+        await asyncio.gather(*taches, return_exceptions=True)
+        for abonne in self._abonnes:
+            abonne.tache = None
+
+    def statistiques(self) -> Dict[str, Dict[str, int]]:
+        return {
+            a.nom: {"en_attente": a.file.qsize(), "debordements": a.debordements, "erreurs": a.erreurs}
+            for a in self._abonnes
+        }
+
+
+bus = BusEvenements()
@@ -0,0 +1,146 @@
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.core.config import FEED_CACHE_SIZE
+from app.storage.evenements import Changement, bus
+
+# sans échéance, une tâche passe après toutes les autres
+_SANS_ECHEANCE = "\uffff"
+
+CleTri = Tuple[str, str, int]
+
+
+def _cle_tri(t: Dict[str, Any]) -> CleTri:
+    return (str(t.get("due_date") or _SANS_ECHEANCE), str(t.get("updated_at") or ""), t["id"])
+
+
+class FilUtilisateur:
+    __slots__ = ("groupes", "entrees", "ordre")
+
+    def __init__(self, groupes: Set[int]) -> None:
+        self.groupes = groupes
+        # toutes les tâches assignées, y compris celles d'un groupe quitté :
+        # rejoindre ou quitter un groupe ne fait que changer leur visibilité
+        self.entrees: Dict[int, Tuple[CleTri, Dict[str, Any]]] = {}
+        self.ordre: List[CleTri] = []
+
+    def ajouter(self, t: Dict[str, Any]) -> None:
+        cle = _cle_tri(t)
+        self.entrees[t["id"]] = (cle, t)
+        insort(self.ordre, cle)
+
+    def retirer(self, task_id: int) -> None:
+        entree = self.entrees.pop(task_id, None)
+        if entree is None:
+            return
+        i = bisect_left(self.ordre, entree[0])
+        if i < len(self.ordre) and self.ordre[i] == entree[0]:
+            del self.ordre[i]
+
+    def taches(self) -> List[Dict[str, Any]]:
+        visibles = []
+        for cle in self.ordre:
+            t = self.entrees[cle[2]][1]
+            group_id = t.get("group_id")
+            if not group_id or group_id in self.groupes:
+                visibles.append(t)
+        return visibles
+
+
+class FilsTravail:
+    def __init__(self, taille: int = FEED_CACHE_SIZE) -> None:
+        self.taille = taille
+        self._fils: "OrderedDict[int, FilUtilisateur]" = OrderedDict()
+        # task_id -> utilisateur dont le fil en mémoire contient la tâche
+        self._proprietaires: Dict[int, int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def vider(self) -> None:
+        self._fils.clear()
+        self._proprietaires.clear()
+
+    def _evincer(self, user_id: int) -> None:
+        fil = self._fils.pop(user_id, None)
+        if fil is not None:
+            for task_id in fil.entrees:
+                self._proprietaires.pop(task_id, None)
+
+    def construire(self, user_id: int, data: Dict[str, Any], conserver: bool = True) -> FilUtilisateur:
+        groupes = {g["id"] for g in data.get("groups", []) if user_id in g.get("members", [])}
+        fil = FilUtilisateur(groupes)
+        for t in data.get("tasks", []):
+            if t.get("assigned_to_id") == user_id:
+                fil.ajouter(t)
+        if not conserver:
+            return fil
+        self._evincer(user_id)
+        for task_id in fil.entrees:
+            self._proprietaires[task_id] = user_id
+        self._fils[user_id] = fil
+        while len(self._fils) > self.taille:
+            self._evincer(next(iter(self._fils)))
+        return fil
+
+    def obtenir(self, user_id: int) -> Optional[FilUtilisateur]:
+        fil = self._fils.get(user_id)
+        if fil is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._fils.move_to_end(user_id)
+        return fil
+
+    def appliquer(self, changement: Changement) -> None:
+        if not self._fils:
+            return
+        try:
+            self._appliquer(changement)
+        except Exception:
+            self.vider()
+            raise
+
+    def _appliquer(self, changement: Changement) -> None:
+        collection, operation = changement.collection, changement.operation
+        if operation == "reset":
+            self.vider()
+        elif collection == "tasks":
+            ancien = self._proprietaires.pop(changement.id, None)
+            if ancien is not None and ancien in self._fils:
+                self._fils[ancien].retirer(changement.id)
+            t = changement.objet
+            if operation != "delete" and t is not None:
+                fil = self._fils.get(t.get("assigned_to_id"))
+                if fil is not None:
+                    fil.ajouter(t)
+                    self._proprietaires[t["id"]] = t["assigned_to_id"]
+        elif collection == "members":
+            fil = self._fils.get(changement.id)
+            if fil is not None:
+                for gid in changement.groupes:
+                    if operation == "create":
+                        fil.groupes.add(gid)
+                    else:
+                        fil.groupes.discard(gid)
+        elif collection == "groups" and operation == "create" and changement.objet is not None:
+            for user_id in changement.objet.get("members", []):
+                fil = self._fils.get(user_id)
+                if fil is not None:
+                    fil.groupes.add(changement.id)
+        elif collection == "users" and operation == "delete":
+            self._evincer(changement.id)
+
+
+fils_travail = FilsTravail()
+bus.ecouter(fils_travail.appliquer)
+
+
+async def fil_utilisateur(user_id: int) -> List[Dict[str, Any]]:
+    fil = fils_travail.obtenir(user_id)
+    if fil is None:
+        from app.storage.json_db import charger_db, instantane_a_jour
+        data = await charger_db()
+        # un fil construit sur un instantané dépassé manquerait les écritures déjà publiées
+        fil = fils_travail.construire(user_id, data, conserver=instantane_a_jour())
+    return fil.taches()
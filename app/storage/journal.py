@@ -0,0 +1,36 @@
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+
+from app.core.config import SYNC_LOG_SIZE
+from app.storage.evenements import Changement, bus
+
+
+class JournalChangements:
+    def __init__(self, taille: int = SYNC_LOG_SIZE) -> None:
+        self.seq = 0
+        # aucun curseur antérieur à la dernière réinitialisation ne peut être servi
+        self.seq_reset = 0
+        self.entrees: Deque[Tuple[int, Changement]] = deque(maxlen=taille)
+
+    def enregistrer(self, changement: Changement) -> None:
+        self.seq += 1
+        if changement.operation == "reset":
+            self.seq_reset = self.seq
+        self.entrees.append((self.seq, changement))
+
+    def depuis(self, since: int) -> Optional[List[Tuple[int, Changement]]]:
+        """Changements de numéro > since, ou None si le journal ne couvre plus ce curseur."""
+        premier = self.entrees[0][0] if self.entrees else self.seq + 1
+        if since > self.seq or since < self.seq_reset or since < premier - 1:
+            return None
+        resultat = []
+        for entree in reversed(self.entrees):
+            if entree[0] <= since:
+                break
+            resultat.append(entree)
+        resultat.reverse()
+        return resultat
+
+
+journal = JournalChangements()
+bus.ecouter(journal.enregistrer)
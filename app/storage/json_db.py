@@ -1,14 +1,59 @@
 import json
+import os
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple
 import asyncio
 import bcrypt
+import logging
 import secrets
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from time import perf_counter
 from datetime import datetime, timedelta
 
-from app.core.config import DATABASE_JSON_PATH
+try:
+    import fcntl
+except ImportError:  # Windows : pas de verrou entre processus
+    fcntl = None
+
+from app.core.config import COMPACT_RECORDS, DATABASE_JSON_PATH
+from app.core.reponses import encoder_json, vers_dict
+from app.core.metriques import (
+    ATTENTE_VERROU, DUREE_BCRYPT, DUREE_CHARGEMENT, DUREE_SAUVEGARDE, OCTETS_CHARGES, OCTETS_SAUVES, TENUE_VERROU,
+)
+from app.core.traces import dans_executeur, span, tracer, tracer_module
+from app.storage.enregistrements import compacter
+from app.storage.evenements import Changement, bus
+
+log = logging.getLogger(__name__)
 
 _lock = asyncio.Lock()
+_verrou_ecriture = asyncio.Lock()
+_generation = 0
+# (inode, mtime, taille) du fichier tel que ce processus l'a lu ou écrit en dernier
+_signature: Optional[Tuple[int, int, int]] = None
+
+EPOQUE = secrets.token_hex(4)
+_versions: Dict[str, int] = {}
+_versions_groupes: Dict[int, int] = {}
+
+
+class ConflitEcriture(RuntimeError):
+    pass
+
+
+class _Snapshot:
+    __slots__ = ("data", "generation", "modifie", "changements", "verrouille")
+
+    def __init__(self) -> None:
+        self.data: Optional[Dict[str, Any]] = None
+        self.generation = -1
+        self.modifie = False
+        self.changements: List[Changement] = []
+        self.verrouille = False
+
+
+_snapshot_courant: ContextVar[Optional[_Snapshot]] = ContextVar("snapshot_db", default=None)
 
 def _ensure_file(path: Path) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
@@ -22,25 +67,227 @@ def _ensure_file(path: Path) -> None:
         }
         path.write_text(json.dumps(initial, ensure_ascii=False, indent=2), encoding="utf-8")
 
-async def _lire_brut(path: Path) -> Dict[str, Any]:
-    loop = asyncio.get_running_loop()
-    return await loop.run_in_executor(None, lambda: json.loads(path.read_text(encoding="utf-8")))
+def _signature_de(stat: os.stat_result) -> Tuple[int, int, int]:
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+@contextmanager
+def _verrou_fichier(path: Path) -> Iterator[None]:
+    # sérialise les écritures des workers d'un même fichier, la lecture n'en a pas besoin
+    if fcntl is None:
+        yield
+        return
+    with open(path.with_name(path.name + ".lock"), "a") as verrou:
+        fcntl.flock(verrou, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(verrou, fcntl.LOCK_UN)
+
+def _ecrire_atomique(path: Path, brut: bytes, attendu: Optional[Tuple[int, int, int]] = None) -> Optional[Tuple[int, int, int]]:
+    """Remplace le fichier d'un bloc (fichier temporaire puis rename) : un lecteur
+    d'un autre processus ne voit jamais de JSON tronqué. Avec ``attendu``, renvoie
+    None sans rien écrire si le fichier a changé depuis."""
+    with _verrou_fichier(path):
+        if attendu is not None and _signature_de(path.stat()) != attendu:
+            return None
+        temporaire = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(temporaire, "wb") as f:
+            f.write(brut)
+            f.flush()
+            signature = _signature_de(os.fstat(f.fileno()))
+        os.replace(temporaire, path)
+    return signature
+
+def _constater(signature: Tuple[int, int, int], data: Dict[str, Any]) -> None:
+    """Appelé sous le verrou après chaque lecture : si un autre processus (worker
+    uvicorn, CLI) a écrit depuis notre dernier accès, tout l'état dérivé de ce
+    processus (versions des ETag, agrégats, fils, journal de synchronisation) est périmé."""
+    global _signature, _generation
+    if _signature is not None and signature != _signature:
+        log.info("base modifiée par un autre processus, état dérivé réinitialisé")
+        _generation += 1
+        _reinitialiser_derives(data)
+    _signature = signature
 
-async def _ecrire_brut(path: Path, data: Dict[str, Any]) -> None:
-    loop = asyncio.get_running_loop()
+async def _lire_brut(path: Path) -> Dict[str, Any]:
+    def _read():
+        with span("json_db.read_file", "storage"):
+            with open(path, "rb") as f:
+                signature = _signature_de(os.fstat(f.fileno()))
+                brut = f.read()
+        with span("json_db.decode", "storage", octets=len(brut)):
+            data = json.loads(brut)
+        if COMPACT_RECORDS:
+            with span("json_db.compact", "storage"):
+                compacter(data)
+        return len(brut), signature, data
+    debut = perf_counter()
+    taille, signature, data = await dans_executeur(_read)
+    DUREE_CHARGEMENT.observer(perf_counter() - debut)
+    OCTETS_CHARGES.inc(taille)
+    _constater(signature, data)
+    return data
+
+async def _ecrire_brut(path: Path, data: Dict[str, Any], verifier: bool = False) -> bool:
+    """Écrit ``data`` ; avec ``verifier``, refuse (False) si un autre processus a
+    écrit depuis la dernière lecture de ce processus."""
+    global _signature
+    attendu = _signature if verifier else None
     def _write():
-        path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
-    await loop.run_in_executor(None, _write)
+        with span("json_db.encode", "storage"):
+            brut = json.dumps(data, ensure_ascii=False, indent=2, default=vers_dict).encode("utf-8")
+        with span("json_db.write_file", "storage", octets=len(brut)):
+            return len(brut), _ecrire_atomique(path, brut, attendu)
+    debut = perf_counter()
+    taille, signature = await dans_executeur(_write)
+    if signature is None:
+        return False
+    _signature = signature
+    DUREE_SAUVEGARDE.observer(perf_counter() - debut)
+    OCTETS_SAUVES.inc(taille)
+    return True
+
+@asynccontextmanager
+async def _verrou(operation: str) -> AsyncIterator[None]:
+    debut = perf_counter()
+    async with _lock:
+        acquis = perf_counter()
+        ATTENTE_VERROU.observer(acquis - debut, ("store",))
+        try:
+            yield
+        finally:
+            TENUE_VERROU.observer(perf_counter() - acquis, (operation,))
 
 async def charger_db() -> Dict[str, Any]:
+    snap = _snapshot_courant.get()
+    if snap is not None and snap.data is not None:
+        return snap.data
     _ensure_file(DATABASE_JSON_PATH)
-    async with _lock:
-        return await _lire_brut(DATABASE_JSON_PATH)
+    async with _verrou("load"):
+        data = await _lire_brut(DATABASE_JSON_PATH)
+        if snap is not None:
+            snap.data = data
+            snap.generation = _generation
+    return data
 
 async def sauvegarder_db(data: Dict[str, Any]) -> None:
+    global _generation
+    snap = _snapshot_courant.get()
+    if snap is not None:
+        if not snap.verrouille:
+            await _verrouiller_ecriture(snap)
+        if snap.data is None:
+            snap.generation = _generation
+        snap.data = data
+        snap.modifie = True
+        return
     _ensure_file(DATABASE_JSON_PATH)
-    async with _lock:
+    async with _verrou("save"):
         await _ecrire_brut(DATABASE_JSON_PATH, data)
+        _generation += 1
+
+async def _verrouiller_ecriture(snap: _Snapshot) -> None:
+    debut = perf_counter()
+    await _verrou_ecriture.acquire()
+    snap.verrouille = True
+    ATTENTE_VERROU.observer(perf_counter() - debut, ("ecriture",))
+
+@asynccontextmanager
+async def _sans_verrou_ecriture() -> AsyncIterator[None]:
+    """Rend le verrou d'écriture le temps du bloc si l'unité de travail n'a encore
+    rien modifié ; si une autre a validé entre-temps, la prochaine lecture repart du fichier."""
+    snap = _snapshot_courant.get()
+    if snap is None or not snap.verrouille or snap.modifie or snap.changements:
+        yield
+        return
+    snap.verrouille = False
+    _verrou_ecriture.release()
+    try:
+        yield
+    finally:
+        await _verrouiller_ecriture(snap)
+        if snap.data is not None and snap.generation != _generation:
+            snap.data = None
+
+@tracer("storage")
+async def _valider_snapshot(snap: _Snapshot) -> None:
+    global _generation
+    if not snap.modifie or snap.data is None:
+        return
+    _ensure_file(DATABASE_JSON_PATH)
+    async with _verrou("commit"):
+        if snap.generation != _generation:
+            raise ConflitEcriture("La base a été modifiée par une autre requête")
+        if not await _ecrire_brut(DATABASE_JSON_PATH, snap.data, verifier=True):
+            # écriture d'un autre processus : relire pour remettre l'état dérivé à jour
+            await _lire_brut(DATABASE_JSON_PATH)
+            raise ConflitEcriture("La base a été modifiée par un autre processus")
+        _generation += 1
+        for changement in snap.changements:
+            _appliquer_changement(changement)
+
+def _appliquer_changement(changement: Changement) -> None:
+    _versions[changement.collection] = _versions.get(changement.collection, 0) + 1
+    for gid in dict.fromkeys(changement.groupes):
+        if gid is not None:
+            _versions_groupes[gid] = _versions_groupes.get(gid, 0) + 1
+    bus.publier(changement)
+
+def noter_changement(collection: str, obj_id: Optional[int], operation: str,
+                     *group_ids: Optional[int], objet: Optional[Dict[str, Any]] = None,
+                     champs: Iterable[str] = (), utilisateurs: Iterable[Optional[int]] = ()) -> None:
+    changement = Changement(collection, obj_id, operation, group_ids, objet, tuple(champs), tuple(utilisateurs))
+    snap = _snapshot_courant.get()
+    if snap is not None:
+        snap.changements.append(changement)
+    else:
+        _appliquer_changement(changement)
+
+
+def _versions_coherentes() -> bool:
+    # Un instantané chargé avant une écriture ne doit pas être étiqueté avec les versions d'après.
+    snap = _snapshot_courant.get()
+    return snap is None or snap.data is None or snap.generation == _generation
+
+def instantane_a_jour() -> bool:
+    # Vrai si les données de la requête reflètent exactement l'état validé.
+    snap = _snapshot_courant.get()
+    return _versions_coherentes() and not (snap is not None and snap.modifie)
+
+def version_collection(collection: str) -> Optional[int]:
+    if not _versions_coherentes():
+        return None
+    return _versions.get(collection, 0)
+
+def version_groupe(group_id: int) -> Optional[int]:
+    if not _versions_coherentes():
+        return None
+    return _versions_groupes.get(group_id, 0)
+
+@asynccontextmanager
+async def snapshot_db(ecriture: bool = False) -> AsyncIterator[None]:
+    """Unité de travail : une seule lecture de la base, écritures validées à la sortie.
+
+    Avec ``ecriture=True`` les requêtes modifiantes sont sérialisées pour que la
+    validation finale ne puisse pas écraser les changements d'une autre requête.
+    Sans, le verrou n'est pris qu'à la première écriture, s'il y en a une : une
+    lecture antérieure à une autre validation se solde alors par ConflitEcriture.
+    Une exception levée dans le bloc annule toutes les modifications.
+    """
+    if _snapshot_courant.get() is not None:
+        yield
+        return
+    snap = _Snapshot()
+    jeton = _snapshot_courant.set(snap)
+    try:
+        if ecriture:
+            await _verrouiller_ecriture(snap)
+        yield
+        await _valider_snapshot(snap)
+    finally:
+        if snap.verrouille:
+            _verrou_ecriture.release()
+        _snapshot_courant.reset(jeton)
 
 async def obtenir_prochain_id(kind: str) -> int:
     data = await charger_db()
@@ -77,7 +324,8 @@ async def ajouter_utilisateur(user_obj: Dict[str, Any]) -> Dict[str, Any]:
     user_obj["id"] = await obtenir_prochain_id("users")
     data.setdefault("users", []).append(user_obj)
     await sauvegarder_db(data)
-    print(user_obj)
+    noter_changement("users", user_obj["id"], "create")
+    log.info("utilisateur créé", extra={"user_id": user_obj["id"]})
     return user_obj
 
 async def ajouter_groupe(group_obj: Dict[str, Any]) -> Dict[str, Any]:
@@ -86,6 +334,7 @@ async def ajouter_groupe(group_obj: Dict[str, Any]) -> Dict[str, Any]:
     group_obj.setdefault("members", [])
     data.setdefault("groups", []).append(group_obj)
     await sauvegarder_db(data)
+    noter_changement("groups", group_obj["id"], "create", group_obj["id"], objet=group_obj)
     return group_obj
 
 async def obtenir_groupe_par_id(group_id: int) -> Optional[Dict[str, Any]]:
@@ -102,6 +351,7 @@ async def ajouter_membre_au_groupe(group_id: int, user_id: int) -> None:
             if user_id not in g.setdefault("members", []):
                 g["members"].append(user_id)
                 await sauvegarder_db(data)
+                noter_changement("members", user_id, "create", group_id)
             return
 
 async def retirer_membre_du_groupe(group_id: int, user_id: int) -> None:
@@ -112,6 +362,7 @@ async def retirer_membre_du_groupe(group_id: int, user_id: int) -> None:
             if user_id in members:
                 members.remove(user_id)
                 await sauvegarder_db(data)
+                noter_changement("members", user_id, "delete", group_id)
             return
 
 async def creer_tache(title: str, description: Optional[str] = None,
@@ -134,6 +385,7 @@ async def creer_tache(title: str, description: Optional[str] = None,
     data.setdefault("tasks", []).append(task)
     data["next_ids"]["tasks"] = nid + 1
     await sauvegarder_db(data)
+    noter_changement("tasks", nid, "create", group_id, objet=task, utilisateurs=(assigned_to_id,))
     return task
 
 async def recuperer_tache(task_id: int) -> Optional[Dict[str, Any]]:
@@ -151,6 +403,7 @@ async def mettre_a_jour_tache(task_id: int, patch: Dict[str, Any]) -> Dict[str,
     data = await charger_db()
     for t in data.get("tasks", []):
         if t.get("id") == task_id:
+            ancien_groupe, ancien_assigne = t.get("group_id"), t.get("assigned_to_id")
             if "title" in patch:
                 t["title"] = patch["title"]
             if "description" in patch:
@@ -165,6 +418,9 @@ async def mettre_a_jour_tache(task_id: int, patch: Dict[str, Any]) -> Dict[str,
                 t["due_date"] = patch["due_date"]
             t["updated_at"] = datetime.utcnow().isoformat()
             await sauvegarder_db(data)
+            champs = [c for c in ("title", "description", "status", "assigned_to_id", "group_id", "due_date") if c in patch]
+            noter_changement("tasks", task_id, "update", ancien_groupe, t.get("group_id"), objet=t, champs=champs + ["updated_at"],
+                             utilisateurs=(ancien_assigne, t.get("assigned_to_id")))
             return t
     raise KeyError("Tâche introuvable")
 
@@ -176,6 +432,8 @@ async def supprimer_tache(task_id: int) -> None:
         raise KeyError("Tâche introuvable")
     data["tasks"] = new_tasks
     await sauvegarder_db(data)
+    supprimee = next(t for t in tasks if t.get("id") == task_id)
+    noter_changement("tasks", task_id, "delete", supprimee.get("group_id"), utilisateurs=(supprimee.get("assigned_to_id"),))
 
 async def creer_invitation(group_id: int, created_by: int, expires_in_days: int = 7, max_uses: int = 1) -> Dict[str, Any]:
     data = await charger_db()
@@ -199,6 +457,7 @@ async def creer_invitation(group_id: int, created_by: int, expires_in_days: int
     data.setdefault("invites", []).append(invite)
     data["next_ids"]["invites"] = nid + 1
     await sauvegarder_db(data)
+    noter_changement("invites", nid, "create")
     return invite
 
 async def obtenir_invite_par_token(token: str) -> Optional[Dict[str, Any]]:
@@ -224,16 +483,21 @@ async def utiliser_invite(token: str, user_id: int) -> Dict[str, Any]:
                 if exp and exp < datetime.utcnow():
                     raise ValueError("Invitation expirée")
 
+            membre_ajoute = False
             for g in data.get("groups", []):
                 if g.get("id") == inv["group_id"]:
                     if user_id not in g.setdefault("members", []):
                         g["members"].append(user_id)
+                        membre_ajoute = True
                     break
             inv["uses"] = inv.get("uses", 0) + 1
 
             if inv["uses"] >= inv.get("max_uses", 1):
                 inv["revoked"] = True
             await sauvegarder_db(data)
+            noter_changement("invites", inv.get("id"), "update", champs=("uses", "revoked"))
+            if membre_ajoute:
+                noter_changement("members", user_id, "create", inv["group_id"])
             return inv
     raise KeyError("Invitation introuvable")
 
@@ -243,18 +507,39 @@ async def revoke_invite(invite_id: int) -> None:
         if inv.get("id") == invite_id:
             inv["revoked"] = True
             await sauvegarder_db(data)
+            noter_changement("invites", invite_id, "update", champs=("revoked",))
             return
     raise KeyError("Invitation introuvable")
 
+@tracer("storage")
 def hacher_mot_de_passe(password: str) -> str:
+    debut = perf_counter()
     hashed = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt())
+    DUREE_BCRYPT.observer(perf_counter() - debut, ("hash",))
     return hashed.decode("utf-8")
 
+async def hacher_hors_verrou(password: str) -> str:
+    # bcrypt dure ~300 ms : hors de la boucle, et sans bloquer les écritures des autres requêtes
+    async with _sans_verrou_ecriture():
+        return await dans_executeur(hacher_mot_de_passe, password)
+
+@tracer("storage")
 def verifier_mot_de_passe(hashed: str, password: str) -> bool:
-    return bcrypt.checkpw(password.encode("utf-8"), hashed.encode("utf-8"))
+    debut = perf_counter()
+    try:
+        return bcrypt.checkpw(password.encode("utf-8"), hashed.encode("utf-8"))
+    finally:
+        DUREE_BCRYPT.observer(perf_counter() - debut, ("verify",))
+
+# hachés bcrypt des comptes de démonstration, calculés une fois pour toutes :
+# trois bcrypt au démarrage bloquaient la boucle près d'une seconde
+HACHES_AMORCE = {
+    "password1": "$2b$12$FBPie6t.X5kx7l.K/BoTwO89dwBSF4s5PNVexi2KthsCXx3oQOVNq",
+    "password2": "$2b$12$m4n1th8bAVAmXl.1gGSbZOLmZZd0UueaWeTo5j6pqqXW6y5Y7x1He",
+    "password3": "$2b$12$aAxGPHTLgvxogusPqNeT5ukoI1G82NOq3DU0omfVgawKrKJZIMPve",
+}
 
 async def seed_db(force: bool = False) -> None:
-
     _ensure_file(DATABASE_JSON_PATH)
     async with _lock:
         loop = asyncio.get_running_loop()
@@ -262,13 +547,10 @@ async def seed_db(force: bool = False) -> None:
         if data.get("users") and not force:
             return
 
-        def _hash(pw: str) -> str:
-            return bcrypt.hashpw(pw.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
-
         users: List[Dict[str, Any]] = [
-            {"id": 1, "email": "alice@example.com", "hashed_password": _hash("password1"), "full_name": "Alice"},
-            {"id": 2, "email": "bob@example.com", "hashed_password": _hash("password2"), "full_name": "Bob"},
-            {"id": 3, "email": "carol@example.com", "hashed_password": _hash("password3"), "full_name": "Carol"},
+            {"id": 1, "email": "alice@example.com", "hashed_password": HACHES_AMORCE["password1"], "full_name": "Alice"},
+            {"id": 2, "email": "bob@example.com", "hashed_password": HACHES_AMORCE["password2"], "full_name": "Bob"},
+            {"id": 3, "email": "carol@example.com", "hashed_password": HACHES_AMORCE["password3"], "full_name": "Carol"},
         ]
 
         groups: List[Dict[str, Any]] = [
@@ -322,4 +604,34 @@ async def seed_db(force: bool = False) -> None:
             "invites": invites,
             "next_ids": {"users": 4, "groups": 3, "tasks": 3, "invites": 2},
         }
-        await loop.run_in_executor(None, lambda: DATABASE_JSON_PATH.write_text(json.dumps(new_data, ensure_ascii=False, indent=2), encoding="utf-8"))
+        await _remplacer(new_data)
+
+
+def _reinitialiser_derives(data: Dict[str, Any]) -> None:
+    for collection in ("users", "members", "tasks", "invites"):
+        _appliquer_changement(Changement(collection, None, "reset"))
+    _appliquer_changement(Changement("groups", None, "reset", tuple(g["id"] for g in data.get("groups", []))))
+
+
+async def _remplacer(data: Dict[str, Any], compact: bool = False) -> None:
+    global _generation, _signature
+    def _write():
+        if compact:
+            brut = encoder_json(data)
+        else:
+            brut = json.dumps(data, ensure_ascii=False, indent=2, default=vers_dict).encode("utf-8")
+        return _ecrire_atomique(DATABASE_JSON_PATH, brut)
+    _signature = await dans_executeur(_write)
+    _generation += 1
+    _reinitialiser_derives(data)
+
+
+async def remplacer_db(data: Dict[str, Any], compact: bool = True) -> None:
+    """Remplace tout le contenu de la base, hors unité de travail (amorçage, jeux générés).
+    ``compact`` écrit sans indentation : nettement plus rapide sur les gros volumes."""
+    _ensure_file(DATABASE_JSON_PATH)
+    async with _verrou("replace"):
+        await _remplacer(data, compact)
+
+
+tracer_module(__name__, "storage")
@@ -0,0 +1,112 @@
+"""Jeux de données synthétiques, déterministes pour une graine donnée.
+
+La taille des groupes suit une loi de puissance (Zipf) : quelques groupes très
+peuplés, une longue traîne de petits groupes ; le nombre de tâches d'un groupe
+suit sa taille. Les horodatages sont tirés d'un réservoir de chaînes ISO
+précalculées, ce qui garde la génération d'un million de tâches en secondes.
+"""
+import base64
+import random
+from datetime import datetime, timedelta
+from itertools import accumulate
+from typing import Any, Dict, List
+
+import bcrypt
+
+MOT_DE_PASSE = "password"
+STATUTS = ("todo", "in_progress", "done")
+POIDS_STATUTS = (5, 3, 2)
+ORIGINE = datetime(2024, 1, 1)
+TAILLE_RESERVOIR = 4096
+
+_ALPHABET_BCRYPT = "./ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789"
+
+
+def _repartir(total: int, nombre: int, exposant: float, plafond: int, minimum: int = 0) -> List[int]:
+    """Répartit ``total`` sur ``nombre`` rangs selon 1/rang^exposant, chaque part bornée à [minimum, plafond]."""
+    if nombre == 0:
+        return []
+    poids = [1 / (rang ** exposant) for rang in range(1, nombre + 1)]
+    somme = sum(poids)
+    return [max(minimum, min(plafond, round(total * p / somme))) for p in poids]
+
+
+def generer_donnees(utilisateurs: int, groupes: int, membres_par_groupe: int, taches_par_groupe: int,
+                    invitations: int, graine: int = 0, exposant: float = 1.0) -> Dict[str, Any]:
+    """Base complète au format du stockage JSON ; ``membres_par_groupe`` et
+    ``taches_par_groupe`` sont des moyennes, la répartition entre groupes est biaisée."""
+    rng = random.Random(graine)
+    # sel fixe pour un haché reproductible ; le 22e caractère ne porte que 2 bits utiles
+    sel = "$2b$12$" + "".join(rng.choice(_ALPHABET_BCRYPT) for _ in range(21)) + rng.choice(".Oeu")
+    hache = bcrypt.hashpw(MOT_DE_PASSE.encode("utf-8"), sel.encode("ascii")).decode("utf-8")
+
+    passe = [(ORIGINE + timedelta(seconds=rng.randrange(365 * 86400))).isoformat() for _ in range(TAILLE_RESERVOIR)]
+    futur = [(ORIGINE + timedelta(days=365, seconds=rng.randrange(180 * 86400))).isoformat()
+             for _ in range(TAILLE_RESERVOIR)]
+
+    users = [
+        {"id": i, "email": f"user{i}@example.com", "hashed_password": hache, "full_name": f"Utilisateur {i}"}
+        for i in range(1, utilisateurs + 1)
+    ]
+
+    tailles = _repartir(groupes * membres_par_groupe, groupes, exposant, utilisateurs, min(1, utilisateurs))
+    rng.shuffle(tailles)
+    groups = []
+    for gid, taille in enumerate(tailles, 1):
+        members = rng.sample(range(1, utilisateurs + 1), taille) if taille else []
+        groups.append({
+            "id": gid, "name": f"Groupe {gid}", "description": f"Groupe synthétique de {taille} membres",
+            "owner_id": members[0] if members else None, "members": members,
+        })
+
+    # les tâches suivent la taille des groupes
+    total_taches = groupes * taches_par_groupe
+    somme_tailles = sum(tailles) or 1
+    repartition = [round(total_taches * t / somme_tailles) for t in tailles]
+    cumul_statuts = list(accumulate(POIDS_STATUTS))
+    tasks = []
+    tid = 1
+    aleatoire = rng.random
+    for group, nombre in zip(groups, repartition):
+        gid, members = group["id"], group["members"]
+        statuts = rng.choices(STATUTS, cum_weights=cumul_statuts, k=nombre)
+        for statut in statuts:
+            cree = passe[int(aleatoire() * TAILLE_RESERVOIR)]
+            tasks.append({
+                "id": tid,
+                "title": f"Tâche {tid}",
+                "description": None,
+                "status": statut,
+                "assigned_to_id": members[int(aleatoire() * len(members))] if members and aleatoire() < 0.8 else None,
+                "group_id": gid,
+                "due_date": futur[int(aleatoire() * TAILLE_RESERVOIR)] if aleatoire() < 0.6 else None,
+                "created_at": cree,
+                "updated_at": cree,
+            })
+            tid += 1
+
+    invites = []
+    for iid in range(1, invitations + 1):
+        group = groups[int(aleatoire() * len(groups))] if groups else None
+        if group is None or group["owner_id"] is None:
+            break
+        invites.append({
+            "id": iid,
+            "token": base64.urlsafe_b64encode(rng.getrandbits(256).to_bytes(32, "big")).rstrip(b"=").decode("ascii"),
+            "group_id": group["id"],
+            "created_by": group["owner_id"],
+            "expires_at": futur[int(aleatoire() * TAILLE_RESERVOIR)],
+            "max_uses": rng.choice((1, 5, 50)),
+            "uses": 0,
+            "revoked": False,
+            "created_at": passe[int(aleatoire() * TAILLE_RESERVOIR)],
+        })
+
+    return {
+        "users": users,
+        "groups": groups,
+        "tasks": tasks,
+        "invites": invites,
+        "next_ids": {"users": len(users) + 1, "groups": len(groups) + 1,
+                     "tasks": len(tasks) + 1, "invites": len(invites) + 1},
+    }
@@ -0,0 +1,366 @@
+"""Test de charge HTTP : des utilisateurs virtuels concurrents rejouent des parcours pondérés.
+
+    python -m benchmarks.charge --vus 50 --duree 30                        # application en mémoire
+    python -m benchmarks.charge --uvicorn --vus 200                        # serveur uvicorn lancé à part
+    python -m benchmarks.charge --url http://127.0.0.1:8000 --users 10000  # serveur déjà lancé
+
+En mémoire et avec --uvicorn, une base synthétique de --taches tâches est générée
+(app.storage.synthetique) dans un dossier temporaire. Avec --url, le serveur doit
+servir une base produite par ``python -m app.cli.generer`` : les comptes
+user{i}@example.com / password y existent pour i de 1 à --users.
+
+En mémoire, client et serveur partagent la boucle : les latences incluent le
+client, à comparer entre elles plutôt qu'à une mesure uvicorn. Le rapport donne,
+par étape, débit, percentiles et taux d'erreur côté client, puis, par route, les
+histogrammes de /metrics (différence avant/après le run).
+
+--uvicorn ne lance qu'un worker : les métriques sont propres à chaque processus,
+/metrics ne décrirait qu'un worker pris au hasard, et les workers d'une même
+base JSON sérialisent leurs écritures par verrou de fichier au lieu de se
+répartir la charge.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+# statuts acceptés par PATCH /tasks (app.services.tache.VALID_STATUSES)
+STATUTS = ("En attente", "En cours", "Terminé")
+
+
+class Statistiques:
+    def __init__(self) -> None:
+        self.durees: Dict[str, List[float]] = defaultdict(list)
+        self.erreurs: Dict[str, int] = defaultdict(int)
+        self.statuts: Dict[int, int] = defaultdict(int)
+
+    def noter(self, etape: str, duree: float, statut: Optional[int], ok: bool) -> None:
+        self.durees[etape].append(duree)
+        self.statuts[statut or 0] += 1
+        if not ok:
+            self.erreurs[etape] += 1
+
+
+class UtilisateurVirtuel:
+    def __init__(self, client: httpx.AsyncClient, user_id: int, stats: Statistiques,
+                 invitations: List[str], rng: random.Random) -> None:
+        self.client, self.user_id, self.stats, self.invitations, self.rng = client, user_id, stats, invitations, rng
+        self.groupes: List[Dict[str, Any]] = []
+
+    async def requete(self, etape: str, methode: str, url: str, attendus: Tuple[int, ...] = (200,),
+                      **kwargs: Any) -> Optional[httpx.Response]:
+        debut = time.perf_counter()
+        try:
+            reponse = await self.client.request(methode, url, **kwargs)
+        except httpx.HTTPError:
+            self.stats.noter(etape, time.perf_counter() - debut, None, False)
+            return None
+        self.stats.noter(etape, time.perf_counter() - debut, reponse.status_code, reponse.status_code in attendus)
+        return reponse
+
+    def groupe(self) -> Optional[Dict[str, Any]]:
+        return self.rng.choice(self.groupes) if self.groupes else None
+
+
+async def connexion(vu: UtilisateurVirtuel) -> None:
+    await vu.requete("login", "POST", "/auth/login", attendus=(303,),
+                     data={"email": f"user{vu.user_id}@example.com", "password": "password"})
+    reponse = await vu.requete("my_groups", "GET", "/groups/my-groups")
+    if reponse is not None and reponse.status_code == 200:
+        vu.groupes = reponse.json()
+
+
+async def tableau_de_bord(vu: UtilisateurVirtuel) -> None:
+    await vu.requete("dashboard", "GET", "/")
+
+
+async def detail_groupe(vu: UtilisateurVirtuel) -> None:
+    groupe = vu.groupe()
+    if groupe is not None:
+        await vu.requete("group_detail", "GET", f"/groups/{groupe['id']}")
+
+
+async def taches_groupe(vu: UtilisateurVirtuel) -> None:
+    groupe = vu.groupe()
+    if groupe is not None:
+        await vu.requete("group_tasks", "GET", f"/groups/{groupe['id']}/tasks")
+
+
+async def creer_tache(vu: UtilisateurVirtuel) -> None:
+    groupe = vu.groupe()
+    if groupe is not None:
+        await vu.requete("create_task", "POST", f"/groups/{groupe['id']}/tasks",
+                         json={"title": f"Charge {vu.rng.random():.6f}"})
+
+
+async def modifier_tache(vu: UtilisateurVirtuel) -> None:
+    groupe = vu.groupe()
+    if groupe is None:
+        return
+    reponse = await vu.requete("group_tasks", "GET", f"/groups/{groupe['id']}/tasks")
+    if reponse is None or reponse.status_code != 200:
+        return
+    miennes = [t["id"] for t in reponse.json() if t.get("assigned_to_id") == vu.user_id]
+    if miennes:
+        await vu.requete("edit_task", "PATCH", f"/tasks/{vu.rng.choice(miennes)}",
+                         json={"status": vu.rng.choice(STATUTS)})
+
+
+async def inviter_rejoindre(vu: UtilisateurVirtuel) -> None:
+    """Un propriétaire crée une invitation ; un autre utilisateur virtuel la consomme plus tard."""
+    possedes = [g for g in vu.groupes if g.get("owner_id") == vu.user_id]
+    if possedes and (not vu.invitations or vu.rng.random() < 0.5):
+        reponse = await vu.requete("invite_create", "POST", f"/groups/{vu.rng.choice(possedes)['id']}/invite")
+        if reponse is not None and reponse.status_code == 200:
+            vu.invitations.append(reponse.json()["invite"]["token"])
+        return
+    if vu.invitations:
+        await vu.requete("invite_join", "POST", "/groups/invite/join", attendus=(303,),
+                         json={"token": vu.invitations.pop(vu.rng.randrange(len(vu.invitations)))})
+
+
+PARCOURS: Dict[str, Tuple[int, Callable[[UtilisateurVirtuel], Awaitable[None]]]] = {
+    "login": (3, connexion),
+    "dashboard": (30, tableau_de_bord),
+    "group_detail": (25, detail_groupe),
+    "group_tasks": (15, taches_groupe),
+    "create_task": (10, creer_tache),
+    "edit_task": (12, modifier_tache),
+    "invite_join": (5, inviter_rejoindre),
+}
+
+
+def _parcours_ponderes(poids: Optional[str]) -> Tuple[List[str], List[int]]:
+    valeurs = {nom: p for nom, (p, _) in PARCOURS.items()}
+    for morceau in (poids or "").split(","):
+        nom, _, p = morceau.partition("=")
+        if nom.strip() in valeurs and p.strip():
+            valeurs[nom.strip()] = int(p)
+    noms = [n for n, p in valeurs.items() if p > 0]
+    return noms, [valeurs[n] for n in noms]
+
+
+async def piloter(vu: UtilisateurVirtuel, fin: float, noms: List[str], poids: List[int], pause: float) -> None:
+    await connexion(vu)
+    while time.perf_counter() < fin:
+        await PARCOURS[vu.rng.choices(noms, poids)[0]][1](vu)
+        if pause:
+            await asyncio.sleep(vu.rng.expovariate(1 / pause))
+
+
+_LIGNE_METRIQUE = re.compile(r'^grouply_http_request_duration_seconds_(bucket|sum|count)\{(.*)\} (\S+)$')
+_ETIQUETTE = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def lire_metriques(texte: str) -> Dict[Tuple[str, str], Dict[str, Any]]:
+    """Histogrammes de latence par (méthode, route), statuts confondus."""
+    routes: Dict[Tuple[str, str], Dict[str, Any]] = defaultdict(lambda: {"sum": 0.0, "count": 0, "buckets": defaultdict(float)})
+    for ligne in texte.splitlines():
+        m = _LIGNE_METRIQUE.match(ligne)
+        if not m:
+            continue
+        etiquettes = dict(_ETIQUETTE.findall(m.group(2)))
+        serie = routes[(etiquettes["method"], etiquettes["route"])]
+        valeur = float(m.group(3))
+        if m.group(1) == "bucket":
+            serie["buckets"][etiquettes["le"]] += valeur
+        else:
+            serie[m.group(1)] += valeur
+    return routes
+
+
+def _quantile_histogramme(buckets: Dict[str, float], total: float, q: float) -> str:
+    for borne, cumul in sorted(buckets.items(), key=lambda b: float(b[0])):
+        if cumul >= q * total:
+            return f"<={float(borne) * 1000:g}ms" if borne != "+Inf" else ">max"
+    return "-"
+
+
+def difference_metriques(avant: Dict, apres: Dict) -> List[Dict[str, Any]]:
+    lignes = []
+    for cle, serie in apres.items():
+        precedent = avant.get(cle, {"sum": 0.0, "count": 0, "buckets": {}})
+        count = serie["count"] - precedent["count"]
+        if count <= 0 or cle[1] == "/metrics":
+            continue
+        buckets = {le: v - precedent["buckets"].get(le, 0) for le, v in serie["buckets"].items()}
+        lignes.append({
+            "route": f"{cle[0]} {cle[1]}", "count": int(count),
+            "mean_ms": round((serie["sum"] - precedent["sum"]) / count * 1000, 2),
+            "p50": _quantile_histogramme(buckets, count, 0.5), "p99": _quantile_histogramme(buckets, count, 0.99),
+        })
+    return sorted(lignes, key=lambda l: -l["count"])
+
+
+def _percentile(durees: List[float], p: float) -> float:
+    return durees[min(len(durees) - 1, int(p * len(durees)))] * 1000
+
+
+def rapport(stats: Statistiques, duree: float, serveur: List[Dict[str, Any]]) -> Dict[str, Any]:
+    etapes = {}
+    for etape, durees in sorted(stats.durees.items()):
+        durees = sorted(durees)
+        etapes[etape] = {
+            "count": len(durees), "rps": round(len(durees) / duree, 1),
+            "p50_ms": round(_percentile(durees, 0.50), 2), "p95_ms": round(_percentile(durees, 0.95), 2),
+            "p99_ms": round(_percentile(durees, 0.99), 2), "max_ms": round(durees[-1] * 1000, 2),
+            "error_rate": round(stats.erreurs[etape] / len(durees), 4),
+        }
+    total = sum(e["count"] for e in etapes.values())
+    return {
+        "duration_s": round(duree, 1), "requests": total, "rps": round(total / duree, 1),
+        "error_rate": round(sum(stats.erreurs.values()) / total, 4) if total else 0.0,
+        "statuses": dict(sorted(stats.statuts.items())), "steps": etapes, "server": serveur,
+    }
+
+
+def afficher(resultat: Dict[str, Any]) -> None:
+    print(f"\n{resultat['requests']} requêtes en {resultat['duration_s']} s : {resultat['rps']} req/s, "
+          f"erreurs {resultat['error_rate']:.2%}, statuts {resultat['statuses']}")
+    print(f"\n{'étape':16s} {'n':>7s} {'req/s':>8s} {'p50':>9s} {'p95':>9s} {'p99':>9s} {'max':>9s} {'err':>7s}")
+    for etape, e in resultat["steps"].items():
+        print(f"{etape:16s} {e['count']:>7d} {e['rps']:>8.1f} {e['p50_ms']:>7.1f}ms {e['p95_ms']:>7.1f}ms "
+              f"{e['p99_ms']:>7.1f}ms {e['max_ms']:>7.1f}ms {e['error_rate']:>7.2%}")
+    if resultat["server"]:
+        print(f"\n{'route (serveur)':40s} {'n':>7s} {'moyenne':>10s} {'p50':>10s} {'p99':>10s}")
+        for r in resultat["server"]:
+            print(f"{r['route']:40s} {r['count']:>7d} {r['mean_ms']:>8.2f}ms {r['p50']:>10s} {r['p99']:>10s}")
+
+
+async def lancer(base_url: str, transport: Optional[httpx.AsyncBaseTransport], args: argparse.Namespace) -> Dict[str, Any]:
+    stats = Statistiques()
+    invitations: List[str] = []
+    noms, poids = _parcours_ponderes(args.poids)
+    rng = random.Random(args.seed)
+    limites = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+
+    async with httpx.AsyncClient(base_url=base_url, transport=transport, timeout=args.timeout) as sonde:
+        # le préchauffage ne doit pas compter dans la mesure
+        while (await sonde.get("/readyz")).json().get("status") == "starting":
+            await asyncio.sleep(0.05)
+        avant = lire_metriques((await sonde.get("/metrics")).text)
+        clients = [httpx.AsyncClient(base_url=base_url, transport=transport, timeout=args.timeout, limits=limites)
+                   for _ in range(args.vus)]
+        try:
+            vus = [UtilisateurVirtuel(c, rng.randint(1, args.users), stats, invitations, random.Random(rng.random()))
+                   for c in clients]
+            debut = time.perf_counter()
+            fin = debut + args.montee + args.duree
+
+            async def demarrer(i: int, vu: UtilisateurVirtuel) -> None:
+                await asyncio.sleep(args.montee * i / len(vus))
+                await piloter(vu, fin, noms, poids, args.pause)
+
+            await asyncio.gather(*(demarrer(i, vu) for i, vu in enumerate(vus)))
+            duree = time.perf_counter() - debut
+        finally:
+            await asyncio.gather(*(c.aclose() for c in clients))
+        apres = lire_metriques((await sonde.get("/metrics")).text)
+    return rapport(stats, duree, difference_metriques(avant, apres))
+
+
+def _preparer_base(taches: int, dossier: str) -> Tuple[Path, int]:
+    from app.storage.synthetique import generer_donnees
+
+    groupes = max(10, taches // 100)
+    utilisateurs = max(100, taches // 10)
+    data = generer_donnees(utilisateurs, groupes, 20, max(1, taches // groupes), groupes)
+    chemin = Path(dossier) / "db.json"
+    chemin.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    return chemin, utilisateurs
+
+
+async def en_memoire(args: argparse.Namespace) -> Dict[str, Any]:
+    # la configuration est lue à l'import : la base doit être posée avant
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        return await lancer("http://testserver", httpx.ASGITransport(app=app), args)
+
+
+def _port_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def avec_uvicorn(args: argparse.Namespace, environnement: Dict[str, str]) -> Dict[str, Any]:
+    port = _port_libre()
+    serveur = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--workers", str(args.workers),
+         "--log-level", "warning"],
+        env=environnement,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        limite = time.monotonic() + 60
+        while True:
+            try:
+                if httpx.get(f"{base_url}/readyz", timeout=1).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if serveur.poll() is not None or time.monotonic() > limite:
+                raise SystemExit("le serveur uvicorn n'a pas démarré")
+            time.sleep(0.2)
+        return asyncio.run(lancer(base_url, None, args))
+    finally:
+        serveur.terminate()
+        serveur.wait()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    cible = parser.add_mutually_exclusive_group()
+    cible.add_argument("--url", help="serveur déjà lancé")
+    cible.add_argument("--uvicorn", action="store_true", help="lancer uvicorn sur la base générée")
+    parser.add_argument("--workers", type=int, default=1, help="workers uvicorn (1 seulement, voir plus haut)")
+    parser.add_argument("--vus", type=int, default=20, help="utilisateurs virtuels concurrents")
+    parser.add_argument("--duree", type=float, default=20, help="secondes de charge, après la montée")
+    parser.add_argument("--montee", type=float, default=2, help="secondes pour démarrer tous les utilisateurs")
+    parser.add_argument("--pause", type=float, default=0.0, help="temps de réflexion moyen entre parcours (s)")
+    parser.add_argument("--taches", type=int, default=10000, help="taille de la base générée")
+    parser.add_argument("--users", type=int, help="comptes utilisables (défaut : ceux de la base générée)")
+    parser.add_argument("--poids", help="surcharge des poids, ex. « dashboard=50,invite_join=0 »")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", type=Path, help="écrire le rapport JSON dans ce fichier")
+    args = parser.parse_args()
+    if args.workers != 1:
+        parser.error("--workers : un seul worker est pris en charge (métriques et base propres à chaque processus)")
+
+    if args.url:
+        if not args.users:
+            parser.error("--users est requis avec --url")
+        resultat = asyncio.run(lancer(args.url, None, args))
+    else:
+        with tempfile.TemporaryDirectory() as dossier:
+            chemin, utilisateurs = _preparer_base(args.taches, dossier)
+            args.users = min(args.users or utilisateurs, utilisateurs)
+            environnement = {**os.environ, "DATABASE_JSON_PATH": str(chemin), "LOG_LEVEL": "WARNING"}
+            if args.uvicorn:
+                resultat = avec_uvicorn(args, environnement)
+            else:
+                os.environ.update(environnement)
+                resultat = asyncio.run(en_memoire(args))
+
+    afficher(resultat)
+    if args.json:
+        args.json.write_text(json.dumps(resultat, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
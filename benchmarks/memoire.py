@@ -0,0 +1,111 @@
+"""Empreinte mémoire de la base chargée : dicts de json.loads contre enregistrements compacts.
+
+    python -m benchmarks.memoire [--taches 100000] [--projection 1000000]
+
+Pour chaque collection : octets par enregistrement (tracemalloc, chaînes et
+listes comprises), en dicts puis en enregistrements compacts
+(app.storage.enregistrements, activés par COMPACT_RECORDS). Les temps de
+décodage, de conversion et d'un parcours des tâches par ``get`` disent ce que
+coûte le gain, puisque la base est relue à chaque requête. La dernière ligne
+projette la mémoire des tâches à ``--projection`` tâches.
+"""
+import argparse
+import gc
+import json
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, Tuple
+
+from app.core.reponses import vers_dict
+from app.storage.enregistrements import TYPES, compacter
+from benchmarks.stockage import jeu_de_donnees
+
+
+def _mesurer(fabrique: Callable[[], Any]) -> Tuple[Any, int]:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        objet = fabrique()
+        taille, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return objet, taille
+
+
+def _chrono(fonction: Callable[[], Any], repetitions: int = 3) -> float:
+    meilleur = float("inf")
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        fonction()
+        meilleur = min(meilleur, time.perf_counter() - debut)
+    return meilleur
+
+
+def _parcourir(taches: Any) -> int:
+    return sum(1 for t in taches if t.get("status") == "done" and t.get("group_id") == 1)
+
+
+def executer(taches: int, projection: int) -> Dict[str, Any]:
+    brut = json.dumps(jeu_de_donnees(taches), ensure_ascii=False).encode("utf-8")
+    reference = json.loads(brut)
+    if json.loads(json.dumps(compacter(json.loads(brut)), default=vers_dict)) != reference:
+        raise AssertionError("les enregistrements compacts ne redonnent pas la base d'origine")
+
+    collections: Dict[str, Dict[str, float]] = {}
+    for collection, classe in TYPES.items():
+        objets = reference[collection]
+        if not objets:
+            continue
+        source = json.dumps(objets, ensure_ascii=False)
+        _, en_dicts = _mesurer(lambda: json.loads(source))
+        _, compacts = _mesurer(lambda: [classe.depuis_dict(o) for o in json.loads(source)])
+        collections[collection] = {
+            "n": len(objets), "dict_o": en_dicts / len(objets), "compact_o": compacts / len(objets),
+        }
+
+    en_dicts = reference["tasks"]
+    compacts = compacter({"tasks": json.loads(json.dumps(en_dicts))})["tasks"]
+    taches_reelles = len(en_dicts)
+    decodage = _chrono(lambda: json.loads(brut))
+    temps = {
+        "decode_s": decodage,
+        "compacter_s": _chrono(lambda: compacter(json.loads(brut))) - decodage,
+        "parcours_dict_s": _chrono(lambda: _parcourir(en_dicts)),
+        "parcours_compact_s": _chrono(lambda: _parcourir(compacts)),
+    }
+    return {"octets": len(brut), "taches": taches_reelles, "collections": collections, "temps": temps,
+            "projection": projection}
+
+
+def afficher(r: Dict[str, Any]) -> None:
+    print(f"base : {r['octets'] / 1e6:.1f} Mo de JSON, {r['taches']} tâches")
+    print(f"{'collection':12s} {'n':>8s} {'dict o/enr':>12s} {'compact o/enr':>14s} {'gain':>6s}")
+    for nom, c in r["collections"].items():
+        print(f"{nom:12s} {c['n']:>8d} {c['dict_o']:>12.1f} {c['compact_o']:>14.1f} x{c['dict_o'] / c['compact_o']:.2f}")
+    t, n = r["temps"], r["taches"]
+    for libelle, cle in (("décodage json", "decode_s"), ("conversion compacte", "compacter_s"),
+                         ("parcours get, dicts", "parcours_dict_s"), ("parcours get, compacts", "parcours_compact_s")):
+        print(f"{libelle:24s} {t[cle] * 1e3:>9.1f} ms  ({t[cle] / n * 1e6:.2f} µs/tâche)")
+    taches = r["collections"]["tasks"]
+    p = r["projection"]
+    print(f"projection {p} tâches : {taches['dict_o'] * p / 2 ** 20:.0f} Mio en dicts, "
+          f"{taches['compact_o'] * p / 2 ** 20:.0f} Mio compacts")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--taches", type=int, default=100_000)
+    parser.add_argument("--projection", type=int, default=1_000_000, help="nombre de tâches de la projection")
+    parser.add_argument("--json", action="store_true", help="résultats bruts en JSON")
+    args = parser.parse_args()
+    resultats = executer(args.taches, args.projection)
+    if args.json:
+        print(json.dumps(resultats, ensure_ascii=False, indent=2))
+    else:
+        afficher(resultats)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
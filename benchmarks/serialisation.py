@@ -0,0 +1,100 @@
+"""Coût de sérialisation d'une liste de tâches, avant/après les modèles typés.
+
+    python -m benchmarks.serialisation [--taches 1000] [--repetitions 50]
+
+« avant » : response_model=List[Dict[str, Any]] et JSONResponse (json.dumps) ;
+« après » : response_model=List[TaskOut] et ReponseJSON (orjson si installé) ;
+« fields » : projection ?fields= (par défaut id,title,status,due_date).
+L'application ASGI est appelée directement, sans client HTTP, pour ne mesurer
+que la validation et l'encodage de la réponse.
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Tuple
+
+from fastapi import FastAPI, Response
+from fastapi.responses import JSONResponse
+
+from app.core.reponses import ReponseJSON, orjson, reponse_projetee
+from app.schemas.tache import TaskOut
+
+
+def generer_taches(n: int) -> List[Dict[str, Any]]:
+    debut = datetime(2026, 1, 1)
+    return [
+        {
+            "id": i,
+            "title": f"Tâche {i}",
+            "description": "Description un peu longue de la tâche " * 4,
+            "status": ("todo", "in_progress", "done")[i % 3],
+            "assigned_to_id": i % 50 or None,
+            "group_id": i % 20 + 1,
+            "due_date": (debut + timedelta(days=i % 90)).isoformat(),
+            "created_at": (debut + timedelta(minutes=i)).isoformat(),
+            "updated_at": (debut + timedelta(minutes=2 * i)).isoformat(),
+        }
+        for i in range(1, n + 1)
+    ]
+
+
+def construire_app(taches: List[Dict[str, Any]], typee: bool, champs: Tuple[str, ...] = ()) -> FastAPI:
+    app = FastAPI(default_response_class=ReponseJSON if typee else JSONResponse)
+    modele = List[TaskOut] if typee else List[Dict[str, Any]]
+
+    @app.get("/tasks", response_model=modele)
+    async def lister(response: Response):
+        if champs:
+            return reponse_projetee(taches, champs, response)
+        return taches
+
+    return app
+
+
+async def appeler(app: FastAPI) -> int:
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+             "scheme": "http", "path": "/tasks", "raw_path": b"/tasks", "root_path": "",
+             "query_string": b"", "headers": [], "client": ("bench", 0), "server": ("bench", 80)}
+    taille = 0
+
+    async def recevoir():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def envoyer(message):
+        nonlocal taille
+        if message["type"] == "http.response.body":
+            taille += len(message.get("body", b""))
+
+    await app(scope, recevoir, envoyer)
+    return taille
+
+
+async def mesurer(app: FastAPI, repetitions: int) -> Dict[str, float]:
+    taille = await appeler(app)
+    debut = time.perf_counter()
+    for _ in range(repetitions):
+        await appeler(app)
+    return {"ms": (time.perf_counter() - debut) * 1000 / repetitions, "octets": taille}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--taches", type=int, default=1000)
+    parser.add_argument("--repetitions", type=int, default=50)
+    parser.add_argument("--fields", default="id,title,status,due_date")
+    args = parser.parse_args()
+
+    taches = generer_taches(args.taches)
+    avant = asyncio.run(mesurer(construire_app(taches, typee=False), args.repetitions))
+    apres = asyncio.run(mesurer(construire_app(taches, typee=True), args.repetitions))
+    projete = asyncio.run(mesurer(construire_app(taches, typee=True, champs=tuple(args.fields.split(","))), args.repetitions))
+    par_mille = 1000 / args.taches
+    print(f"orjson : {'oui' if orjson is not None else 'non (repli json)'}")
+    for nom, r in (("avant", avant), ("après", apres), ("fields", projete)):
+        print(f"{nom:6s} {r['ms'] * par_mille:8.2f} ms / 1k tâches  ({r['octets']} octets)")
+    print(f"gain   {avant['ms'] / apres['ms']:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+"""Micro-benchmarks de la couche de stockage : app/storage/json_db.py et app/crud.
+
+    python -m benchmarks.stockage [--tailles 1000,10000] [--modes requete,memoire]
+    python -m benchmarks.stockage --enregistrer          # remplace la référence
+    python -m benchmarks.stockage --seuil 0.25           # compare à la référence
+
+« requete » : chaque appel dans sa propre unité de travail, comme une requête
+HTTP (lecture du fichier, écriture s'il y a modification). « memoire » : la base
+est déjà chargée, seul le coût de la fonction est mesuré. Les tailles sont des
+nombres de tâches ; le jeu de données vient de app.storage.synthetique.
+
+Pour chaque opération : opérations/s, p50 et p99 par appel, pic mémoire
+(tracemalloc, sur quelques appels à part pour ne pas fausser les temps).
+Une opération dont le p50 dépasse la référence de plus de ``--seuil`` est une
+régression ; le code de sortie vaut alors 1. La référence n'a de sens que sur
+la machine qui l'a produite : la régénérer avant de comparer ailleurs. Le hachage bcrypt
+(creer_utilisateur, hacher/verifier_mot_de_passe) est exclu : il ne dit rien du stockage.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.core.reponses import orjson
+from app.crud import groupe as crud_groupe, tache as crud_tache, user as crud_user
+from app.storage import json_db
+from app.storage.synthetique import generer_donnees
+
+REFERENCE = Path(__file__).resolve().parent / "reference_stockage.json"
+STATUTS = ("todo", "in_progress", "done")
+
+
+class Contexte:
+    """Identifiants tirés au hasard dans le jeu de données. Les suppressions puisent
+    dans le dernier cinquième des identifiants, que les autres appels ne visent pas."""
+
+    def __init__(self, data: Dict[str, Any], graine: int = 0) -> None:
+        self.rng = random.Random(graine)
+        self.n_users, self.n_groups, self.n_tasks = len(data["users"]), len(data["groups"]), len(data["tasks"])
+        self.hache = data["users"][0]["hashed_password"]
+        self.tokens = [inv["token"] for inv in data["invites"]]
+        self.proprietaires = {g["id"]: g["owner_id"] for g in data["groups"]}
+        self.a_supprimer = {
+            cle: self._reserve(n) for cle, n in
+            (("users", self.n_users), ("groups", self.n_groups), ("tasks", self.n_tasks), ("invites", len(self.tokens)))
+        }
+        self.adhesions = [(g["id"], u) for g in data["groups"] if g["id"] <= self._limite(self.n_groups)
+                          for u in g["members"][1:]]
+        self.rng.shuffle(self.adhesions)
+        self.compteur = 0
+
+    @staticmethod
+    def _limite(n: int) -> int:
+        return max(1, n - n // 5)
+
+    def _reserve(self, n: int) -> List[int]:
+        ids = list(range(self._limite(n) + 1, n + 1))
+        self.rng.shuffle(ids)
+        return ids
+
+    def id(self, n: int) -> int:
+        return self.rng.randint(1, self._limite(n))
+
+    def user(self) -> int:
+        return self.id(self.n_users)
+
+    def group(self) -> int:
+        return self.id(self.n_groups)
+
+    def task(self) -> int:
+        return self.id(self.n_tasks)
+
+    def token(self) -> str:
+        return self.tokens[self.rng.randrange(len(self.tokens))]
+
+    def unique(self) -> int:
+        self.compteur += 1
+        return self.compteur
+
+
+Operation = Callable[[Contexte], Awaitable[Any]]
+
+OPERATIONS: List[Tuple[str, Operation]] = [
+    # app/storage/json_db.py
+    ("json_db.charger_db", lambda c: json_db.charger_db()),
+    ("json_db.sauvegarder_db", lambda c: _resauvegarder()),
+    ("json_db.obtenir_prochain_id", lambda c: json_db.obtenir_prochain_id("tasks")),
+    ("json_db.trouver_utilisateur_par_email", lambda c: json_db.trouver_utilisateur_par_email(f"user{c.user()}@example.com")),
+    ("json_db.trouver_utilisateur_par_id", lambda c: json_db.trouver_utilisateur_par_id(c.user())),
+    ("json_db.ajouter_utilisateur", lambda c: json_db.ajouter_utilisateur(
+        {"email": f"bench{c.unique()}@example.com", "hashed_password": c.hache, "full_name": "Bench"})),
+    ("json_db.ajouter_groupe", lambda c: json_db.ajouter_groupe(
+        {"name": f"Bench {c.unique()}", "description": None, "owner_id": c.user(), "members": []})),
+    ("json_db.obtenir_groupe_par_id", lambda c: json_db.obtenir_groupe_par_id(c.group())),
+    ("json_db.ajouter_membre_au_groupe", lambda c: json_db.ajouter_membre_au_groupe(c.group(), c.user())),
+    ("json_db.retirer_membre_du_groupe", lambda c: json_db.retirer_membre_du_groupe(*c.adhesions.pop())),
+    ("json_db.creer_tache", lambda c: json_db.creer_tache("Bench", None, c.user(), c.group(), None)),
+    ("json_db.recuperer_tache", lambda c: json_db.recuperer_tache(c.task())),
+    ("json_db.lister_taches_par_groupe", lambda c: json_db.lister_taches_par_groupe(c.group())),
+    ("json_db.mettre_a_jour_tache", lambda c: json_db.mettre_a_jour_tache(c.task(), {"status": c.rng.choice(STATUTS)})),
+    ("json_db.creer_invitation", lambda c: _creer_invitation(c)),
+    ("json_db.obtenir_invite_par_token", lambda c: json_db.obtenir_invite_par_token(c.token())),
+    ("json_db.utiliser_invite", lambda c: json_db.utiliser_invite(c.token(), c.user())),
+    # app/crud/groupe.py
+    ("crud.groupe.creer_groupe", lambda c: crud_groupe.creer_groupe(f"Bench {c.unique()}", None, c.user())),
+    ("crud.groupe.recuperer_groupe", lambda c: crud_groupe.recuperer_groupe(c.group())),
+    ("crud.groupe.lister_groupes", lambda c: crud_groupe.lister_groupes()),
+    ("crud.groupe.mettre_a_jour_groupe", lambda c: crud_groupe.mettre_a_jour_groupe(c.group(), {"description": f"d{c.unique()}"})),
+    ("crud.groupe.ajouter_membre", lambda c: crud_groupe.ajouter_membre(c.group(), c.user())),
+    ("crud.groupe.ajouter_membres_en_lot", lambda c: crud_groupe.ajouter_membres_en_lot(c.group(), [c.user() for _ in range(10)])),
+    ("crud.groupe.retirer_membre", lambda c: crud_groupe.retirer_membre(*c.adhesions.pop())),
+    ("crud.groupe.lister_groupes_par_utilisateur", lambda c: crud_groupe.lister_groupes_par_utilisateur(c.user())),
+    ("crud.groupe.creer_invitation", lambda c: crud_groupe.creer_invitation(c.group(), f"bench-{c.unique()}", c.user(), None)),
+    ("crud.groupe.obtenir_invitation_par_token", lambda c: crud_groupe.obtenir_invitation_par_token(c.token())),
+    ("crud.groupe.incrementer_utilisation_invite", lambda c: crud_groupe.incrementer_utilisation_invite(c.token())),
+    # app/crud/tache.py
+    ("crud.tache.creer_tache", lambda c: crud_tache.creer_tache("Bench", None, c.user(), c.group(), None)),
+    ("crud.tache.creer_taches_en_lot", lambda c: crud_tache.creer_taches_en_lot([{"title": "Bench"}] * 100, c.group())),
+    ("crud.tache.recuperer_tache", lambda c: crud_tache.recuperer_tache(c.task())),
+    ("crud.tache.lister_taches_par_groupe", lambda c: crud_tache.lister_taches_par_groupe(c.group())),
+    ("crud.tache.lister_taches_par_utilisateur", lambda c: crud_tache.lister_taches_par_utilisateur(c.user())),
+    ("crud.tache.mettre_a_jour_tache", lambda c: crud_tache.mettre_a_jour_tache(c.task(), {"title": f"t{c.unique()}"})),
+    ("crud.tache.assigner_tache", lambda c: crud_tache.assigner_tache(c.task(), c.user())),
+    ("crud.tache.changer_statut", lambda c: crud_tache.changer_statut(c.task(), c.rng.choice(STATUTS))),
+    ("crud.tache.associer_tache_a_groupe_crud", lambda c: crud_tache.associer_tache_a_groupe_crud(c.task(), c.group())),
+    # app/crud/user.py
+    ("crud.user.recuperer_utilisateur_par_id", lambda c: crud_user.recuperer_utilisateur_par_id(c.user())),
+    ("crud.user.recuperer_utilisateur_par_email", lambda c: crud_user.recuperer_utilisateur_par_email(f"user{c.user()}@example.com")),
+    ("crud.user.indexer_utilisateurs_par_email", lambda c: crud_user.indexer_utilisateurs_par_email()),
+    ("crud.user.mettre_a_jour_utilisateur", lambda c: crud_user.mettre_a_jour_utilisateur(c.user(), {"full_name": f"u{c.unique()}"})),
+    ("json_db.supprimer_tache", lambda c: json_db.supprimer_tache(c.a_supprimer["tasks"].pop())),
+    ("crud.tache.supprimer_tache", lambda c: crud_tache.supprimer_tache(c.a_supprimer["tasks"].pop())),
+    ("json_db.revoke_invite", lambda c: json_db.revoke_invite(c.a_supprimer["invites"].pop())),
+    ("crud.user.supprimer_utilisateur", lambda c: crud_user.supprimer_utilisateur(c.a_supprimer["users"].pop())),
+    ("crud.groupe.supprimer_groupe", lambda c: crud_groupe.supprimer_groupe(c.a_supprimer["groups"].pop())),
+]
+
+
+async def _resauvegarder() -> None:
+    await json_db.sauvegarder_db(await json_db.charger_db())
+
+
+async def _creer_invitation(c: Contexte) -> Dict[str, Any]:
+    gid = c.group()
+    return await json_db.creer_invitation(gid, c.proprietaires[gid])
+
+
+def jeu_de_donnees(taches: int) -> Dict[str, Any]:
+    groupes = max(50, taches // 100)
+    data = generer_donnees(utilisateurs=max(200, taches // 10), groupes=groupes, membres_par_groupe=20,
+                           taches_par_groupe=max(1, taches // groupes), invitations=max(100, taches // 100))
+    # invitations utilisables pendant toute la mesure
+    for inv in data["invites"]:
+        inv["expires_at"], inv["max_uses"] = None, 10 ** 9
+    return data
+
+
+def _percentile(durees: List[float], p: float) -> float:
+    return durees[min(len(durees) - 1, int(p * len(durees)))]
+
+
+async def mesurer(operation: Operation, contexte: Contexte, mode: str, duree: float,
+                  iterations: int) -> Optional[Dict[str, float]]:
+    durees: List[float] = []
+    debut = time.perf_counter()
+    while len(durees) < iterations and (len(durees) < 3 or time.perf_counter() - debut < duree):
+        try:
+            if mode == "requete":
+                t0 = time.perf_counter()
+                async with json_db.snapshot_db(ecriture=True):
+                    await operation(contexte)
+            else:
+                t0 = time.perf_counter()
+                await operation(contexte)
+        except IndexError:
+            break  # réserve d'identifiants épuisée
+        durees.append(time.perf_counter() - t0)
+    if not durees:
+        return None
+    total = sum(durees)
+
+    tracemalloc.start()
+    try:
+        for _ in range(3):
+            if mode == "requete":
+                async with json_db.snapshot_db(ecriture=True):
+                    await operation(contexte)
+            else:
+                await operation(contexte)
+        pic = tracemalloc.get_traced_memory()[1]
+    except IndexError:
+        pic = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    durees.sort()
+    return {
+        "n": len(durees),
+        "ops_s": round(len(durees) / total, 1),
+        "p50_us": round(_percentile(durees, 0.50) * 1e6, 1),
+        "p99_us": round(_percentile(durees, 0.99) * 1e6, 1),
+        "peak_kib": round(pic / 1024, 1),
+    }
+
+
+async def executer(taille: int, mode: str, duree: float, iterations: int,
+                   filtre: Optional[str]) -> Dict[str, Dict[str, float]]:
+    data = jeu_de_donnees(taille)
+    resultats = {}
+    for nom, operation in OPERATIONS:
+        if filtre and filtre not in nom:
+            continue
+        # chaque opération repart du même jeu : les créations précédentes ne faussent pas la mesure
+        await json_db.remplacer_db(data)
+        contexte = Contexte(data)
+        if mode == "requete":
+            r = await mesurer(operation, contexte, mode, duree, iterations)
+        else:
+            async with json_db.snapshot_db(ecriture=True):
+                await json_db.charger_db()
+                r = await mesurer(operation, contexte, mode, duree, iterations)
+        if r is not None:
+            resultats[f"{mode}/{taille}/{nom}"] = r
+            print(f"{mode:8s} {taille:>8d} {nom:45s} {r['ops_s']:>11.1f} ops/s  p50 {r['p50_us']:>11.1f} us"
+                  f"  p99 {r['p99_us']:>11.1f} us  pic {r['peak_kib']:>9.1f} KiB", flush=True)
+    return resultats
+
+
+def comparer(resultats: Dict[str, Dict[str, float]], reference: Dict[str, Dict[str, float]],
+             seuil: float, plancher: float = 0.0) -> List[str]:
+    """Sous ``plancher`` µs, le bruit de mesure l'emporte : l'opération n'est pas jugée."""
+    regressions = []
+    for cle, r in resultats.items():
+        ref = reference.get(cle)
+        if ref is None or max(ref["p50_us"], r["p50_us"]) < plancher:
+            continue
+        ratio = r["p50_us"] / ref["p50_us"] if ref["p50_us"] else 1.0
+        if ratio > 1 + seuil:
+            regressions.append(f"RÉGRESSION   {cle}: p50 {ref['p50_us']} -> {r['p50_us']} us (x{ratio:.2f})")
+        elif ratio < 1 - seuil:
+            print(f"amélioration {cle}: p50 {ref['p50_us']} -> {r['p50_us']} us (x{ratio:.2f})")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tailles", default="1000,10000", help="nombres de tâches, séparés par des virgules")
+    parser.add_argument("--modes", default="requete,memoire")
+    parser.add_argument("--duree", type=float, default=0.5, help="budget en secondes par opération")
+    parser.add_argument("--iterations", type=int, default=200, help="appels maximum par opération")
+    parser.add_argument("--filtre", help="ne garder que les opérations dont le nom contient ce texte")
+    parser.add_argument("--reference", type=Path, default=REFERENCE)
+    parser.add_argument("--seuil", type=float, default=0.25, help="hausse relative du p50 tolérée")
+    parser.add_argument("--plancher", type=float, default=10.0, help="p50 (µs) sous lequel on ne compare pas")
+    parser.add_argument("--enregistrer", action="store_true", help="écrire les résultats comme nouvelle référence")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as dossier:
+        json_db.DATABASE_JSON_PATH = Path(dossier) / "db.json"
+        resultats: Dict[str, Dict[str, float]] = {}
+        for mode in args.modes.split(","):
+            for taille in (int(t) for t in args.tailles.split(",")):
+                resultats.update(asyncio.run(executer(taille, mode, args.duree, args.iterations, args.filtre)))
+
+    if args.enregistrer:
+        args.reference.write_text(json.dumps({
+            "meta": {"python": platform.python_version(), "machine": platform.machine(),
+                     "orjson": orjson is not None, "date": time.strftime("%Y-%m-%d")},
+            "results": resultats,
+        }, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+        print(f"référence écrite : {args.reference}")
+        return 0
+    if not args.reference.exists():
+        print("pas de référence, relancer avec --enregistrer", file=sys.stderr)
+        return 0
+    reference = json.loads(args.reference.read_text(encoding="utf-8"))["results"]
+    regressions = comparer(resultats, reference, args.seuil, args.plancher)
+    for ligne in regressions:
+        print(ligne)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())